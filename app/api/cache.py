@@ -0,0 +1,109 @@
+"""
+Pre-encoded, ETag-validated JSON responses for the polled GET endpoints.
+
+Dashboards poll /api/status, /api/connection, /api/devices, /api/config and
+/api/headers every few hundred ms and mostly get the same answer back. The
+cache keeps, per (endpoint, bus, query args), the encoded body and its ETag
+together with the state version it was built from:
+
+  - while the version is unchanged a poll is a dict lookup plus a write of
+    ready-made bytes: nothing is rebuilt or re-encoded;
+  - a client that sends the ETag back in If-None-Match gets an empty 304;
+  - the gzip form (see compress.py) is made once per entry, on first use;
+  - the version comes from AppState's own counters (status_rev, devices_rev,
+    frame seqs), so an entry goes stale exactly when frames, devices or
+    config change, and never because of time passing.
+
+The version is read before the body is built, so a body is never older than
+the version it is stored under (at worst newer, which just costs a rebuild).
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, Optional
+
+from flask import Response, current_app, request
+
+from app.api.compress import MIN_SIZE, accepts_gzip, gzip_bytes
+from app.core.metrics import HTTP_CACHE
+
+
+class _Entry:
+    __slots__ = ("version", "body", "etag", "_gz")
+
+    def __init__(self, version: Hashable, body: bytes, etag: str):
+        self.version = version
+        self.body = body
+        self.etag = etag
+        self._gz: Optional[bytes] = None
+
+    @property
+    def gz(self) -> bytes:
+        gz = self._gz
+        if gz is None:  # two threads may both compress; same bytes either way
+            gz = self._gz = gzip_bytes(self.body)
+        return gz
+
+
+class ResponseCache:
+    """LRU of encoded JSON bodies keyed by request, validated by state version."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max(1, int(max_entries))
+        self._lock = Lock()  # guards the dict only; bodies are built outside it
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+
+    def _lookup(self, key: Hashable, version: Hashable) -> Optional[_Entry]:
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None or e.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return e
+
+    def _store(self, key: Hashable, e: _Entry) -> None:
+        with self._lock:
+            self._entries[key] = e
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def respond(self, key: Hashable, version: Hashable, build: Callable[[], Any]) -> Response:
+        """The cached response for `key` at `version`, calling build() only on a miss.
+
+        build() returns the JSON-able payload (what would go to jsonify).
+        Two requests missing at once may both build; the later store wins.
+        """
+        endpoint = key[0] if isinstance(key, tuple) else key
+        e = self._lookup(key, version)
+        if e is None:
+            result = "miss"
+            body = (current_app.json.dumps(build()) + "\n").encode()
+            e = _Entry(version, body, hashlib.blake2b(body, digest_size=12).hexdigest())
+            self._store(key, e)
+        else:
+            result = "hit"
+
+        gz = len(e.body) >= MIN_SIZE and accepts_gzip()
+        # each encoding gets its own ETag; either one validates the entry
+        etag = e.etag + "-gz" if gz else e.etag
+        inm = request.if_none_match
+        if inm.contains(e.etag) or inm.contains(e.etag + "-gz"):
+            HTTP_CACHE.labels(endpoint, "not_modified").inc()
+            resp = current_app.response_class(status=304)
+        else:
+            HTTP_CACHE.labels(endpoint, result).inc()
+            resp = current_app.response_class(e.gz if gz else e.body, mimetype=current_app.json.mimetype)
+            if gz:
+                resp.headers["Content-Encoding"] = "gzip"
+        resp.set_etag(etag)
+        resp.vary.add("Accept-Encoding")
+        # browsers may keep the body but must revalidate (cheap: a 304) each time
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
@@ -0,0 +1,67 @@
+"""
+Negotiated gzip for JSON API responses.
+
+A JSON response of at least MIN_SIZE bytes is gzipped when the request's
+Accept-Encoding allows it. ResponseCache keeps the compressed body next to
+the plain one, so a cached poll is compressed once rather than per client;
+everything else goes through compress_response() in an after_request hook,
+which never touches streamed or file responses. /api/stream compresses its
+own messages with gzip_stream().
+"""
+from __future__ import annotations
+
+import gzip
+import zlib
+from typing import Iterable, Iterator
+
+from flask import Response, request
+
+MIN_SIZE = 1024  # below this the gzip header and CPU time are not worth it
+LEVEL = 6
+
+
+def accepts_gzip() -> bool:
+    return request.accept_encodings.quality("gzip") > 0
+
+
+def gzip_bytes(body: bytes) -> bytes:
+    # mtime=0: the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=LEVEL, mtime=0)
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """One gzip stream over `chunks`, flushed after each so nothing waits in the compressor.
+
+    The compressor's window spans the whole stream, so the repeated keys and
+    names of event after event compress to a few bytes each.
+    """
+    z = zlib.compressobj(LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    try:
+        for chunk in chunks:
+            yield z.compress(chunk) + z.flush(zlib.Z_SYNC_FLUSH)
+        yield z.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()  # a disconnecting client closes us; let the source clean up too
+
+
+def compress_response(resp: Response) -> Response:
+    """Gzip a complete JSON response in place if the client accepts it."""
+    if (
+        resp.direct_passthrough
+        or resp.is_streamed
+        or resp.status_code != 200
+        or resp.mimetype != "application/json"
+        or "Content-Encoding" in resp.headers
+    ):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if not accepts_gzip():
+        return resp
+    body = resp.get_data()
+    if len(body) < MIN_SIZE:
+        return resp
+    resp.set_data(gzip_bytes(body))
+    resp.headers["Content-Encoding"] = "gzip"
+    return resp
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
+import atexit
 import json
 import os
 import logging
+import sys
+import time
 from flask import jsonify
 from app.core.thesaurus import HEADERS
 
-from flask import Flask, jsonify, request, send_from_directory
-from serial.serialutil import SerialException
+from flask import Blueprint, Flask, Response, abort, g, jsonify, make_response, request, send_from_directory
 
-from app.core.state import STATE
-from app.core.controller import Controller
-from app.logging_setup import setup_logging
+from app.api.cache import ResponseCache
+from app.api.compress import accepts_gzip, compress_response, gzip_stream
+from app.core.buses import build_buses
+from app.core.hub import sse_event
+from app.core.metrics import HTTP_DURATION, METRICS
+from app.core.port_monitor import PORTS
+from app.core.scheduler import PRIORITY_OPERATOR, BatchJob, TxJob
+from app.logging_setup import logging_stats, setup_logging
 
 
 def _should_start_thread() -> bool:
@@ -25,18 +32,76 @@ def _should_start_thread() -> bool:
     return True
 
 
-def _load_devices_json(path: str, logger) -> None:
-    if not os.path.exists(path):
-        return
+def _parse_send_args(data: dict) -> tuple[int, int, bytes]:
+    """Validate {dest, header, data_hex}; raises ValueError with a client-facing message."""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            payload = json.load(f)
-        STATE.load_devices(payload)
-        if logger:
-            logger.info("Loaded devices from %s (%d entries)", path, len(STATE.devices))
-    except Exception as e:
-        if logger:
-            logger.warning("Failed to load devices.json: %s", e)
+        dest = int(data.get("dest"))
+    except Exception:
+        raise ValueError("dest must be integer")
+
+    try:
+        header = int(data.get("header", 254))
+    except Exception:
+        raise ValueError("header must be integer")
+
+    payload_hex = (data.get("data_hex") or "").strip()
+    try:
+        payload = bytes.fromhex(payload_hex) if payload_hex else b""
+    except Exception:
+        raise ValueError("data_hex must be hex string")
+
+    return dest, header, payload
+
+
+MAX_BATCH_STEPS = 256
+
+
+def _parse_batch(data) -> BatchJob:
+    """Build a BatchJob from {steps: [...], stop_on_error} or a bare list of steps.
+
+    Step: {dest, header, data_hex, delay_ms=0, wait_reply=false, timeout_ms=500, retries=0}.
+    Raises ValueError with a client-facing message (naming the step).
+    """
+    if isinstance(data, list):
+        data = {"steps": data}
+    steps = data.get("steps") if isinstance(data, dict) else None
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("steps must be a non-empty list")
+    if len(steps) > MAX_BATCH_STEPS:
+        raise ValueError(f"at most {MAX_BATCH_STEPS} steps per batch")
+
+    jobs, delays = [], []
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict):
+            raise ValueError(f"step {i}: must be an object")
+        try:
+            dest, header, payload = _parse_send_args(step)
+        except ValueError as e:
+            raise ValueError(f"step {i}: {e}")
+        try:
+            delay_ms = float(step.get("delay_ms", 0))
+            timeout_ms = float(step.get("timeout_ms", 500))
+            retries = int(step.get("retries", 0))
+        except Exception:
+            raise ValueError(f"step {i}: delay_ms/timeout_ms/retries must be numbers")
+        wait_reply = bool(step.get("wait_reply", False))
+        jobs.append(TxJob(
+            dest, header, payload,
+            priority=PRIORITY_OPERATOR,
+            wait_reply=wait_reply,
+            timeout=max(0.01, min(timeout_ms, 10_000.0)) / 1000.0,
+            retries=max(0, min(retries, 10)) if wait_reply else 0,
+        ))
+        delays.append(max(0.0, min(delay_ms, 10_000.0)) / 1000.0)
+    return BatchJob(jobs, delays, stop_on_error=bool(data.get("stop_on_error", True)))
+
+
+def _compact_arg() -> bool:
+    """?format=json (default) or ?format=compact; raises ValueError otherwise."""
+    fmt = (request.args.get("format") or "json").lower()
+    if fmt not in ("json", "compact"):
+        raise ValueError("format must be json or compact")
+    return fmt == "compact"
 
 
 def create_app() -> Flask:
@@ -51,29 +116,34 @@ def create_app() -> Flask:
     app.logger.handlers = logger.handlers
     app.logger.setLevel(logger.level)
 
-    # defaults
-    com_port = os.getenv("COM_PORT", "COM4")
-    baudrate = int(os.getenv("BAUDRATE", "9600"))
-    ser_timeout = float(os.getenv("SER_TIMEOUT", "0.1"))
-    host_address = int(os.getenv("HOST_ADDRESS", "1"))
-
-    # devices
-    _load_devices_json(os.path.join(base_dir, "devices.json"), logger)
-
-    # state config
-    STATE.set_config(port=com_port, baud=baudrate, validate_checksum=STATE.validate_checksum)
-
-    # controller (single instance per process)
-    controller = Controller(
-        port=com_port,
-        baudrate=baudrate,
-        timeout=ser_timeout,
-        host_address=host_address,
-        logger=logger,
-    )
+    # defaults (per-bus settings in buses.json / BUSES override these)
+    defaults = {
+        "port": os.getenv("COM_PORT", "COM4"),
+        "baud": int(os.getenv("BAUDRATE", "9600")),
+        "timeout": float(os.getenv("SER_TIMEOUT", "0.1")),
+        "rx_mode": os.getenv("RX_MODE", "event").strip().lower() or "event",
+        "host_address": int(os.getenv("HOST_ADDRESS", "1")),
+    }
+    frame_history = int(os.getenv("FRAME_HISTORY", "5000"))
+    capture_dir = os.getenv("CAPTURE_DIR", "").strip()
+
+    # a woken RX thread waits for the GIL until the running thread's time
+    # slice ends (5 ms by default); a shorter one cuts that tail under load
+    switch_ms = os.getenv("SWITCH_INTERVAL_MS", "").strip()
+    if switch_ms:
+        sys.setswitchinterval(float(switch_ms) / 1000.0)
+
+    # buses: each has its own state, event hub and controller thread
+    buses = build_buses(base_dir, defaults, logger, frame_history=frame_history, capture_dir=capture_dir)
+    atexit.register(buses.stop)
+    app.extensions["cctalk_buses"] = buses
 
     if _should_start_thread():
-        controller.start()
+        buses.start()
+
+    # encoded bodies of the polled GET endpoints, revalidated by state version
+    responses = ResponseCache()
+    app.extensions["cctalk_responses"] = responses
 
     # ---------- UI ----------
     @app.get("/")
@@ -85,30 +155,167 @@ def create_app() -> Flask:
         return send_from_directory(os.path.join(ui_dir, "pages"), path)
 
     # ---------- API ----------
-    @app.get("/api/status")
+    # Every route below exists twice: /api/... (default bus) and
+    # /api/bus/<bus_id>/... for any configured g.bus.
+    api = Blueprint("api", __name__)
+
+    @api.url_value_preprocessor
+    def _select_bus(endpoint, values):
+        bus_id = (values or {}).pop("bus_id", None)
+        bus = buses.default if bus_id is None else buses.get(bus_id)
+        if bus is None:
+            abort(make_response(jsonify({"ok": False, "error": f"unknown bus {bus_id!r}"}), 404))
+        g.bus = bus
+
+    @api.get("/status")
     def api_status():
-        return jsonify(STATE.snapshot())
+        # ?since=<seq> returns only newer frames; ?devices_rev=<n> skips an unchanged device list;
+        # ?format=compact sends the frames columnar (app.core.compact)
+        since = request.args.get("since", type=int)
+        devices_rev = request.args.get("devices_rev", type=int)
+        try:
+            compact = _compact_arg()
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        bus = g.bus
+        version = bus.state.version()
+        _, rev, seq, _ = version
+        # the reply depends on the query only through how many of the newest
+        # frames it gets and whether it carries the device list, so that is
+        # the key: all caught-up pollers share one entry per state version
+        limit = 200
+        newest = limit if since is None else max(0, min(limit, seq - since))
+        with_devices = devices_rev != rev
+        return responses.respond(
+            ("status", bus.id, newest, with_devices, compact),
+            version,
+            lambda: bus.state.snapshot(since=seq - newest, devices_rev=None if with_devices else rev,
+                                       limit=limit, compact=compact),
+        )
+
+    @api.get("/connection")
+    def api_connection():
+        state = g.bus.state
+        return responses.respond(("connection", g.bus.id), state.version(), state.connection)
+
+    @api.get("/ports")
+    def api_ports():
+        # cached port table from the monitor thread; ?refresh=1 enumerates now
+        bus = g.bus
+        if request.args.get("refresh", type=int):
+            PORTS.enumerate()
+        out = PORTS.snapshot()
+        out["current"] = bus.controller.port
+        out["present"] = PORTS.present(bus.controller.port)
+        return jsonify(out)
+
+    @api.get("/rx_stats")
+    def api_rx_stats():
+        # RX mode, per-stage latency (read -> parse/store/match) and parser counters
+        return jsonify(g.bus.controller.rx_stats())
+
+    @api.get("/frames")
+    def api_frames():
+        """
+        Search the in-memory frame history (newest matches first, returned oldest first).
+        Filters: dir=RX|TX, addr (src, dest or addr), header, start/end (unix ts),
+        text (hex substring or header/device name). Paging: since=<seq> for newer
+        frames, before=<next_before> for the next older page. format=compact
+        returns the frames columnar.
+        """
+        args = request.args
+        direction = (args.get("dir") or "").upper() or None
+        if direction not in (None, "RX", "TX"):
+            return jsonify({"ok": False, "error": "dir must be RX or TX"}), 400
+        try:
+            res = g.bus.state.query_frames(
+                direction=direction,
+                addr=args.get("addr", type=int),
+                header=args.get("header", type=int),
+                start=args.get("start", type=float),
+                end=args.get("end", type=float),
+                text=args.get("text") or None,
+                since=args.get("since", type=int),
+                before=args.get("before", type=int),
+                limit=max(1, min(args.get("limit", 200, type=int), 1000)),
+                compact=_compact_arg(),
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        return jsonify(res)
+
+    @api.get("/stream")
+    def api_stream():
+        """
+        Server-Sent Events: one "snapshot" event (same shape as /api/status),
+        then "frames", "status" and "devices" events as the bus state changes,
+        and "coin_events" (see /api/coin_events) as coin acceptors report them.
+        Pass ?since=<seq> when reconnecting to backfill missed frames, and
+        ?format=compact for columnar frames in the snapshot and every "frames"
+        event. Gzipped (flushed per message) when the client accepts it.
+        """
+        since = request.args.get("since", type=int)
+        try:
+            compact = _compact_arg()
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        state, hub = g.bus.state, g.bus.hub  # the generator runs outside the request context
+        sub = hub.subscribe(compact)  # subscribe before the snapshot so nothing falls in between
 
-    @app.get("/api/devices")
+        def gen():
+            try:
+                snap = state.snapshot(
+                    since=since, limit=state.frames.capacity if since is not None else 200, compact=compact
+                )
+                last_seq = snap["seq"]
+                yield b"retry: 1000\n\n" + sse_event("snapshot", snap)
+                while not sub.lagged:
+                    items = sub.get(timeout=15.0)
+                    if not items:
+                        yield b": ping\n\n"
+                        continue
+                    # frames batches already covered by the snapshot are skipped
+                    out = [msg for max_seq, msg in items if max_seq == 0 or max_seq > last_seq]
+                    if out:
+                        yield b"".join(out)
+            finally:
+                hub.unsubscribe(sub)
+
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+        body = gen()
+        if accepts_gzip():
+            body = gzip_stream(body)
+            headers["Content-Encoding"] = "gzip"
+        return Response(body, mimetype="text/event-stream", headers=headers)
+
+    @api.get("/devices")
     def api_devices():
-        return jsonify({"devices": STATE.devices})
+        state = g.bus.state
+        rev = state.devices_rev  # before the list: see AppState.snapshot
+        return responses.respond(("devices", g.bus.id), rev, lambda: {"devices": state.devices})
 
-    @app.get("/api/headers")
+    def _headers_payload():
+        data = [{"header": int(k), "name": str(v)} for k, v in HEADERS.items()]
+        data.sort(key=lambda x: x["header"])
+        return {"ok": True, "headers": data}
+
+    @api.get("/headers")
     def api_headers():
         """
         Return ccTalk header list for UI auto button generation (from app.core.thesaurus.HEADERS).
         """
-        data = [{"header": int(k), "name": str(v)} for k, v in HEADERS.items()]
-        data.sort(key=lambda x: x["header"])
-        return jsonify({"ok": True, "headers": data})
+        # the table is static: built and encoded once per process
+        return responses.respond(("headers",), 0, _headers_payload)
 
-    @app.route("/api/config", methods=["GET", "POST"])
+    @api.route("/config", methods=["GET", "POST"])
     def api_config():
+        bus = g.bus
         if request.method == "GET":
-            return jsonify({
-                "port": STATE.port,
-                "baud": STATE.baud,
-                "validate_checksum": STATE.validate_checksum,
+            state = bus.state
+            return responses.respond(("config", bus.id), state.status_rev, lambda: {
+                "port": state.port,
+                "baud": state.baud,
+                "validate_checksum": state.validate_checksum,
             })
 
         data = request.get_json(silent=True) or {}
@@ -117,71 +324,272 @@ def create_app() -> Flask:
         validate = data.get("validate_checksum")
         reconnect = bool(data.get("reconnect", False))
 
-        STATE.set_config(port=port, baud=baud, validate_checksum=validate)
+        bus.state.set_config(port=port, baud=baud, validate_checksum=validate)
 
         # IMPORTANT: do NOT auto reconnect unless explicitly requested.
         # This prevents "blinking" when UI polls /api/config.
         if reconnect:
-            controller.request_connect(STATE.port or com_port, STATE.baud or baudrate)
+            bus.controller.request_connect(bus.state.port or bus.default_port, bus.state.baud or bus.default_baud)
 
-        return jsonify({"ok": True, "applied": STATE.snapshot()})
+        return jsonify({"ok": True, "applied": bus.state.connection()})
 
-    @app.post("/api/connect")
+    @api.post("/connect")
     def api_connect():
+        bus = g.bus
         data = request.get_json(silent=True) or {}
-        port = (data.get("port") or STATE.port or com_port)
-        baud = int(data.get("baud") or STATE.baud or baudrate)
+        port = (data.get("port") or bus.state.port or bus.default_port)
+        baud = int(data.get("baud") or bus.state.baud or bus.default_baud)
 
-        STATE.set_config(port=port, baud=baud)
-        controller.request_connect(port, baud)
-        return jsonify({"ok": True, "status": STATE.snapshot()})
+        bus.state.set_config(port=port, baud=baud)
+        bus.controller.request_connect(port, baud)
+        return jsonify({"ok": True, "status": bus.state.connection()})
 
-    @app.post("/api/disconnect")
+    @api.post("/disconnect")
     def api_disconnect():
-        controller.request_disconnect()
-        return jsonify({"ok": True, "status": STATE.snapshot()})
+        bus = g.bus
+        bus.controller.request_disconnect()
+        return jsonify({"ok": True, "status": bus.state.connection()})
 
-    @app.post("/api/clear_log")
+    @api.post("/clear_log")
     def api_clear_log():
-        STATE.clear_frames()
+        g.bus.state.clear_frames()
         return jsonify({"ok": True})
 
-    @app.post("/api/send")
+    @api.post("/send")
     def api_send():
+        bus = g.bus
         data = request.get_json(silent=True) or {}
 
         try:
-            dest = int(data.get("dest"))
-        except Exception:
-            return jsonify({"ok": False, "error": "dest must be integer"}), 400
+            dest, header, payload = _parse_send_args(data)
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+
+        if not bus.state.connected:
+            return jsonify({"ok": False, "error": bus.state.last_error or "Serial disconnected"}), 400
+
+        # queued ahead of background polls; returns once the frame is on the wire
+        job = bus.controller.scheduler.submit(TxJob(dest, header, payload, priority=PRIORITY_OPERATOR))
+        if not job.sent.wait(5.0):
+            return jsonify({"ok": False, "error": "bus busy"}), 503
+        if job.tx is None:
+            return jsonify({"ok": False, "error": job.error or "send failed"}), 500
+        return jsonify({"ok": True, "tx": job.tx})
+
+    @api.post("/transact")
+    def api_transact():
+        """
+        Send one request and wait for the reply.
+        Body: {dest, header, data_hex, timeout_ms=500, retries=0}
+        Returns tx, reply (decoded), rtt_ms, attempts, echo; 504 on timeout.
+        """
+        bus = g.bus
+        data = request.get_json(silent=True) or {}
 
         try:
-            header = int(data.get("header", 254))
+            dest, header, payload = _parse_send_args(data)
+            timeout_ms = float(data.get("timeout_ms", 500))
+            retries = int(data.get("retries", 0))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
         except Exception:
-            return jsonify({"ok": False, "error": "header must be integer"}), 400
+            return jsonify({"ok": False, "error": "timeout_ms/retries must be numbers"}), 400
+
+        if not bus.state.connected:
+            return jsonify({"ok": False, "error": bus.state.last_error or "Serial disconnected"}), 400
+
+        job = bus.controller.scheduler.submit(TxJob(
+            dest, header, payload,
+            priority=PRIORITY_OPERATOR,
+            wait_reply=True,
+            timeout=max(0.01, min(timeout_ms, 10_000.0)) / 1000.0,
+            retries=max(0, min(retries, 10)),
+        ))
+        if not job.done.wait(job.timeout * (job.retries + 1) + 10.0):
+            return jsonify({"ok": False, "error": "bus busy"}), 503
+        if job.result is None:
+            return jsonify({"ok": False, "error": job.error or "send failed"}), 500
+
+        out = job.result
+        if out["timeout"]:
+            return jsonify({"ok": False, "error": "timeout", **out}), 504
+        return jsonify({"ok": True, **out})
+
+    @api.post("/send_batch")
+    def api_send_batch():
+        """
+        Run an ordered list of requests in one go while holding the bus.
+        Body: {steps: [{dest, header, data_hex, delay_ms=0, wait_reply=false,
+        timeout_ms=500, retries=0}, ...], stop_on_error=true} (or just the list).
+        delay_ms is measured from the end of the previous step. Returns one
+        result per step (tx, reply/rtt_ms for wait_reply steps, t_ms from the
+        batch start, duration_ms, error); ok is false if any step failed.
+        If the bus stays busy too long the batch is cancelled (503,
+        "started": false: nothing was sent, safe to retry); if it had already
+        started it keeps running ("started": true, steps so far): do not
+        resend it.
+        """
+        bus = g.bus
+        try:
+            batch = _parse_batch(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+
+        if not bus.state.connected:
+            return jsonify({"ok": False, "error": bus.state.last_error or "Serial disconnected"}), 400
+
+        bus.controller.scheduler.submit_batch(batch)
+        if not batch.done.wait(batch.max_duration() + 10.0):
+            if batch.cancel():
+                return jsonify({"ok": False, "error": "bus busy, batch cancelled", "started": False}), 503
+            return jsonify({
+                "ok": False,
+                "error": "bus busy, batch started late and is still running",
+                "started": True,
+                "steps": list(batch.results),
+            }), 503
+
+        failed = next((r for r in batch.results if not r["ok"]), None)
+        out = {
+            "ok": failed is None,
+            "steps": batch.results,
+            "elapsed_ms": round(batch.elapsed * 1000.0, 3),
+        }
+        if failed is not None:
+            out["error"] = f"step {failed['index']}: {failed.get('error') or 'failed'}"
+        return jsonify(out)
+
+    @api.route("/polls", methods=["GET", "POST"])
+    def api_polls():
+        """
+        Recurring background polls run by the bus scheduler.
+        POST body: {dest, header, data_hex, interval_ms=250, timeout_ms=250}
+        """
+        bus = g.bus
+        if request.method == "GET":
+            return jsonify({"ok": True, "polls": bus.controller.scheduler.polls()})
 
-        payload_hex = (data.get("data_hex") or "").strip()
+        data = request.get_json(silent=True) or {}
         try:
-            payload = bytes.fromhex(payload_hex) if payload_hex else b""
+            dest, header, payload = _parse_send_args(data)
+            interval_ms = float(data.get("interval_ms", 250))
+            timeout_ms = float(data.get("timeout_ms", 250))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
         except Exception:
-            return jsonify({"ok": False, "error": "data_hex must be hex string"}), 400
-
-        if not STATE.connected:
-            return jsonify({"ok": False, "error": STATE.last_error or "Serial disconnected"}), 400
+            return jsonify({"ok": False, "error": "interval_ms/timeout_ms must be numbers"}), 400
+
+        poll = bus.controller.scheduler.add_poll(
+            dest, header, payload,
+            interval=max(10.0, interval_ms) / 1000.0,
+            timeout=max(10.0, min(timeout_ms, 10_000.0)) / 1000.0,
+        )
+        return jsonify({"ok": True, "poll": poll.to_dict()})
+
+    @api.delete("/polls/<int:poll_id>")
+    def api_poll_delete(poll_id: int):
+        if not g.bus.controller.scheduler.remove_poll(poll_id):
+            return jsonify({"ok": False, "error": "no such poll"}), 404
+        return jsonify({"ok": True})
 
+    @api.get("/coin_events")
+    def api_coin_events():
+        """
+        Coin acceptor credits/errors decoded from header 229 replies, each once.
+        Query: since=<id> (only newer events), addr, limit=200 (max 1000).
+        Poll header 229 (e.g. via /api/polls) to feed it.
+        """
+        args = request.args
+        res = g.bus.coin_events.events(
+            since=args.get("since", 0, type=int),
+            addr=args.get("addr", type=int),
+            limit=max(1, min(args.get("limit", 200, type=int), 1000)),
+        )
+        return jsonify({"ok": True, **res})
+
+    @api.get("/coin_events/totals")
+    def api_coin_totals():
+        # per-device running totals: credits by coin code, errors by code, lost, resets
+        return jsonify({"ok": True, "devices": g.bus.coin_events.totals()})
+
+    @api.post("/coin_events/reset")
+    def api_coin_reset():
+        """Body: {addr} to reset one device's totals, {} for all."""
+        data = request.get_json(silent=True) or {}
         try:
-            out = controller.device.send(dest, header, payload)
-            return jsonify({"ok": True, "tx": out})
-        except (SerialException, OSError) as e:
-            STATE.set_connected(False, str(e))
-            try:
-                controller.sio.close()
-            except Exception:
-                pass
-            return jsonify({"ok": False, "error": str(e)}), 500
-        except Exception as e:
-            return jsonify({"ok": False, "error": str(e)}), 500
+            addr = None if data.get("addr") is None else int(data["addr"])
+        except Exception:
+            return jsonify({"ok": False, "error": "addr must be integer"}), 400
+        g.bus.coin_events.reset(addr)
+        return jsonify({"ok": True})
 
+    @api.get("/scan")
+    def api_scan():
+        return jsonify({"ok": True, "scan": g.bus.controller.scanner.progress()})
 
+    @api.post("/scan/start")
+    def api_scan_start():
+        """
+        Body: {start=1, end=255, timeout_ms=150, identify=false}
+        Sends simple poll to each address; responders are added to devices.
+        """
+        bus = g.bus
+        data = request.get_json(silent=True) or {}
+        try:
+            start = int(data.get("start", 1))
+            end = int(data.get("end", 255))
+            timeout_ms = float(data.get("timeout_ms", 150))
+        except Exception:
+            return jsonify({"ok": False, "error": "start/end/timeout_ms must be numbers"}), 400
+
+        if not bus.state.connected:
+            return jsonify({"ok": False, "error": bus.state.last_error or "Serial disconnected"}), 400
+
+        started = bus.controller.scanner.start(
+            start, end,
+            timeout=max(10.0, min(timeout_ms, 5_000.0)) / 1000.0,
+            identify=bool(data.get("identify", False)),
+        )
+        if not started:
+            return jsonify({"ok": False, "error": "scan already running", "scan": bus.controller.scanner.progress()}), 409
+        return jsonify({"ok": True, "scan": bus.controller.scanner.progress()})
+
+    @api.post("/scan/stop")
+    def api_scan_stop():
+        bus = g.bus
+        bus.controller.scanner.stop()
+        return jsonify({"ok": True, "scan": bus.controller.scanner.progress()})
+
+    app.register_blueprint(api, url_prefix="/api")
+    app.register_blueprint(api, url_prefix="/api/bus/<bus_id>", name="bus_api")
+
+    @app.get("/api/buses")
+    def api_buses():
+        return jsonify({"ok": True, "default": buses.default.id, "buses": buses.to_list()})
+
+    # ---------- metrics ----------
+    log_dropped = METRICS.gauge("cctalk_log_records_dropped", "Log records dropped because the log queue was full.")
+    log_dropped.add_source(lambda: {(): logging_stats()["dropped"]}, key="logging")
+
+    @app.before_request
+    def _request_started():
+        g.t_request = time.perf_counter()
+
+    @app.after_request
+    def _request_finished(response):
+        t0 = g.get("t_request")
+        if t0 is not None and request.path.startswith("/api/"):
+            HTTP_DURATION.labels(request.endpoint or "unmatched", request.method, response.status_code).observe(
+                time.perf_counter() - t0
+            )
+        return response
+
+    # registered after the timing hook so it runs first and is included in the duration
+    app.after_request(compress_response)
+
+    @app.get("/api/metrics")
+    def api_metrics():
+        """Prometheus text exposition of all buses' counters and histograms."""
+        return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
 
     return app
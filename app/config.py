@@ -5,9 +5,32 @@ class Config:
     COM_PORT = os.getenv("COM_PORT", "COM4")
     BAUDRATE = int(os.getenv("BAUDRATE", "9600"))
     SER_TIMEOUT = float(os.getenv("SER_TIMEOUT", "0.1"))
+    # "event" (block for bytes, store frames immediately), "poll" (legacy 10 ms cycle)
+    # or "process" (separate capture process + shared-memory ring, see app/core/bus_process.py)
+    RX_MODE = os.getenv("RX_MODE", "event")
 
     # ccTalk addressing
     HOST_ADDRESS = int(os.getenv("HOST_ADDRESS", "1"))
 
+    # Several buses: JSON, path to a buses.json, or "a=/dev/ttyUSB0@9600,b=COM5"
+    # (empty = buses.json if present, else one bus from the values above); see app/core/buses.py
+    BUSES = os.getenv("BUSES", "")
+
+    # Frame history kept in memory (ring buffer capacity)
+    FRAME_HISTORY = int(os.getenv("FRAME_HISTORY", "5000"))
+
+    # Python thread switch interval in ms (empty = Python's 5 ms); ~0.5 keeps
+    # the RX -> API p95 under 5 ms while request threads are busy
+    SWITCH_INTERVAL_MS = os.getenv("SWITCH_INTERVAL_MS", "")
+
+    # Binary frame capture directory (empty = off); see app/core/capture.py
+    CAPTURE_DIR = os.getenv("CAPTURE_DIR", "")
+
+    # Web server: "dev" (Werkzeug) or "production" (waitress); see app/server.py
+    SERVER = os.getenv("SERVER", "dev")
+    WEB_THREADS = int(os.getenv("WEB_THREADS", "16"))
+    WEB_IDLE_TIMEOUT = int(os.getenv("WEB_IDLE_TIMEOUT", "60"))
+    WEB_CONNECTIONS = int(os.getenv("WEB_CONNECTIONS", "100"))
+
     # Runtime
     START_CONTROLLER = os.getenv("START_CONTROLLER", "1") == "1"
\ No newline at end of file
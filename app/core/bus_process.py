@@ -0,0 +1,522 @@
+"""
+Process-per-bus capture (RX_MODE / rx_mode = "process").
+
+A worker process owns the serial port: it reads, runs FrameParser and
+writes every RX frame into a shared-memory ring (app/core/shm_ring.py).
+The web process only follows that ring, so GIL pressure, a slow client or
+a stuck request handler can delay frames reaching the UI but can never stop
+the port from being drained (no driver buffer overrun, no lost bytes).
+
+Web process -> worker: a multiprocessing queue of small commands
+("tx", connect/disconnect, presence changes, checksum mode, stop).
+Worker -> web process: the ring for frames, a wake-up Event, and a status
+queue for open/close/error notices (logged by the web process, so there is
+still one session log).
+"""
+from __future__ import annotations
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from serial.serialutil import SerialException
+
+from .cctalk import FrameParser
+from .controller import INTER_BYTE_TIMEOUT, RxTiming
+from .device_controller import DeviceController
+from .metrics import CHECKSUM_FAILURES, DISCARDED, RECONNECTS, RESYNCS, RX_BYTES, TX_BYTES
+from .port_monitor import PORTS
+from .scanner import AddressScanner
+from .scheduler import BusScheduler
+from .serial_io import SerialIO
+from .shm_ring import ShmRing
+from .state import STATE, AppState, FrameRecord
+
+RING_SLOTS = 16384
+
+
+# ---------------------------------------------------------------------------
+# worker process
+# ---------------------------------------------------------------------------
+
+class _Worker:
+    """Serial reader running inside the capture process."""
+
+    def __init__(self, port, baudrate, timeout, ring, commands, events, wake, strict, inter_byte_timeout):
+        self.port = str(port)
+        self.baudrate = int(baudrate)
+        self.timeout = float(timeout)
+        self.ring = ring
+        self.commands = commands
+        self.events = events
+        self.wake = wake
+        self.inter_byte_timeout = float(inter_byte_timeout)
+
+        self.sio = SerialIO(self.port, self.baudrate, self.timeout)
+        self.parser = FrameParser(strict=strict)
+        self.partial_timeouts = 0
+        self.seq = ring.write_seq
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._want_disconnect = False
+        self._want_reconnect = True
+        self._present = True
+
+    def _notify(self, *event) -> None:
+        self.events.put(event)
+        self.wake.set()
+
+    def _close(self) -> None:
+        try:
+            self.sio.close()
+        except Exception:
+            pass
+
+    # ---------- commands (own thread) ----------
+    def _commands(self) -> None:
+        while not self._stop.is_set():
+            try:
+                cmd = self.commands.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            kind = cmd[0]
+            if kind == "tx":
+                try:
+                    if not self.sio.write(cmd[1]):
+                        self._notify("dropped", len(cmd[1]))
+                except (SerialException, OSError) as e:
+                    self._notify("error", f"Serial write failed: {e}")
+            elif kind == "connect":
+                with self._lock:
+                    self.port, self.baudrate = str(cmd[1]), int(cmd[2])
+                    self._want_disconnect = False
+                    self._want_reconnect = True
+                self.sio.cancel_read()
+            elif kind == "disconnect":
+                with self._lock:
+                    self._want_disconnect = True
+                    self._want_reconnect = False
+                self.sio.cancel_read()
+            elif kind == "present":
+                with self._lock:
+                    self._present = bool(cmd[1])
+                    if self._present and not self._want_disconnect:
+                        self._want_reconnect = True
+                if not cmd[1]:
+                    self.sio.cancel_read()
+            elif kind == "strict":
+                self.parser.strict = bool(cmd[1])
+            elif kind == "stop":
+                self._stop.set()
+                self.sio.cancel_read()
+
+    # ---------- RX loop (main thread) ----------
+    def run(self) -> None:
+        threading.Thread(target=self._commands, name="bus-worker-cmd", daemon=True).start()
+        parent = mp.parent_process()
+        backoff = 1.0
+        t_last_byte = 0.0
+        next_parent_check = 0.0
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_parent_check:
+                # never outlive the web process (e.g. killed without cleanup)
+                if parent is not None and not parent.is_alive():
+                    break
+                next_parent_check = now + 1.0
+
+            with self._lock:
+                want_disc = self._want_disconnect
+                want_reconn = self._want_reconnect
+                present = self._present
+
+            if want_disc or not present:
+                if self.sio.is_open:
+                    self._close()
+                    self._notify("closed", None)
+                time.sleep(0.1)
+                continue
+
+            if want_reconn or not self.sio.is_open:
+                self._close()
+                self.sio = SerialIO(self.port, self.baudrate, self.timeout)
+                try:
+                    self.sio.open()
+                except Exception as e:
+                    self._notify("error", str(e))
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 1.6, 10.0)
+                    continue
+                self.parser.reset()
+                with self._lock:
+                    self._want_reconnect = False
+                self._notify("open", self.port, self.baudrate)
+                backoff = 1.0
+
+            try:
+                chunk = self.sio.read_available()
+                t_rx = time.perf_counter()
+            except (SerialException, OSError) as e:
+                self._close()
+                self._notify("error", f"Serial error ({e}). Reconnecting...")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 1.6, 10.0)
+                continue
+
+            if not chunk:
+                continue
+
+            ts = time.time()
+            parser = self.parser
+            if parser.pending and t_rx - t_last_byte > self.inter_byte_timeout:
+                self.partial_timeouts += 1
+                parser.reset()
+            t_last_byte = t_rx
+
+            resyncs = parser.resyncs
+            frames = parser.feed(chunk)
+            for fr in frames:
+                self.seq += 1
+                self.ring.write(self.seq, ts, t_rx, 0, fr[2], fr)
+            self.ring.set_counters(parser.frames, parser.discarded, parser.resyncs, self.partial_timeouts)
+            if parser.resyncs != resyncs:
+                self._notify("resync", parser.discarded)
+            if frames:
+                self.wake.set()
+
+        self._close()
+
+
+def worker_main(port, baudrate, timeout, ring_name, commands, events, wake, strict,
+                inter_byte_timeout=INTER_BYTE_TIMEOUT) -> None:
+    """Entry point of the capture process."""
+    ring = ShmRing.attach(ring_name)
+    try:
+        _Worker(port, baudrate, timeout, ring, commands, events, wake, strict, inter_byte_timeout).run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+# ---------------------------------------------------------------------------
+# web process side
+# ---------------------------------------------------------------------------
+
+class WorkerSerial:
+    """SerialIO stand-in for DeviceController: writes are forwarded to the worker."""
+
+    def __init__(self, commands, bus: str = "default"):
+        self.commands = commands
+        self.is_open = False  # mirrored from worker status events
+        self._m_tx = TX_BYTES.labels(bus)
+
+    def write(self, data: bytes) -> int:
+        if not self.is_open:
+            return 0
+        self.commands.put(("tx", bytes(data)))
+        self._m_tx.inc(len(data))
+        return len(data)
+
+    def close(self) -> None:
+        # the worker owns the port and reopens it after errors on its own
+        pass
+
+    def cancel_read(self) -> None:
+        pass
+
+
+class ProcessController:
+    """Controller variant whose RX runs in a dedicated capture process.
+
+    Same surface as Controller (state, device, scheduler, scanner,
+    request_connect/request_disconnect, rx_stats), so routes, scans and
+    polls work unchanged. A reader thread follows the shared-memory ring
+    and does what the Controller RX loop does with each frame: store it,
+    hand it to DeviceController for transaction matching and log it.
+
+    rx_stats() stages are measured from the worker's read(), so "parse"
+    includes the hand-off between the processes. If the web process falls
+    more than `ring_slots` frames behind, the oldest are counted as `lost`
+    (the capture process itself never waits for the web process). A worker
+    that dies is restarted.
+    """
+
+    def __init__(
+        self,
+        port: str,
+        baudrate: int = 9600,
+        timeout: float = 0.1,
+        host_address: int = 1,
+        logger=None,
+        state: Optional[AppState] = None,
+        ring_slots: int = RING_SLOTS,
+        inter_byte_timeout: float = INTER_BYTE_TIMEOUT,
+        bus_id: str = "default",
+    ):
+        self.logger = logger
+        self.state = state if state is not None else STATE
+        self.bus_id = str(bus_id)
+        # the worker's own SerialIO counters live in its process; these are
+        # maintained here from the ring (RX bytes = bytes of parsed frames)
+        self._m_rx = RX_BYTES.labels(self.bus_id)
+        self._m_reconnects = RECONNECTS.labels(self.bus_id)
+        self._m_checksum = CHECKSUM_FAILURES.labels(self.bus_id)
+        self._m_resyncs = RESYNCS.labels(self.bus_id)
+        self._m_discarded = DISCARDED.labels(self.bus_id)
+        self._opened = 0
+        self._seen_counters = {"resyncs": 0, "discarded": 0}
+        self.rx_mode = "process"
+        self.rx_timing = RxTiming()
+        self.inter_byte_timeout = float(inter_byte_timeout)
+        self.ring_slots = int(ring_slots)
+
+        self.port = str(port)
+        self.baudrate = int(baudrate)
+        self.timeout = float(timeout)
+        self.host_address = int(host_address)
+
+        # spawn: the worker must not inherit the web server's threads and locks
+        self._ctx = mp.get_context("spawn")
+        self._commands = self._ctx.Queue()
+        self._events = self._ctx.Queue()
+        self._wake = self._ctx.Event()
+
+        self.sio = WorkerSerial(self._commands, bus=self.bus_id)
+        self.device = DeviceController(
+            self.sio, logger=self.logger, host_address=self.host_address, state=self.state, bus_id=self.bus_id
+        )
+        self.scheduler = BusScheduler(self, logger=self.logger)
+        self.scanner = AddressScanner(self, logger=self.logger)
+
+        self.ring: Optional[ShmRing] = None
+        self._proc = None
+        self._stop = threading.Event()
+        self._reader: Optional[threading.Thread] = None
+        self._cfg_lock = threading.Lock()
+        self._next_seq = 1
+        self._strict = self.state.validate_checksum
+        self._want_disconnect = False
+        self.lost = 0
+        self.restarts = 0
+
+        if self.logger:
+            self.logger.info(
+                "Controller init: port=%s baud=%s timeout=%s host=%s rx=process",
+                self.port,
+                self.baudrate,
+                self.timeout,
+                self.host_address,
+            )
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        if self._reader and self._reader.is_alive():
+            return
+        self._stop.clear()
+        if self.ring is None:
+            self.ring = ShmRing.create(self.ring_slots)
+            self._next_seq = self.ring.write_seq + 1
+        if PORTS.logger is None:
+            PORTS.logger = self.logger
+        PORTS.start()
+        present = PORTS.watch(self.port, self._on_port_change)
+        self._spawn()
+        if not present:
+            self._on_port_change(self.port, False)
+        self._reader = threading.Thread(target=self._loop, name="bus-ring-reader", daemon=True)
+        self._reader.start()
+        self.scheduler.start()
+
+    def stop(self) -> None:
+        PORTS.unwatch(self.port, self._on_port_change)
+        self.scanner.stop()
+        self.scheduler.stop()
+        self._stop.set()
+        self._wake.set()
+        if self._reader and self._reader.is_alive():
+            self._reader.join(timeout=2.0)
+        self._reader = None
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            self._commands.put(("stop",))
+            proc.join(timeout=2.0)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(timeout=1.0)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        self.sio.is_open = False
+        self.state.set_connected(False, "stopped")
+
+    def _spawn(self) -> None:
+        with self._cfg_lock:
+            port, baud = self.port, self.baudrate
+            disconnected = self._want_disconnect
+        self._strict = self.state.validate_checksum
+        if self._proc is not None:
+            # a killed worker may still hold the old queues' internal locks
+            self._commands = self._ctx.Queue()
+            self._events = self._ctx.Queue()
+            self.sio.commands = self._commands
+        self._proc = self._ctx.Process(
+            target=worker_main,
+            args=(port, baud, self.timeout, self.ring.name, self._commands, self._events,
+                  self._wake, self._strict, self.inter_byte_timeout),
+            name=f"bus-worker-{port}",
+            daemon=True,
+        )
+        self._proc.start()
+        if disconnected:
+            self._commands.put(("disconnect",))
+        if self.logger:
+            self.logger.info("Capture worker started (pid %s) for %s", self._proc.pid, port)
+
+    # ---------- control ----------
+    def request_disconnect(self) -> None:
+        with self._cfg_lock:
+            self._want_disconnect = True
+        self._commands.put(("disconnect",))
+        self.sio.is_open = False
+        self.state.set_connected(False, "manual disconnect")
+
+    def request_connect(self, port: str, baud: int) -> None:
+        with self._cfg_lock:
+            old_port = self.port
+            self.port = str(port)
+            self.baudrate = int(baud)
+            self._want_disconnect = False
+        if old_port != self.port and self._reader:
+            PORTS.unwatch(old_port, self._on_port_change)
+            if not PORTS.watch(self.port, self._on_port_change):
+                self._on_port_change(self.port, False)
+        self._commands.put(("connect", self.port, self.baudrate))
+        self.state.set_config(port=self.port, baud=self.baudrate)
+
+    def _on_port_change(self, port: str, present: bool) -> None:
+        self._commands.put(("present", present))
+        if present:
+            if self.logger:
+                self.logger.info("Port reappeared: %s", self.port)
+            return
+        self.sio.is_open = False
+        self.state.set_connected(False, f"Port removed: {self.port}")
+        if self.logger:
+            self.logger.warning("Port disappeared: %s", self.port)
+
+    def rx_stats(self) -> Dict[str, Any]:
+        stats = {"mode": self.rx_mode, **self.rx_timing.snapshot(), "lost": self.lost}
+        ring = self.ring
+        if ring is not None:
+            counters = ring.counters()
+            stats["partial_timeouts"] = counters.pop("partial_timeouts")
+            stats["parser"] = counters
+            stats["ring"] = {"slots": ring.slots, "write_seq": ring.write_seq, "read_seq": self._next_seq - 1}
+        proc = self._proc
+        stats["worker"] = {
+            "pid": proc.pid if proc else None,
+            "alive": bool(proc and proc.is_alive()),
+            "restarts": self.restarts,
+        }
+        return stats
+
+    # ---------- ring reader ----------
+    def _on_event(self, event) -> None:
+        kind = event[0]
+        if kind == "open":
+            if self._opened:
+                self._m_reconnects.inc()
+            self._opened += 1
+            self.sio.is_open = True
+            self.state.set_config(port=event[1], baud=event[2])
+            self.state.set_connected(True, None)
+            if self.logger:
+                self.logger.info("Serial opened %s @ %s", event[1], event[2])
+        elif kind == "closed":
+            self.sio.is_open = False
+        elif kind == "error":
+            self.sio.is_open = False
+            self.state.set_connected(False, event[1])
+            if self.logger:
+                self.logger.warning("%s", event[1])
+        elif kind == "resync":
+            if self.logger:
+                self.logger.warning("RX resync (discarded %d bytes total)", event[1])
+        elif kind == "dropped":
+            if self.logger:
+                self.logger.warning("TX dropped (%d bytes): port not open", event[1])
+
+    def _drain_ring(self) -> None:
+        ring = self.ring
+        records, self._next_seq, lost = ring.read(self._next_seq)
+        t_read = time.perf_counter()
+        state = self.state
+        device = self.device
+        logger = self.logger
+        lenient = not self._strict
+        for _seq, ts, t_rx, _direction, addr, raw in records:
+            self._m_rx.inc(len(raw))
+            if lenient and sum(raw) & 0xFF:
+                self._m_checksum.inc()
+            state.add_frame(FrameRecord(ts=ts, direction="RX", addr=addr, raw=raw))
+            t_store = time.perf_counter()
+            device.on_rx_frame(raw, t_rx)
+            self.rx_timing.add(t_rx, t_read, t_store, time.perf_counter())
+            if logger:
+                logger.info("RX %s", raw.hex())
+        counters = ring.counters()
+        seen = self._seen_counters
+        if counters["resyncs"] < seen["resyncs"] or counters["discarded"] < seen["discarded"]:
+            seen.update(resyncs=0, discarded=0)  # restarted worker counts from zero
+        if counters["resyncs"] != seen["resyncs"]:
+            n = counters["resyncs"] - seen["resyncs"]
+            self._m_resyncs.inc(n)
+            self._m_checksum.inc(n)
+        self._m_discarded.inc(counters["discarded"] - seen["discarded"])
+        seen.update(resyncs=counters["resyncs"], discarded=counters["discarded"])
+        if lost:
+            self.lost += lost
+            if logger:
+                logger.warning("RX ring overrun: %d frames lost (reader too slow)", lost)
+
+    def _loop(self) -> None:
+        restart_at = 0.0
+        while not self._stop.is_set():
+            self._wake.wait(0.2)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            while True:
+                try:
+                    self._on_event(self._events.get_nowait())
+                except queue.Empty:
+                    break
+
+            strict = self.state.validate_checksum
+            if strict != self._strict:
+                self._strict = strict
+                self._commands.put(("strict", strict))
+
+            self._drain_ring()
+
+            proc = self._proc
+            if proc is not None and not proc.is_alive():
+                now = time.monotonic()
+                if not restart_at:
+                    self.sio.is_open = False
+                    self.state.set_connected(False, f"capture worker exited ({proc.exitcode})")
+                    if self.logger:
+                        self.logger.warning("Capture worker exited (code %s); restarting", proc.exitcode)
+                    restart_at = now + 1.0
+                elif now >= restart_at:
+                    restart_at = 0.0
+                    self.restarts += 1
+                    self._spawn()
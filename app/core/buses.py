@@ -0,0 +1,293 @@
+"""
+Several ccTalk buses (one serial port each) in one process.
+
+Each Bus owns its AppState (frame ring, indexes, device table and lock),
+its EventHub, its Controller (RX thread, TX scheduler, scanner) and its
+coin acceptor event tracker, so buses share nothing on the frame path. The first configured bus uses the
+global STATE / HUB, which keeps single-bus setups exactly as before.
+
+Configuration (first match wins):
+  - BUSES env: JSON (list or {"buses": [...]}), a path to such a JSON file,
+    or a compact spec "a=/dev/ttyUSB0@9600,b=COM5"
+  - buses.json next to devices.json
+  - otherwise one bus "default" from COM_PORT / BAUDRATE / ...
+
+Per-bus keys: id, name, port, baud, timeout, host_address, rx_mode,
+devices (path to a devices.json-style file, default devices.json).
+rx_mode "process" reads the port in a separate capture process
+(app/core/bus_process.py) instead of an RX thread.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .bus_process import ProcessController
+from .capture import CaptureWriter
+from .coin_events import CoinEventTracker
+from .controller import Controller
+from .hub import HUB, EventHub
+from .metrics import CAPTURE_DROPPED, CONNECTED, FRAMES_STORED
+from .state import STATE, AppState
+
+BUS_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+
+class BusLogger(logging.LoggerAdapter):
+    """Prefixes messages with "[bus_id] " so one session log can hold several buses."""
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['bus']}] {msg}", kwargs
+
+
+def load_devices_file(state: AppState, path: str, logger=None) -> None:
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        state.load_devices(payload)
+        if logger:
+            logger.info("Loaded devices from %s (%d entries)", path, len(state.devices))
+    except Exception as e:
+        if logger:
+            logger.warning("Failed to load %s: %s", os.path.basename(path), e)
+
+
+def parse_bus_spec(spec: str) -> List[Dict[str, Any]]:
+    """ "a=/dev/ttyUSB0@9600,b=COM5" -> [{"id": "a", "port": ..., "baud": 9600}, {"id": "b", ...}] """
+    out: List[Dict[str, Any]] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        bus_id, sep, port = part.partition("=")
+        if not sep:
+            raise ValueError(f"bus spec {part!r}: expected id=port[@baud]")
+        cfg: Dict[str, Any] = {"id": bus_id.strip()}
+        port, _, baud = port.strip().partition("@")
+        cfg["port"] = port
+        if baud:
+            cfg["baud"] = int(baud)
+        out.append(cfg)
+    return out
+
+
+def load_bus_configs(base_dir: str, defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Bus configs with defaults applied (see module docstring for sources)."""
+    raw: Any = None
+    spec = os.getenv("BUSES", "").strip()
+    if spec:
+        if spec[0] in "[{":
+            raw = json.loads(spec)
+        else:
+            path = spec if os.path.isabs(spec) else os.path.join(base_dir, spec)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+            else:
+                raw = parse_bus_spec(spec)
+    else:
+        path = os.path.join(base_dir, "buses.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+
+    if isinstance(raw, dict):
+        raw = raw.get("buses")
+    if not raw:
+        raw = [{"id": "default"}]
+    if not isinstance(raw, list):
+        raise ValueError("bus config must be a list of buses")
+
+    configs: List[Dict[str, Any]] = []
+    seen = set()
+    for entry in raw:
+        if not isinstance(entry, dict):
+            raise ValueError("bus config entries must be objects")
+        cfg = {**defaults, **entry}
+        bus_id = str(cfg.get("id") or "").strip()
+        if not BUS_ID_RE.match(bus_id):
+            raise ValueError(f"invalid bus id {bus_id!r} (letters, digits, _ and -)")
+        if bus_id in seen:
+            raise ValueError(f"duplicate bus id {bus_id!r}")
+        seen.add(bus_id)
+        cfg["id"] = bus_id
+        cfg["name"] = str(cfg.get("name") or bus_id)
+        cfg["baud"] = int(cfg["baud"])
+        cfg["timeout"] = float(cfg["timeout"])
+        cfg["host_address"] = int(cfg["host_address"])
+        configs.append(cfg)
+    return configs
+
+
+class Bus:
+    """One configured bus: state + hub + controller + coin events (+ optional capture)."""
+
+    def __init__(self, cfg: Dict[str, Any], state: AppState, hub: EventHub,
+                 controller: Controller | ProcessController, capture: Optional[CaptureWriter] = None,
+                 coin_events: Optional[CoinEventTracker] = None):
+        self.id: str = cfg["id"]
+        self.name: str = cfg["name"]
+        self.cfg = cfg
+        self.state = state
+        self.hub = hub
+        self.controller = controller
+        self.capture = capture
+        self.coin_events = coin_events if coin_events is not None else CoinEventTracker(self.id)
+
+    @property
+    def default_port(self) -> str:
+        return str(self.cfg["port"])
+
+    @property
+    def default_baud(self) -> int:
+        return int(self.cfg["baud"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        conn = self.state.connection()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "port": conn["port"],
+            "baud": conn["baud"],
+            "connected": conn["connected"],
+            "last_error": conn["last_error"],
+            "seq": conn["seq"],
+        }
+
+
+class BusRegistry:
+    """Ordered set of buses; the first one is the default (/api/... without a bus id)."""
+
+    def __init__(self):
+        self._buses: Dict[str, Bus] = {}
+
+    def add(self, bus: Bus) -> None:
+        self._buses[bus.id] = bus
+
+    def get(self, bus_id: str) -> Optional[Bus]:
+        return self._buses.get(bus_id)
+
+    @property
+    def default(self) -> Bus:
+        return next(iter(self._buses.values()))
+
+    def __iter__(self) -> Iterator[Bus]:
+        return iter(list(self._buses.values()))
+
+    def __len__(self) -> int:
+        return len(self._buses)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [b.to_dict() for b in self]
+
+    def start(self) -> None:
+        for bus in self:
+            bus.controller.start()
+
+    def stop(self) -> None:
+        for bus in self:
+            bus.controller.stop()
+            if bus.capture:
+                bus.capture.close()
+
+
+# listeners the last build_buses() attached to the global STATE; a new
+# call detaches them first so the default bus never feeds a stale hub or
+# capture file, nor the same one twice
+_state_listeners: List[Callable[[str, Any], None]] = []
+
+
+def _attach(state: AppState, fn: Callable[[str, Any], None]) -> None:
+    state.add_listener(fn)
+    if state is STATE:
+        _state_listeners.append(fn)
+
+
+def build_buses(
+    base_dir: str,
+    defaults: Dict[str, Any],
+    logger: logging.Logger,
+    frame_history: int = 5000,
+    capture_dir: str = "",
+) -> BusRegistry:
+    registry = BusRegistry()
+    configs = load_bus_configs(base_dir, defaults)
+    multi = len(configs) > 1
+
+    for i, cfg in enumerate(configs):
+        if i == 0:
+            state, hub = STATE, HUB
+            state.set_bus_id(cfg["id"])
+            while _state_listeners:
+                state.remove_listener(_state_listeners.pop())
+        else:
+            state, hub = AppState(frame_history, bus_id=cfg["id"]), EventHub()
+        # with several buses every log line says which bus it came from
+        log = BusLogger(logger, {"bus": cfg["id"]}) if multi else logger
+
+        devices = cfg.get("devices") or "devices.json"
+        load_devices_file(state, devices if os.path.isabs(devices) else os.path.join(base_dir, devices), log)
+
+        state.set_frame_capacity(frame_history)
+        _attach(state, hub.publish)
+        hub.set_frame_encoder(state.frames_out)
+
+        capture = None
+        if capture_dir:
+            # binary capture (.cap/.idx), fed from every FrameRecord as it is stored
+            capture = CaptureWriter(os.path.join(base_dir, capture_dir),
+                                    prefix=f"capture-{cfg['id']}" if multi else "capture")
+            _attach(state, capture.on_state_event)
+            log.info("Binary capture to %s", capture.path)
+        state.set_config(port=cfg["port"], baud=cfg["baud"], validate_checksum=state.validate_checksum)
+
+        rx_mode = str(cfg.get("rx_mode") or "event").lower()
+        if rx_mode == "process":
+            controller = ProcessController(
+                port=cfg["port"],
+                baudrate=cfg["baud"],
+                timeout=cfg["timeout"],
+                host_address=cfg["host_address"],
+                logger=log,
+                state=state,
+                bus_id=cfg["id"],
+            )
+        else:
+            controller = Controller(
+                port=cfg["port"],
+                baudrate=cfg["baud"],
+                timeout=cfg["timeout"],
+                host_address=cfg["host_address"],
+                logger=log,
+                rx_mode=rx_mode,
+                state=state,
+                bus_id=cfg["id"],
+            )
+
+        # header 229 replies (from any poll, send or batch) -> credit/error events
+        coin_events = CoinEventTracker(cfg["id"])
+        coin_events.add_listener(hub.publish)
+        controller.device.add_reply_listener(coin_events.on_reply)
+
+        registry.add(Bus(cfg, state, hub, controller, capture, coin_events))
+
+    def connected():
+        return {(b.id,): int(b.state.connected) for b in registry}
+
+    def stored():
+        return {(b.id,): len(b.state.frames) for b in registry}
+
+    def capture_dropped():
+        return {(b.id,): b.capture.dropped for b in registry if b.capture}
+
+    # one source per gauge: a later registry replaces the previous one
+    CONNECTED.add_source(connected, key="buses")
+    FRAMES_STORED.add_source(stored, key="buses")
+    CAPTURE_DROPPED.add_source(capture_dropped, key="buses")
+
+    return registry
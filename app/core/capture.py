@@ -0,0 +1,365 @@
+"""
+Binary frame capture (.cap) with a sidecar block index (.idx).
+
+Capture file:
+  file header  32 bytes  "<8sHHd12x"  magic, version, record header size, created (unix ts)
+  records      12-byte fixed header "<QBBH" (ts in microseconds, direction
+               0=RX/1=TX, addr, raw length) followed by the raw frame bytes.
+
+Index file (written every BLOCK_RECORDS records and on close):
+  file header  16 bytes  "<8sII"     magic, version, records per block
+  entries      64 bytes  "<QQQII32s" first ts, last ts, file offset, record count,
+               reserved, 256-bit bitmap of addresses (src and dest) seen in the block
+
+ccTalk frames are 5..260 bytes, so the raw bytes follow the fixed header
+inline instead of padding every record to the maximum. The index lets a
+reader jump to a time range and skip blocks that never mention an address
+without scanning the file; a crash only loses the index for the last
+(partial) block, which the reader recovers by scanning from the last
+indexed offset.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterator, List, NamedTuple, Optional
+
+CAP_MAGIC = b"CCTCAP\x00\x01"
+IDX_MAGIC = b"CCTIDX\x00\x01"
+VERSION = 1
+
+FILE_HEADER = struct.Struct("<8sHHd12x")
+RECORD_HEADER = struct.Struct("<QBBH")
+INDEX_HEADER = struct.Struct("<8sII")
+INDEX_ENTRY = struct.Struct("<QQQII32s")
+
+BLOCK_RECORDS = 256
+
+DIRECTIONS = ("RX", "TX")
+
+
+class CaptureRecord(NamedTuple):
+    ts: float
+    direction: str
+    addr: int
+    raw: bytes
+
+
+class IndexBlock(NamedTuple):
+    first_us: int
+    last_us: int
+    offset: int
+    count: int
+    addrs: int  # bitmap as int: bit n set -> address n seen
+
+    def has_addr(self, addr: int) -> bool:
+        return bool(self.addrs >> int(addr) & 1)
+
+
+def index_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".idx"
+
+
+class CaptureWriter:
+    """Appends frames to a .cap file and maintains its .idx sidecar.
+
+    Intended to be registered as a STATE listener (on_state_event) so it
+    sees every FrameRecord at creation time. That runs on the RX thread, so
+    records are only put on a bounded queue there; a writer thread does the
+    file I/O. When the queue is full the record is dropped and counted
+    (`dropped`) instead of stalling serial reads. write() stays synchronous.
+
+    Output is buffered and flushed at least every `flush_interval` seconds.
+    When `max_bytes` is set the writer rolls over to a new timestamped
+    file in the same directory.
+    """
+
+    _SENTINEL = None
+
+    def __init__(self, directory: str, prefix: str = "capture", max_bytes: int = 256 * 1024 * 1024,
+                 flush_interval: float = 1.0, queue_size: int = 10000, batch_size: int = 256):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = int(max_bytes)
+        self.flush_interval = float(flush_interval)
+        self.batch_size = int(batch_size)
+
+        self._lock = threading.Lock()
+        self._f = None
+        self._idx = None
+        self.path: Optional[str] = None
+        self.records = 0
+        self.dropped = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._open_new()
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread: Optional[threading.Thread] = threading.Thread(
+            target=self._run, name=f"{prefix}-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- files ----------
+    def _open_new(self) -> None:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}-{stamp}.cap")
+        n = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"{self.prefix}-{stamp}-{n}.cap")
+            n += 1
+
+        self.path = path
+        self._f = open(path, "wb", buffering=64 * 1024)
+        self._f.write(FILE_HEADER.pack(CAP_MAGIC, VERSION, RECORD_HEADER.size, time.time()))
+        self._idx = open(index_path(path), "wb", buffering=0)
+        self._idx.write(INDEX_HEADER.pack(IDX_MAGIC, VERSION, BLOCK_RECORDS))
+
+        self._offset = FILE_HEADER.size
+        self._block_offset = self._offset
+        self._block_count = 0
+        self._block_first = 0
+        self._block_last = 0
+        self._block_addrs = 0
+        self._last_flush = time.monotonic()
+
+    def _close_block(self) -> None:
+        if not self._block_count:
+            return
+        self._idx.write(INDEX_ENTRY.pack(
+            self._block_first, self._block_last, self._block_offset, self._block_count, 0,
+            self._block_addrs.to_bytes(32, "little"),
+        ))
+        self._block_offset = self._offset
+        self._block_count = 0
+        self._block_addrs = 0
+
+    # ---------- writing ----------
+    def write(self, ts: float, direction: str, addr: int, raw: bytes) -> None:
+        with self._lock:
+            self._write(ts, direction, addr, raw)
+
+    def _write(self, ts: float, direction: str, addr: int, raw: bytes) -> None:
+        ts_us = int(ts * 1_000_000)
+        d = 1 if direction == "TX" else 0
+        if self._f is None:
+            return
+        self._f.write(RECORD_HEADER.pack(ts_us, d, addr & 0xFF, len(raw)))
+        self._f.write(raw)
+        self._offset += RECORD_HEADER.size + len(raw)
+        self.records += 1
+
+        if not self._block_count:
+            self._block_first = ts_us
+        self._block_last = ts_us
+        self._block_count += 1
+        bits = 1 << (addr & 0xFF)
+        if len(raw) >= 3:
+            bits |= (1 << raw[0]) | (1 << raw[2])
+        self._block_addrs |= bits
+
+        if self._block_count >= BLOCK_RECORDS:
+            self._f.flush()
+            self._close_block()
+            self._last_flush = time.monotonic()
+        elif time.monotonic() - self._last_flush >= self.flush_interval:
+            self._f.flush()
+            self._last_flush = time.monotonic()
+
+        if self.max_bytes and self._offset >= self.max_bytes:
+            self._close_files()
+            self._open_new()
+
+    def on_state_event(self, kind: str, payload: Any) -> None:
+        if kind == "frame":
+            try:
+                self._queue.put_nowait((payload.ts, payload.direction, payload.addr, payload.raw))
+            except queue.Full:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            try:
+                item = q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # idle: push out what the last records left in the buffer
+                with self._lock:
+                    if self._f is not None:
+                        self._f.flush()
+                        self._last_flush = time.monotonic()
+                continue
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            with self._lock:
+                for item in batch:
+                    if item is self._SENTINEL:
+                        stop = True
+                        continue
+                    self._write(*item)
+            if stop:
+                return
+
+    def stats(self) -> dict:
+        """Records written, queued for the writer thread, and dropped because the queue was full."""
+        return {"records": self.records, "queued": self._queue.qsize(), "dropped": self.dropped}
+
+    def _close_files(self) -> None:
+        self._f.flush()
+        self._close_block()
+        self._f.close()
+        self._idx.close()
+        self._f = None
+        self._idx = None
+
+    def close(self) -> None:
+        """Write out what is still queued, then close the files."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(self._SENTINEL)
+            self._thread.join(timeout=5.0)
+        self._thread = None
+        with self._lock:
+            if self._f is not None:
+                self._close_files()
+
+
+class CaptureReader:
+    """Memory-mapped reader for .cap files.
+
+    Opening is O(index size): the file is mmapped and only the sidecar
+    index is parsed. query() uses the index to seek to the requested time
+    range and to skip blocks that do not mention the requested address.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, "rb")
+        size = os.fstat(self._fh.fileno()).st_size
+        if size < FILE_HEADER.size:
+            self._fh.close()
+            raise ValueError(f"{path}: not a capture file")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, rec_size, created = FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != CAP_MAGIC or rec_size != RECORD_HEADER.size:
+            self.close()
+            raise ValueError(f"{path}: not a capture file")
+        self.version = version
+        self.created = created
+
+        self.blocks: List[IndexBlock] = self._load_index()
+        self._starts = [b.first_us for b in self.blocks]
+        self._ends = [b.last_us for b in self.blocks]
+
+    def _load_index(self) -> List[IndexBlock]:
+        blocks: List[IndexBlock] = []
+        try:
+            with open(index_path(self.path), "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        if len(data) >= INDEX_HEADER.size and data[:8] == IDX_MAGIC:
+            body = data[INDEX_HEADER.size:]
+            body = body[: len(body) - len(body) % INDEX_ENTRY.size]
+            for first, last, offset, count, _, addrs in INDEX_ENTRY.iter_unpack(body):
+                blocks.append(IndexBlock(first, last, offset, count, int.from_bytes(addrs, "little")))
+
+        # recover records after the last indexed block (unclean shutdown / open writer)
+        offset = blocks[-1].offset if blocks else FILE_HEADER.size
+        if blocks:
+            offset = self._skip(offset, blocks[-1].count)
+        if offset < len(self._mm):
+            tail = self._scan_block(offset)
+            if tail is not None:
+                blocks.append(tail)
+        return blocks
+
+    def _skip(self, offset: int, count: int) -> int:
+        mm = self._mm
+        for _ in range(count):
+            _, _, _, n = RECORD_HEADER.unpack_from(mm, offset)
+            offset += RECORD_HEADER.size + n
+        return offset
+
+    def _scan_block(self, offset: int) -> Optional[IndexBlock]:
+        mm = self._mm
+        end = len(mm)
+        first = last = 0
+        count = 0
+        addrs = 0
+        pos = offset
+        while pos + RECORD_HEADER.size <= end:
+            ts_us, _, addr, n = RECORD_HEADER.unpack_from(mm, pos)
+            if pos + RECORD_HEADER.size + n > end:
+                break  # torn last record
+            if not count:
+                first = ts_us
+            last = ts_us
+            addrs |= 1 << addr
+            if n >= 3:
+                base = pos + RECORD_HEADER.size
+                addrs |= (1 << mm[base]) | (1 << mm[base + 2])
+            count += 1
+            pos += RECORD_HEADER.size + n
+        if not count:
+            return None
+        return IndexBlock(first, last, offset, count, addrs)
+
+    # ---------- reading ----------
+    def __len__(self) -> int:
+        return sum(b.count for b in self.blocks)
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        return self.query()
+
+    def _iter_block(self, block: IndexBlock) -> Iterator[tuple]:
+        mm = self._mm
+        pos = block.offset
+        for _ in range(block.count):
+            ts_us, d, addr, n = RECORD_HEADER.unpack_from(mm, pos)
+            base = pos + RECORD_HEADER.size
+            yield ts_us, d, addr, mm[base:base + n]
+            pos = base + n
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              addr: Optional[int] = None) -> Iterator[CaptureRecord]:
+        """Records with start <= ts <= end involving `addr` (as addr, src or dest)."""
+        start_us = None if start is None else int(start * 1_000_000)
+        end_us = None if end is None else int(end * 1_000_000)
+
+        lo = 0 if start_us is None else bisect_left(self._ends, start_us)
+        hi = len(self.blocks) if end_us is None else bisect_right(self._starts, end_us)
+
+        for block in self.blocks[lo:hi]:
+            if addr is not None and not block.has_addr(addr):
+                continue
+            for ts_us, d, a, raw in self._iter_block(block):
+                if start_us is not None and ts_us < start_us:
+                    continue
+                if end_us is not None and ts_us > end_us:
+                    continue
+                if addr is not None and a != addr and (len(raw) < 3 or (raw[0] != addr and raw[2] != addr)):
+                    continue
+                yield CaptureRecord(ts_us / 1_000_000, DIRECTIONS[d & 1], a, raw)
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+        finally:
+            self._fh.close()
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
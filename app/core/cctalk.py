@@ -1,6 +1,7 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Tuple, Dict, Any
+from zlib import adler32
 
 from app.core.thesaurus import HEADERS as TH_HEADERS, DEVICE_NAMES as TH_DEVICE_NAMES
 
@@ -60,6 +61,112 @@ def try_parse_frames(buffer: bytearray) -> Tuple[List[bytes], bytearray]:
     remainder = buffer[i:]
     return frames, bytearray(remainder)
 
+MAX_DATA = 252  # longest data block the ccTalk spec allows in one message
+
+
+class FrameParser:
+    """Incremental ccTalk frame parser for the RX path.
+
+    Unconsumed bytes are kept as one immutable bytes object: a chunk is
+    joined to the (short) partial frame left from the previous read and
+    frames are sliced straight out of it, one copy each. Until enough bytes
+    for the pending frame have arrived, feed() returns after one comparison,
+    so byte-at-a-time reads cost almost nothing.
+
+    In strict mode a candidate frame is rejected as misalignment as soon as
+    it is known to be bad: at once if its length byte is over `max_data`
+    (no waiting for up to 260 bytes that can never validate), otherwise when
+    its last byte arrives and the checksum fails. One byte is dropped and the
+    scan continues at the next offset, so a single noise byte costs one frame
+    instead of the rest of the session. A partial frame that never completes
+    is the caller's to drop (inter-byte timeout, see Controller).
+
+    Counters:
+      - frames: frames emitted
+      - discarded: bytes dropped while resynchronizing (or by reset())
+      - resyncs: number of times alignment was lost
+    """
+
+    __slots__ = ("strict", "max_data", "_rest", "_need", "_in_sync", "frames", "discarded", "resyncs")
+
+    def __init__(self, strict: bool = True, max_data: int = MAX_DATA):
+        self.strict = bool(strict)
+        self.max_data = max(0, min(255, int(max_data)))
+        self._rest = b""  # bytes not consumed yet (a partial frame, or noise)
+        self._need = 5  # len(_rest) at which the pending frame is complete
+        self._in_sync = True
+
+        self.frames = 0
+        self.discarded = 0
+        self.resyncs = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes not yet consumed."""
+        return len(self._rest)
+
+    def reset(self) -> None:
+        """Drop any partial frame (e.g. after reconnect)."""
+        self.discarded += len(self._rest)
+        self._rest = b""
+        self._need = 5
+        self._in_sync = True
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        rest = self._rest
+        if type(chunk) is not bytes:
+            chunk = bytes(chunk)
+        data = rest + chunk if rest else chunk
+        end = len(data)
+        if end < self._need:
+            self._rest = data
+            return []
+
+        frames: List[bytes] = []
+        append = frames.append
+        strict = self.strict
+        max_data = self.max_data if strict else 255
+        in_sync = self._in_sync
+        i = 0
+        while True:
+            if end - i < 5:
+                self._need = 5
+                break
+            n = data[i + 1]
+            if n <= max_data:
+                j = i + 5 + n
+                if j > end:
+                    self._need = j - i
+                    break
+                frame = data[i:j]
+                # adler32's low half is 1 + sum(bytes) while that stays below
+                # 65521, i.e. for any frame under 257 bytes; one C call
+                if not strict or not ((adler32(frame) - 1) if n < 252 else sum(frame)) & 0xFF:
+                    append(frame)
+                    in_sync = True
+                    i = j
+                    continue
+            # impossible length or bad checksum: misaligned, drop one byte
+            if in_sync:
+                in_sync = False
+                self.resyncs += 1
+            self.discarded += 1
+            i += 1
+
+        self._in_sync = in_sync
+        if frames:
+            self.frames += len(frames)
+        self._rest = data[i:] if i else data
+        return frames
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "frames": self.frames,
+            "discarded": self.discarded,
+            "resyncs": self.resyncs,
+            "pending": self.pending,
+        }
+
 def decode_frame(frame: bytes) -> DecodedFrame:
     dest = frame[0]
     length = frame[1]
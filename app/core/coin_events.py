@@ -0,0 +1,197 @@
+"""
+Coin acceptor credit/error events from "Read buffered credit or error codes"
+(header 229) replies.
+
+A reply is [counter][A1 B1][A2 B2]...[A5 B5]: an event counter and the five
+most recent results, newest first. A != 0 is a credit (A = coin code,
+B = sorter path); A == 0 is an error or status event with code B (see
+thesaurus.coin_acceptor_error_description).
+
+The counter is what tells new results from ones already seen:
+  - same counter as the last read: nothing new (the common case when
+    polling fast; costs one comparison);
+  - it goes 1..255 and then wraps to 1, so the number of new events is the
+    difference modulo 255;
+  - 0 means the device was reset / powered up and its buffer is empty;
+  - more than 5 new events means the buffer overflowed between two reads:
+    the oldest ones are gone and are reported as one "lost" event carrying
+    the counter range they had (counter .. counter_to);
+  - a reset clears the buffer to null pairs (A = B = 0). Null pairs are
+    never events; finding one among the "new" results means the device was
+    reset and then took coins before we read it (e.g. 200 -> 2 is not a wrap
+    with 57 new events but a reset plus 2), which is reported as a "reset"
+    followed by the real events.
+The first read of a device only sets the baseline: whatever its buffer
+holds happened before we were watching.
+
+Events get a per-bus id, are kept in a bounded history (query with since=),
+counted into per-device totals and passed to listeners (the bus EventHub,
+which streams them as "coin_events").
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .thesaurus import coin_acceptor_error_description
+
+HEADER_READ_BUFFERED_CREDIT = 229
+RESULT_PAIRS = 5
+
+
+def counter_advance(prev: int, counter: int) -> int:
+    """Events between two counter readings (1..255 wrapping to 1; prev 0 = after reset)."""
+    diff = counter - prev
+    return diff if diff > 0 else diff + 255
+
+
+class _DeviceTrack:
+    __slots__ = ("addr", "counter", "reads", "repeats", "credits", "credit_count", "errors",
+                 "error_count", "lost", "resets", "last_ts")
+
+    def __init__(self, addr: int):
+        self.addr = addr
+        self.counter: Optional[int] = None  # None until the first read (baseline)
+        self.reads = 0
+        self.repeats = 0
+        self.credits: Dict[int, int] = {}  # coin code -> count
+        self.credit_count = 0
+        self.errors: Dict[int, int] = {}  # error code -> count
+        self.error_count = 0
+        self.lost = 0
+        self.resets = 0
+        self.last_ts: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "addr": self.addr,
+            "counter": self.counter,
+            "reads": self.reads,
+            "repeats": self.repeats,
+            "credits": self.credit_count,
+            "credits_by_code": {str(k): v for k, v in sorted(self.credits.items())},
+            "errors": self.error_count,
+            "errors_by_code": {str(k): v for k, v in sorted(self.errors.items())},
+            "lost": self.lost,
+            "resets": self.resets,
+            "last_ts": self.last_ts,
+        }
+
+
+class CoinEventTracker:
+    """Per-bus tracker fed with header 229 replies (see module docstring)."""
+
+    def __init__(self, bus_id: str = "default", history: int = 1000):
+        self.bus_id = str(bus_id)
+        self._lock = threading.Lock()
+        self._devices: Dict[int, _DeviceTrack] = {}
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max(1, int(history)))
+        self._next_id = 1
+
+        # fn(kind, payload), called outside the lock: "coin_events" -> [event, ...]
+        self._listeners: List[Callable[[str, Any], None]] = []
+
+    def add_listener(self, fn: Callable[[str, Any], None]) -> None:
+        self._listeners.append(fn)
+
+    # ---------- feeding ----------
+    def on_reply(self, dest: int, header: int, reply: bytes) -> None:
+        """DeviceController reply listener: picks out valid header 229 replies."""
+        if header != HEADER_READ_BUFFERED_CREDIT or len(reply) < 6 or sum(reply) & 0xFF:
+            return
+        self.feed(dest, reply[4:4 + reply[1]])
+
+    def feed(self, addr: int, data: bytes, ts: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Process one reply's data bytes; returns the new events (oldest first)."""
+        if not data:
+            return []
+        addr = int(addr)
+        counter = data[0]
+        with self._lock:
+            dev = self._devices.get(addr)
+            if dev is None:
+                dev = self._devices[addr] = _DeviceTrack(addr)
+            dev.reads += 1
+            prev = dev.counter
+            if prev == counter:
+                dev.repeats += 1
+                return []
+            ts = time.time() if ts is None else ts
+            dev.counter = counter
+            dev.last_ts = ts
+            if prev is None:
+                return []  # baseline
+            if counter == 0:
+                dev.resets += 1
+                events = [self._event(ts, addr, 0, "reset")]
+            else:
+                events = self._decode(dev, prev, counter, data, ts)
+        for fn in self._listeners:
+            try:
+                fn("coin_events", events)
+            except Exception:
+                pass
+        return events
+
+    def _event(self, ts: float, addr: int, counter: int, kind: str, **fields) -> Dict[str, Any]:
+        # caller holds the lock
+        ev = {"id": self._next_id, "ts": ts, "addr": addr, "counter": counter, "kind": kind, **fields}
+        self._next_id += 1
+        self._events.append(ev)
+        return ev
+
+    def _decode(self, dev: _DeviceTrack, prev: int, counter: int, data: bytes, ts: float) -> List[Dict[str, Any]]:
+        # caller holds the lock
+        n_new = counter_advance(prev, counter)
+        pairs = min(RESULT_PAIRS, (len(data) - 1) // 2)
+        shown = min(n_new, pairs)
+        real = 0  # new results before the first null pair (newest first)
+        while real < shown and (data[1 + 2 * real] or data[2 + 2 * real]):
+            real += 1
+        events: List[Dict[str, Any]] = []
+        if real < shown:
+            # the buffer holds fewer results than the counter moved: reset in between
+            dev.resets += 1
+            events.append(self._event(ts, dev.addr, 0, "reset"))
+        elif n_new > shown:
+            lost = n_new - shown
+            dev.lost += lost
+            events.append(self._event(ts, dev.addr, prev % 255 + 1, "lost", count=lost,
+                                      counter_to=(counter - shown - 1) % 255 + 1))
+        # pairs are newest first; emit oldest first with each event's own counter value
+        for k in range(real - 1, -1, -1):
+            a, b = data[1 + 2 * k], data[2 + 2 * k]
+            c = (counter - k - 1) % 255 + 1
+            if a:
+                dev.credits[a] = dev.credits.get(a, 0) + 1
+                dev.credit_count += 1
+                events.append(self._event(ts, dev.addr, c, "credit", coin=a, sorter=b))
+            else:
+                desc, rejected = coin_acceptor_error_description(b)
+                dev.errors[b] = dev.errors.get(b, 0) + 1
+                dev.error_count += 1
+                events.append(self._event(ts, dev.addr, c, "error", code=b, description=desc, rejected=rejected))
+        return events
+
+    # ---------- reading ----------
+    def events(self, since: int = 0, addr: Optional[int] = None, limit: int = 200) -> Dict[str, Any]:
+        """Events with id > since (oldest first, at most the newest `limit`) and the id cursor."""
+        with self._lock:
+            evs = [e for e in self._events if e["id"] > since and (addr is None or e["addr"] == addr)]
+            last_id = self._next_id - 1
+            first_id = self._events[0]["id"] if self._events else self._next_id
+        return {"events": evs[-max(1, int(limit)):], "last_id": last_id, "first_id": first_id}
+
+    def totals(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [d.to_dict() for _, d in sorted(self._devices.items())]
+
+    def reset(self, addr: Optional[int] = None) -> None:
+        """Forget totals and baselines (one device or all); the event history is kept."""
+        with self._lock:
+            if addr is None:
+                self._devices.clear()
+            else:
+                self._devices.pop(int(addr), None)
@@ -2,38 +2,69 @@ from __future__ import annotations
 
 import threading
 import time
-from typing import Optional
+from typing import Any, Dict, Optional
 
-import serial.tools.list_ports
 from serial.serialutil import SerialException
 
 from .serial_io import SerialIO
-from .cctalk import try_parse_frames, decode_frame, header_name
-from .state import STATE, FrameRecord
+from .port_monitor import PORTS
+from .cctalk import FrameParser
+from .metrics import CHECKSUM_FAILURES, DISCARDED, RECONNECTS, RESYNCS
+from .state import STATE, AppState, FrameRecord
 from .device_controller import DeviceController
+from .scheduler import BusScheduler
+from .scanner import AddressScanner
 
 
-def _normalize_port(p: str | None) -> str:
-    if not p:
-        return ""
-    p = str(p).strip()
-    if p.lower().startswith("\\\\.\\"):
-        p = p[4:]
-    return p.upper()
+RX_MODES = ("event", "poll")
 
+# ccTalk: a receiver discards a partial message after 50 ms without a byte
+INTER_BYTE_TIMEOUT = 0.05
 
-def _port_exists_windows(port_name: str | None) -> bool:
-    want = _normalize_port(port_name)
-    if not want:
-        return False
-    try:
-        for info in serial.tools.list_ports.comports():
-            if _normalize_port(getattr(info, "device", None)) == want:
-                return True
-    except Exception:
-        # enumeration may fail; don't hard-disconnect
-        return True
-    return False
+
+class RxTiming:
+    """Per-stage RX latency, measured from the moment read() returned bytes.
+
+    Stages: parse (frame extracted), store (in the frame history) and match
+    (handed to DeviceController for transaction matching). Only touched
+    by the RX thread; snapshot() is a best-effort read for the API.
+    """
+
+    STAGES = ("parse", "store", "match")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.frames = 0
+        self.partial_timeouts = 0
+        self._sum = dict.fromkeys(self.STAGES, 0.0)
+        self._max = dict.fromkeys(self.STAGES, 0.0)
+        self._last = dict.fromkeys(self.STAGES, 0.0)
+
+    def add(self, t_read: float, t_parse: float, t_store: float, t_match: float) -> None:
+        self.frames += 1
+        for stage, t in (("parse", t_parse), ("store", t_store), ("match", t_match)):
+            dt = t - t_read
+            self._last[stage] = dt
+            self._sum[stage] += dt
+            if dt > self._max[stage]:
+                self._max[stage] = dt
+
+    def snapshot(self) -> Dict[str, Any]:
+        n = self.frames
+        return {
+            "frames": n,
+            "partial_timeouts": self.partial_timeouts,
+            "stages_ms": {
+                stage: {
+                    "last": round(self._last[stage] * 1000.0, 3),
+                    "avg": round(self._sum[stage] * 1000.0 / n, 3) if n else 0.0,
+                    "max": round(self._max[stage] * 1000.0, 3),
+                }
+                for stage in self.STAGES
+            },
+        }
 
 
 class Controller:
@@ -41,13 +72,25 @@ class Controller:
 
     Responsibilities:
       - Owns SerialIO and opens/closes it.
-      - Performs reconnect loop.
-      - Decodes RX frames and pushes them to STATE.
-      - Provides DeviceController for TX (DeviceController uses same SerialIO).
+      - Performs reconnect loop; port presence comes from the shared
+        PortMonitor (PORTS), so the RX thread never enumerates USB devices.
+      - Decodes RX frames and pushes them to its AppState (FrameParser resyncs
+        on checksum failures while validate_checksum is on).
+      - Provides DeviceController for TX (DeviceController uses same SerialIO)
+        and feeds it every RX frame to complete pending transactions.
+      - Runs a BusScheduler that serializes all TX (API sends, scans, polls).
+
+    RX modes:
+      - "event" (default): block in read() until a byte arrives, then take
+        everything in_waiting. Frames are stored as soon as their last byte
+        is read; a partial frame older than the ccTalk inter-byte timeout
+        is discarded before new bytes are parsed.
+      - "poll": the original fixed read(1024) + 10 ms sleep cycle.
 
     IMPORTANT:
       - Flask routes must NOT touch the serial port directly.
       - Use request_connect/request_disconnect to control it.
+      - Send through self.scheduler, not self.device, so frames never collide.
     """
 
     def __init__(
@@ -57,42 +100,73 @@ class Controller:
         timeout: float = 0.1,
         host_address: int = 1,
         logger=None,
+        rx_mode: str = "event",
+        inter_byte_timeout: float = INTER_BYTE_TIMEOUT,
+        state: Optional[AppState] = None,
+        bus_id: str = "default",
     ):
         self.logger = logger
+        # frame store / device table of this bus (the global STATE for the default bus)
+        self.state = state if state is not None else STATE
+        self.bus_id = str(bus_id)
+        self._m_reconnects = RECONNECTS.labels(self.bus_id)
+        self._m_checksum = CHECKSUM_FAILURES.labels(self.bus_id)
+        self._m_resyncs = RESYNCS.labels(self.bus_id)
+        self._m_discarded = DISCARDED.labels(self.bus_id)
+        self._opened = 0
+        if rx_mode not in RX_MODES:
+            raise ValueError(f"rx_mode must be one of {RX_MODES}")
+        self.rx_mode = rx_mode
+        self.inter_byte_timeout = float(inter_byte_timeout)
+        self.rx_timing = RxTiming()
 
         self.port = str(port)
         self.baudrate = int(baudrate)
         self.timeout = float(timeout)
         self.host_address = int(host_address)
 
-        self.sio = SerialIO(self.port, self.baudrate, self.timeout)
-        self.device = DeviceController(self.sio, logger=self.logger, host_address=self.host_address)
+        self.sio = SerialIO(self.port, self.baudrate, self.timeout, bus=self.bus_id)
+        self.device = DeviceController(
+            self.sio, logger=self.logger, host_address=self.host_address, state=self.state, bus_id=self.bus_id
+        )
+        self.scheduler = BusScheduler(self, logger=self.logger)
+        self.scanner = AddressScanner(self, logger=self.logger)
 
         self._stop = threading.Event()
         self._rx_thread: Optional[threading.Thread] = None
-        self._buf = bytearray()
+        self.parser = FrameParser(strict=self.state.validate_checksum)
 
         self._cfg_lock = threading.Lock()
         self._want_disconnect = False
         self._want_reconnect = True  # start tries to connect
+        self._port_present = True  # updated by PORTS watcher callbacks
 
         if self.logger:
             self.logger.info(
-                "Controller init: port=%s baud=%s timeout=%s host=%s",
+                "Controller init: port=%s baud=%s timeout=%s host=%s rx=%s",
                 self.port,
                 self.baudrate,
                 self.timeout,
                 self.host_address,
+                self.rx_mode,
             )
 
     def start(self):
         if self._rx_thread and self._rx_thread.is_alive():
             return
         self._stop.clear()
+        if PORTS.logger is None:
+            PORTS.logger = self.logger
+        PORTS.start()
+        self._watch_port(self.port)
         self._rx_thread = threading.Thread(target=self._loop, daemon=True)
         self._rx_thread.start()
+        self.scheduler.start()
 
     def stop(self):
+        PORTS.unwatch(self.port, self._on_port_change)
+        self.scanner.stop()
+        self.scheduler.stop()
         self._stop.set()
         if self._rx_thread and self._rx_thread.is_alive():
             self._rx_thread.join(timeout=2.0)
@@ -101,7 +175,7 @@ class Controller:
             self.sio.close()
         except Exception:
             pass
-        STATE.set_connected(False, "stopped")
+        self.state.set_connected(False, "stopped")
 
     def request_disconnect(self) -> None:
         with self._cfg_lock:
@@ -111,15 +185,46 @@ class Controller:
             self.sio.close()
         except Exception:
             pass
-        STATE.set_connected(False, "manual disconnect")
+        self.state.set_connected(False, "manual disconnect")
 
     def request_connect(self, port: str, baud: int) -> None:
         with self._cfg_lock:
+            old_port = self.port
             self.port = str(port)
             self.baudrate = int(baud)
             self._want_disconnect = False
             self._want_reconnect = True
-        STATE.set_config(port=self.port, baud=self.baudrate)
+        if old_port != self.port and self._rx_thread:
+            PORTS.unwatch(old_port, self._on_port_change)
+            self._watch_port(self.port)
+        self.state.set_config(port=self.port, baud=self.baudrate)
+
+    # ---------- port presence ----------
+    def _watch_port(self, port: str) -> None:
+        present = PORTS.watch(port, self._on_port_change)
+        with self._cfg_lock:
+            self._port_present = present
+        if not present:
+            self.state.set_connected(False, f"Port not present: {port}")
+
+    def _on_port_change(self, port: str, present: bool) -> None:
+        """PortMonitor callback (monitor thread): flag the change, wake the RX thread."""
+        with self._cfg_lock:
+            self._port_present = present
+            if present and not self._want_disconnect:
+                self._want_reconnect = True
+        if present:
+            if self.logger:
+                self.logger.info("Port reappeared: %s", self.port)
+            return
+        self.state.set_connected(False, f"Port removed: {self.port}")
+        if self.logger:
+            self.logger.warning("Port disappeared: %s", self.port)
+        # the RX thread closes the port itself; just cut its blocking read short
+        self.sio.cancel_read()
+
+    def rx_stats(self) -> Dict[str, Any]:
+        return {"mode": self.rx_mode, **self.rx_timing.snapshot(), "parser": self.parser.stats()}
 
     def _rebuild_serial(self):
         # always rebuild SerialIO to drop stale handles
@@ -127,12 +232,14 @@ class Controller:
             self.sio.close()
         except Exception:
             pass
-        self.sio = SerialIO(self.port, self.baudrate, self.timeout)
-        self.device = DeviceController(self.sio, logger=self.logger, host_address=self.host_address)
+        self.sio = SerialIO(self.port, self.baudrate, self.timeout, bus=self.bus_id)
+        # keep the DeviceController (and its pending-request table); just swap the port
+        self.device.sio = self.sio
 
     def _loop(self):
         backoff = 1.0
-        last_port_check = 0.0
+        event_mode = self.rx_mode == "event"
+        t_last_byte = 0.0
 
         while not self._stop.is_set():
             with self._cfg_lock:
@@ -144,48 +251,49 @@ class Controller:
                 time.sleep(0.2)
                 continue
 
+            if not self._port_present:
+                # unplugged: wait for the monitor to report it back instead of retrying open()
+                if self.sio.is_open:
+                    try:
+                        self.sio.close()
+                    except Exception:
+                        pass
+                time.sleep(0.1)
+                continue
+
             # connect if requested or not open
             if want_reconn or (not self.sio.is_open):
                 try:
                     self._rebuild_serial()
                     self.sio.open()
-                    self._buf = bytearray()
-                    STATE.set_config(port=self.port, baud=self.baudrate)
-                    STATE.set_connected(True, None)
+                    self.parser.reset()
+                    self.state.set_config(port=self.port, baud=self.baudrate)
+                    self.state.set_connected(True, None)
+                    if self._opened:
+                        self._m_reconnects.inc()
+                    self._opened += 1
                     with self._cfg_lock:
                         self._want_reconnect = False
                     if self.logger:
                         self.logger.info("Serial opened %s @ %s", self.port, self.baudrate)
                     backoff = 1.0
-                    last_port_check = time.time()
                 except Exception as e:
-                    STATE.set_connected(False, str(e))
+                    self.state.set_connected(False, str(e))
                     if self.logger:
                         self.logger.warning("Serial open failed (%s). Retrying...", e)
                     time.sleep(backoff)
                     backoff = min(backoff * 1.6, 10.0)
                     continue
 
-            # USB unplug detection on Windows
-            now = time.time()
-            if (now - last_port_check) >= 1.0:
-                last_port_check = now
-                if not _port_exists_windows(self.port):
-                    STATE.set_connected(False, f"Port removed: {self.port}")
-                    if self.logger:
-                        self.logger.warning("Port disappeared: %s", self.port)
-                    try:
-                        self.sio.close()
-                    except Exception:
-                        pass
-                    time.sleep(0.3)
-                    continue
-
             # RX
             try:
-                chunk = self.sio.read(1024)
+                if event_mode:
+                    chunk = self.sio.read_available()
+                else:
+                    chunk = self.sio.read(1024)
+                t_rx = time.perf_counter()
             except (SerialException, OSError) as e:
-                STATE.set_connected(False, str(e))
+                self.state.set_connected(False, str(e))
                 if self.logger:
                     self.logger.warning("Serial error (%s). Reconnecting...", e)
                 try:
@@ -197,23 +305,44 @@ class Controller:
                 continue
 
             if chunk:
-                self._buf.extend(chunk)
-                frames, self._buf = try_parse_frames(self._buf)
+                ts = time.time()
+                parser = self.parser
+                if event_mode:
+                    if parser.pending and t_rx - t_last_byte > self.inter_byte_timeout:
+                        # stale partial frame: the sender gave up on it
+                        self.rx_timing.partial_timeouts += 1
+                        parser.reset()
+                    t_last_byte = t_rx
+
+                strict = parser.strict = self.state.validate_checksum
+                resyncs, discarded = parser.resyncs, parser.discarded
+                frames = parser.feed(chunk)
+                t_parse = time.perf_counter()
+                if parser.resyncs != resyncs:
+                    self._m_resyncs.inc(parser.resyncs - resyncs)
+                    self._m_checksum.inc(parser.resyncs - resyncs)
+                    if self.logger:
+                        self.logger.warning(
+                            "RX resync (discarded %d bytes total)", parser.discarded
+                        )
+                if parser.discarded != discarded:
+                    self._m_discarded.inc(parser.discarded - discarded)
+                if not strict:
+                    bad = sum(1 for fr in frames if sum(fr) & 0xFF)
+                    if bad:
+                        self._m_checksum.inc(bad)
 
                 for fr in frames:
-                    dec = decode_frame(fr)
-                    rec = FrameRecord(
-                        ts=time.time(),
-                        direction="RX",
-                        addr=int(dec.src),
-                        raw_hex=fr.hex(),
-                        decoded={**dec.to_dict(), "header_name": header_name(dec.header)},
-                    )
-                    STATE.add_frame(rec)
+                    # decoding is deferred until a client reads the frame
+                    self.state.add_frame(FrameRecord(ts=ts, direction="RX", addr=fr[2], raw=fr))
+                    t_store = time.perf_counter()
+                    self.device.on_rx_frame(fr, t_rx)
+                    self.rx_timing.add(t_rx, t_parse, t_store, time.perf_counter())
                     if self.logger:
                         self.logger.info("RX %s", fr.hex())
 
-            time.sleep(0.01)
+            if not event_mode:
+                time.sleep(0.01)
 
         try:
             self.sio.close()
@@ -1,57 +1,177 @@
 # app/core/device_controller.py
 from __future__ import annotations
 
+import threading
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from .serial_io import SerialIO
-from .cctalk import build_frame, decode_frame, header_name
-from .state import STATE, FrameRecord
+from .cctalk import build_frame, decode_frame
+from .metrics import REPLY_LATENCY, REPLY_TIMEOUTS
+from .state import STATE, AppState, FrameRecord
+
+
+class PendingRequest:
+    """One outstanding request in the pending-request table."""
+
+    __slots__ = ("dest", "frame", "sent", "echo_seen", "reply", "reply_ts", "done")
+
+    def __init__(self, dest: int, frame: bytes):
+        self.dest = dest
+        self.frame = frame
+        self.sent = 0.0  # perf_counter() right after the write
+        self.echo_seen = False
+        self.reply: Optional[bytes] = None
+        self.reply_ts = 0.0  # perf_counter() when the RX loop got the reply
+        self.done = threading.Event()
 
 
 class DeviceController:
     """
     High-level ccTalk sender.
-    Writes TX frames to serial and logs them into STATE.
+    Writes TX frames to serial and logs them into its bus state (STATE by default).
+
+    send() is fire-and-forget. send_and_wait() registers the request in a
+    pending table keyed by destination address and blocks until the RX loop
+    (Controller._loop -> on_rx_frame) delivers the matching reply, or the
+    timeout expires. The request thread never reads the port itself.
     """
 
-    def __init__(self, sio: SerialIO, logger=None, host_address: int = 1):
+    def __init__(self, sio: SerialIO, logger=None, host_address: int = 1, state: Optional[AppState] = None,
+                 bus_id: str = "default"):
         self.sio = sio
         self.logger = logger
         self.host_address = int(host_address)
+        self.state = state if state is not None else STATE
+        self.bus_id = str(bus_id)
+        # (dest, header) -> (latency histogram, timeout counter)
+        self._m_reply: Dict[tuple, tuple] = {}
 
-    def send(self, dest: int, header: int, data: bytes = b"") -> Dict[str, Any]:
-        def send(self, dest: int, header: int, data: bytes = b"") -> Dict[str, Any]:
-            if self.logger:
-                self.logger.warning(
-                    "DeviceController logger=%s handlers=%s",
-                    getattr(self.logger, "name", None),
-                    [type(h).__name__ for h in getattr(self.logger, "handlers", [])],
-                )
-            frame = build_frame(dest=int(dest), src=self.host_address, header=int(header), data=data)
-            ...
-        frame = build_frame(dest=int(dest), src=self.host_address, header=int(header), data=data)
+        # ccTalk replies carry no request id: one transaction on the bus at a time
+        self._txn_lock = threading.Lock()
+        self._pending: Dict[int, PendingRequest] = {}
+
+        # fn(dest, header, reply_frame) for every matched reply; runs on the
+        # sending thread (scheduler), never on the RX thread
+        self._reply_listeners: List[Callable[[int, int, bytes], None]] = []
+
+    def add_reply_listener(self, fn: Callable[[int, int, bytes], None]) -> None:
+        self._reply_listeners.append(fn)
 
+    def _transmit(self, dest: int, frame: bytes, pending: Optional[PendingRequest] = None) -> FrameRecord:
         # TX to wire
         self.sio.write(frame)
+        if pending is not None:
+            pending.sent = time.perf_counter()
 
-        # Store TX in STATE
-        dec = decode_frame(frame)
-        rec = FrameRecord(
-            ts=time.time(),
-            direction="TX",
-            addr=int(dest),
-            raw_hex=frame.hex(),
-            decoded={**dec.to_dict(), "header_name": header_name(dec.header)},
-        )
-        STATE.add_frame(rec)
+        # Store TX in the bus state
+        rec = FrameRecord(ts=time.time(), direction="TX", addr=int(dest), raw=frame)
+        self.state.add_frame(rec)
         # update devices table
-        STATE.note_device(int(dest))
+        self.state.note_device(int(dest))
 
         if self.logger:
             self.logger.info("TX %s", frame.hex())
 
-        return rec.decoded
+        return rec
+
+    def send(self, dest: int, header: int, data: bytes = b"") -> Dict[str, Any]:
+        frame = build_frame(dest=int(dest), src=self.host_address, header=int(header), data=data)
+        return self._transmit(dest, frame).decoded
+
+    def send_and_wait(
+        self,
+        dest: int,
+        header: int,
+        data: bytes = b"",
+        timeout: float = 0.5,
+        retries: int = 0,
+        on_sent: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """Send a request and wait for the reply from `dest`.
+
+        `on_sent(tx)` is called once the first attempt is on the wire.
+
+        Returns a dict with:
+          tx        decoded TX frame (last attempt)
+          reply     decoded reply frame, or None on timeout
+          rtt_ms    write-complete -> reply-decoded time, or None
+          attempts  number of frames sent
+          echo      True if our own TX bytes were seen on the RX line
+          timeout   True if no reply arrived within timeout on any attempt
+        """
+        dest = int(dest)
+        frame = build_frame(dest=dest, src=self.host_address, header=int(header), data=data)
+        m_latency, m_timeouts = self._reply_metrics(dest, int(header))
+
+        with self._txn_lock:
+            attempts = 0
+            rec: Optional[FrameRecord] = None
+            p: Optional[PendingRequest] = None
+
+            for _ in range(max(0, int(retries)) + 1):
+                attempts += 1
+                p = PendingRequest(dest, frame)
+                self._pending[dest] = p
+                try:
+                    rec = self._transmit(dest, frame, p)
+                    if on_sent is not None and attempts == 1:
+                        on_sent(rec.decoded)
+                    p.done.wait(timeout)
+                finally:
+                    self._pending.pop(dest, None)
+                if p.reply is not None:
+                    m_latency.observe(p.reply_ts - p.sent)
+                    break
+                m_timeouts.inc()
+                if self.logger:
+                    self.logger.debug("No reply from %s to header %s (attempt %d)", dest, header, attempts)
+
+        got = p is not None and p.reply is not None
+        if got:
+            for fn in self._reply_listeners:
+                try:
+                    fn(dest, int(header), p.reply)
+                except Exception as e:
+                    if self.logger:
+                        self.logger.warning("Reply listener failed: %s", e)
+        return {
+            "tx": rec.decoded if rec else None,
+            "reply": decode_frame(p.reply).to_dict() if got else None,
+            "rtt_ms": round((p.reply_ts - p.sent) * 1000.0, 3) if got else None,
+            "attempts": attempts,
+            "echo": bool(p and p.echo_seen),
+            "timeout": not got,
+        }
+
+    def _reply_metrics(self, dest: int, header: int) -> tuple:
+        m = self._m_reply.get((dest, header))
+        if m is None:
+            labels = (self.bus_id, dest, header)
+            m = self._m_reply[(dest, header)] = (REPLY_LATENCY.labels(*labels), REPLY_TIMEOUTS.labels(*labels))
+        return m
+
+    def on_rx_frame(self, frame: bytes, ts: float) -> None:
+        """Match an RX frame against the pending table (called from the RX loop).
+
+        On the single-wire bus our own TX bytes come back first; that echo is
+        recognised by exact match and skipped. The reply is the next frame
+        addressed to us from the request's destination.
+        """
+        if not self._pending:
+            return
+        p = self._pending.get(frame[0])
+        if p is not None and not p.echo_seen and frame == p.frame:
+            p.echo_seen = True
+            return
+        if frame[0] != self.host_address:
+            return
+        p = self._pending.get(frame[2])
+        if p is None or p.reply is not None:
+            return
+        p.reply = frame
+        p.reply_ts = ts
+        p.done.set()
 
     # Common helpers
     def simple_poll(self, dest: int):
@@ -68,4 +188,4 @@ class DeviceController:
             raise ValueError("value must be 0..65535")
         v = int(value)
         data = bytes([v & 0xFF, (v >> 8) & 0xFF])
-        return self.send(dest, 53, data)
\ No newline at end of file
+        return self.send(dest, 53, data)
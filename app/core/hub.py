@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from .compact import encode_frames
+
+
+def sse_event(kind: str, payload: Any) -> bytes:
+    """Encode one Server-Sent Events message."""
+    data = json.dumps(payload, separators=(",", ":"), default=str)
+    return f"event: {kind}\ndata: {data}\n\n".encode("utf-8")
+
+
+class Subscriber:
+    """One stream client. Holds encoded SSE messages until the client reads them.
+
+    If the client falls more than `max_pending` messages behind it is marked
+    `lagged`; the stream should then end so the client reconnects with its
+    seq cursor and backfills from history instead of silently losing frames.
+    """
+
+    def __init__(self, max_pending: int = 1000, compact: bool = False):
+        self.max_pending = int(max_pending)
+        self.compact = bool(compact)  # frames batches in the columnar form
+        self.lagged = False
+        self._q: Deque[Tuple[int, bytes]] = deque()
+        self._cond = threading.Condition()
+
+    def push(self, items: List[Tuple[int, bytes]]) -> None:
+        with self._cond:
+            if len(self._q) + len(items) > self.max_pending:
+                self.lagged = True
+            else:
+                self._q.extend(items)
+            self._cond.notify()
+
+    def get(self, timeout: float) -> List[Tuple[int, bytes]]:
+        """Wait up to `timeout` and return all pending (max_seq, message) items."""
+        with self._cond:
+            if not self._q and not self.lagged:
+                self._cond.wait(timeout)
+            out = list(self._q)
+            self._q.clear()
+            return out
+
+
+class EventHub:
+    """Fan-out of STATE changes to stream subscribers.
+
+    publish() is called from the RX/TX threads and only appends to a deque;
+    a dispatcher thread encodes each batch once and hands the same bytes to
+    every subscriber, so N open tabs cost one JSON encode per frame (two if
+    some asked for compact frames and some did not).
+    Nothing is queued while there are no subscribers.
+
+    Events:
+      - frames:  list of frame dicts, or the columnar form for compact
+                 subscribers (consecutive frames are batched)
+      - status:  connection/config dict
+      - devices: {"devices": [...], "devices_rev": n}
+      - coin_events: list of coin acceptor events (app.core.coin_events)
+    """
+
+    def __init__(self, max_pending: int = 1000):
+        self.max_pending = int(max_pending)
+        self._subs: Set[Subscriber] = set()
+        self._subs_lock = threading.Lock()
+        self._pending: Deque[Tuple[str, Any]] = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # (FrameRecords, compact) -> "frames" payload; the bus sets AppState.frames_out
+        # so pushed frames match polled ones (device names included)
+        self._frames_out: Callable[[List[Any], bool], Any] = (
+            lambda recs, compact: encode_frames(recs, {}) if compact else [r.to_dict() for r in recs]
+        )
+
+    def set_frame_encoder(self, frames_out: Callable[[List[Any], bool], Any]) -> None:
+        self._frames_out = frames_out
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subs)
+
+    def subscribe(self, compact: bool = False) -> Subscriber:
+        sub = Subscriber(self.max_pending, compact)
+        with self._subs_lock:
+            self._subs.add(sub)
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="event-hub", daemon=True)
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._subs_lock:
+            self._subs.discard(sub)
+
+    def publish(self, kind: str, payload: Any) -> None:
+        if not self._subs:
+            return
+        self._pending.append((kind, payload))
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(5.0)
+            self._wake.clear()
+            if not self._pending:
+                continue
+
+            batch: List[Tuple[str, Any]] = []
+            while self._pending:
+                batch.append(self._pending.popleft())
+
+            with self._subs_lock:
+                subs = list(self._subs)
+            items = self._encode(batch, {sub.compact for sub in subs})
+            for sub in subs:
+                sub.push(items[sub.compact])
+
+    def _encode(self, batch: List[Tuple[str, Any]], forms: Set[bool]) -> Dict[bool, List[Tuple[int, bytes]]]:
+        """Encoded messages per frames form (False = rows, True = compact) in `forms`.
+
+        Only "frames" messages differ between the forms; everything else is
+        encoded once and shared.
+        """
+        out: Dict[bool, List[Tuple[int, bytes]]] = {form: [] for form in forms}
+        frames: List[Any] = []
+
+        def flush_frames():
+            if frames:
+                for form, items in out.items():
+                    items.append((frames[-1].seq, sse_event("frames", self._frames_out(frames, form))))
+                frames.clear()
+
+        for kind, payload in batch:
+            if kind == "frame":
+                frames.append(payload)
+                continue
+            flush_frames()
+            msg = (0, sse_event(kind, payload))
+            for items in out.values():
+                items.append(msg)
+        flush_frames()
+        return out
+
+
+HUB = EventHub()
@@ -0,0 +1,233 @@
+"""
+In-process metrics with Prometheus text exposition (GET /api/metrics).
+
+Counters and histograms are cheap enough to stay on in production:
+  - a labelled series is resolved once (metric.labels(...)) and kept by the
+    caller, so the hot path is one attribute add (counter) or one bisect
+    into a preallocated bucket list (histogram);
+  - there are no locks on the update path. A series is normally updated
+    from one thread (the bus RX thread, the scheduler thread); where several
+    threads share one (HTTP request durations) a racing += can, very
+    rarely, lose an increment, which is acceptable for monitoring;
+  - gauges are callbacks evaluated only when /api/metrics is scraped.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# seconds; covers µs-level parse/lock waits up to multi-second serial stalls
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n: float = 1) -> None:
+        self.value += n
+
+
+class HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+
+    def observe_zero(self) -> None:
+        """observe(0) without the bisect (e.g. an uncontended lock)."""
+        self.counts[0] += 1
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        """Series for these label values (created on first use; keep the result)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, child in list(self._children.items()):
+            yield from self._render_child(key, child)
+
+    def _render_child(self, key, child) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def _render_child(self, key, child) -> Iterable[str]:
+        yield f"{self.name}{_labels(self.labelnames, key)} {_num(child.value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.bounds)
+
+    def _render_child(self, key, child) -> Iterable[str]:
+        counts = list(child.counts)
+        total = 0
+        for bound, n in zip(self.bounds + (float("inf"),), counts):
+            total += n
+            le = 'le="%s"' % _num(bound)
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {total}"
+        yield f"{self.name}_sum{_labels(self.labelnames, key)} {_num(child.sum)}"
+        yield f"{self.name}_count{_labels(self.labelnames, key)} {total}"
+
+
+class Gauge(_Metric):
+    """Value(s) computed at scrape time: fn() -> {label values tuple: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._sources: Dict[Any, Callable[[], Dict[Tuple[str, ...], float]]] = {}
+
+    def add_source(self, fn: Callable[[], Dict[Tuple[str, ...], float]], key: Any = None) -> None:
+        """Add fn; a source added again under the same `key` replaces the old one."""
+        self._sources[fn if key is None else key] = fn
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for fn in list(self._sources.values()):
+            try:
+                values = fn()
+            except Exception:
+                continue
+            for key, v in values.items():
+                yield f"{self.name}{_labels(self.labelnames, key)} {_num(v)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry()
+
+# ---------- serial ----------
+RX_BYTES = METRICS.counter("cctalk_rx_bytes_total", "Bytes read from the serial port.", ("bus",))
+TX_BYTES = METRICS.counter("cctalk_tx_bytes_total", "Bytes written to the serial port.", ("bus",))
+SERIAL_READ = METRICS.histogram(
+    "cctalk_serial_read_seconds",
+    "Duration of serial reads that returned data (event mode: after the first byte arrived).",
+    ("bus",),
+)
+SERIAL_WRITE = METRICS.histogram("cctalk_serial_write_seconds", "Duration of serial writes.", ("bus",))
+RECONNECTS = METRICS.counter("cctalk_reconnects_total", "Serial port (re)opens after the first one.", ("bus",))
+
+# ---------- frames ----------
+FRAMES = METRICS.counter("cctalk_frames_total", "Frames stored, by direction.", ("bus", "direction"))
+CHECKSUM_FAILURES = METRICS.counter(
+    "cctalk_checksum_failures_total",
+    "RX checksum failures (strict mode: resyncs; otherwise frames with a bad checksum).",
+    ("bus",),
+)
+RESYNCS = METRICS.counter("cctalk_parse_resyncs_total", "Times the RX parser lost frame alignment.", ("bus",))
+DISCARDED = METRICS.counter("cctalk_parse_discarded_bytes_total", "RX bytes dropped while resynchronizing.", ("bus",))
+
+# ---------- state ----------
+LOCK_WAIT = METRICS.histogram(
+    "cctalk_state_lock_wait_seconds", "Time frame writers spent waiting for the AppState lock.", ("bus", "op")
+)
+
+# ---------- transactions ----------
+REPLY_LATENCY = METRICS.histogram(
+    "cctalk_reply_latency_seconds", "Request write -> reply received.", ("bus", "addr", "header")
+)
+REPLY_TIMEOUTS = METRICS.counter(
+    "cctalk_reply_timeouts_total", "Requests that got no reply (per attempt).", ("bus", "addr", "header")
+)
+
+# ---------- HTTP ----------
+HTTP_DURATION = METRICS.histogram(
+    "cctalk_http_request_duration_seconds", "API request handling time.", ("endpoint", "method", "status")
+)
+HTTP_CACHE = METRICS.counter(
+    "cctalk_http_cache_total",
+    "Cached API responses by outcome (hit, miss, not_modified).",
+    ("endpoint", "result"),
+)
+
+CONNECTED = METRICS.gauge("cctalk_connected", "1 while the bus serial port is open.", ("bus",))
+FRAMES_STORED = METRICS.gauge("cctalk_frames_stored", "Frames currently held in the history ring.", ("bus",))
+CAPTURE_DROPPED = METRICS.gauge(
+    "cctalk_capture_records_dropped", "Frames not captured because the capture queue was full.", ("bus",)
+)
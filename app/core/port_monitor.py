@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import os
+import stat
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import serial.tools.list_ports
+
+PortCallback = Callable[[str, bool], None]
+
+
+def normalize_port(p: str | None) -> str:
+    """Canonical key for a port name.
+
+    Windows names are case-insensitive and may carry the \\\\.\\ prefix
+    (COM10+). POSIX paths are only normalized, not resolved: a
+    /dev/serial/by-id/... symlink is stat()ed through the link on every
+    check, so it disappears together with the USB device behind it.
+    """
+    if not p:
+        return ""
+    p = str(p).strip()
+    if p.lower().startswith("\\\\.\\"):
+        p = p[4:]
+    if os.name == "nt" or p.upper().startswith("COM"):
+        return p.upper()
+    if p.startswith("/"):
+        return os.path.normpath(p)
+    return p
+
+
+def _windows_com_ports() -> Optional[set]:
+    """Present COM ports from the registry (cheap), or None if unavailable."""
+    try:
+        import winreg
+    except ImportError:
+        return None
+    names = set()
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DEVICEMAP\SERIALCOMM") as key:
+            i = 0
+            while True:
+                try:
+                    _, value, _ = winreg.EnumValue(key, i)
+                except OSError:
+                    break
+                names.add(str(value).upper())
+                i += 1
+    except OSError:
+        # key is missing when no serial port exists at all
+        pass
+    return names
+
+
+class PortMonitor:
+    """Background serial-port presence watcher.
+
+    A full comports() enumeration (slow on some USB stacks) runs only every
+    `enumerate_every` seconds on this thread and is cached for /api/ports.
+    Watched ports are checked every `interval` seconds with a cheap test
+    (stat of the device node on POSIX, the SERIALCOMM registry key on
+    Windows) and watchers are called as fn(port, present) on changes.
+
+    Ports that cannot be checked cheaply (URLs such as socket://, or no
+    winreg) fall back to the cached table; names never seen there are
+    assumed present so they are left to the open() retry loop.
+    """
+
+    def __init__(self, interval: float = 0.25, enumerate_every: float = 2.0, logger=None):
+        self.interval = float(interval)
+        self.enumerate_every = float(enumerate_every)
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._table: List[Dict[str, Any]] = []
+        self._table_keys: set = set()
+        self._seen: set = set()  # every key enumeration has ever listed
+        self._enumerated_at: Optional[float] = None
+        self._watchers: Dict[str, List[PortCallback]] = {}
+        self._present: Dict[str, bool] = {}
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="port-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    # ---------- watching ----------
+    def watch(self, port: str, fn: PortCallback) -> bool:
+        """Register fn for presence changes of `port`; returns current presence."""
+        key = normalize_port(port)
+        present = self._check(key)
+        with self._lock:
+            self._watchers.setdefault(key, []).append(fn)
+            self._present[key] = present
+        return present
+
+    def unwatch(self, port: str, fn: PortCallback) -> None:
+        key = normalize_port(port)
+        with self._lock:
+            fns = self._watchers.get(key, [])
+            if fn in fns:
+                fns.remove(fn)
+            if not fns:
+                self._watchers.pop(key, None)
+                self._present.pop(key, None)
+
+    def present(self, port: str) -> bool:
+        """Cached presence (never enumerates)."""
+        key = normalize_port(port)
+        with self._lock:
+            if key in self._present:
+                return self._present[key]
+        return self._check(key)
+
+    # ---------- checks ----------
+    def _cheap(self, key: str) -> Optional[bool]:
+        if not key:
+            return None
+        if key.startswith("/"):
+            try:
+                return stat.S_ISCHR(os.stat(key).st_mode)
+            except OSError:
+                return False
+        if key.startswith("COM"):
+            names = _windows_com_ports()
+            if names is not None:
+                return key in names
+        return None
+
+    def _check(self, key: str) -> bool:
+        present = self._cheap(key)
+        if present is not None:
+            return present
+        with self._lock:
+            # a port enumeration has never listed is left to open() to judge
+            return key in self._table_keys or key not in self._seen
+
+    def enumerate(self) -> List[Dict[str, Any]]:
+        """Full comports() scan; updates the cached table."""
+        table: List[Dict[str, Any]] = []
+        try:
+            infos = serial.tools.list_ports.comports()
+        except Exception as e:
+            if self.logger:
+                self.logger.warning("Port enumeration failed: %s", e)
+            return self.ports()
+        for info in infos:
+            table.append({
+                "device": info.device,
+                "description": getattr(info, "description", "") or "",
+                "hwid": getattr(info, "hwid", "") or "",
+            })
+        table.sort(key=lambda p: p["device"])
+        with self._lock:
+            self._table = table
+            self._table_keys = {normalize_port(p["device"]) for p in table}
+            self._seen |= self._table_keys
+            self._enumerated_at = time.time()
+        return table
+
+    def ports(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._table)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ports": list(self._table),
+                "enumerated_at": self._enumerated_at,
+                "watched": [{"port": k, "present": v} for k, v in sorted(self._present.items())],
+            }
+
+    # ---------- worker ----------
+    def _loop(self) -> None:
+        next_enum = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_enum:
+                self.enumerate()
+                next_enum = now + self.enumerate_every
+
+            with self._lock:
+                keys = list(self._watchers)
+            changes = []
+            for key in keys:
+                present = self._check(key)
+                with self._lock:
+                    if key not in self._present or self._present[key] == present:
+                        continue
+                    self._present[key] = present
+                    fns = list(self._watchers.get(key, []))
+                changes.append((key, present, fns))
+
+            for key, present, fns in changes:
+                for fn in fns:
+                    try:
+                        fn(key, present)
+                    except Exception:
+                        pass
+
+            self._stop.wait(self.interval)
+
+
+PORTS = PortMonitor()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from typing import Callable, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class RingBuffer(Generic[T]):
+    """Fixed-capacity history with monotonically increasing sequence numbers.
+
+    Every appended item gets the next sequence number (starting at 1). Once
+    full, the oldest slot is overwritten; append is O(1) regardless of
+    capacity and reads cost O(k) in the number of items returned.
+
+    Writers must be serialized by the caller (AppState holds a lock around
+    append/clear/resize). Readers that cannot take that lock use read() and
+    read_range(), which need `seq_of` to tell an item's own seq number.
+    """
+
+    def __init__(self, capacity: int, seq_of: Optional[Callable[[T], int]] = None):
+        capacity = int(capacity)
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = capacity
+        self._seq_of = seq_of
+        self._slots: List[Optional[T]] = [None] * capacity
+        self._next_seq = 1  # seq the next append will get
+        self._first_seq = 1  # oldest seq still held
+
+    def __len__(self) -> int:
+        return self._next_seq - self._first_seq
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest sequence number still in the buffer."""
+        return self._first_seq
+
+    @property
+    def last_seq(self) -> int:
+        """Newest sequence number handed out (0 if nothing was ever appended)."""
+        return self._next_seq - 1
+
+    def append(self, item: T) -> int:
+        seq = self._next_seq
+        self._slots[seq % self.capacity] = item
+        self._next_seq = seq + 1
+        if seq - self._first_seq >= self.capacity:
+            self._first_seq = seq - self.capacity + 1
+        return seq
+
+    def get(self, seq: int) -> Optional[T]:
+        if self._first_seq <= seq < self._next_seq:
+            return self._slots[seq % self.capacity]
+        return None
+
+    def range(self, start_seq: int, end_seq: Optional[int] = None) -> List[T]:
+        """Items with start_seq <= seq < end_seq, clipped to what is held."""
+        lo = max(int(start_seq), self._first_seq)
+        hi = self._next_seq if end_seq is None else min(int(end_seq), self._next_seq)
+        if hi <= lo:
+            return []
+        cap = self.capacity
+        a = lo % cap
+        b = a + (hi - lo)
+        if b <= cap:
+            return self._slots[a:b]  # type: ignore[return-value]
+        return self._slots[a:] + self._slots[:b - cap]  # type: ignore[operator]
+
+    def since(self, seq: int, limit: Optional[int] = None) -> List[T]:
+        """Items newer than seq (oldest first), at most the newest `limit`."""
+        start = int(seq) + 1
+        if limit is not None:
+            start = max(start, self._next_seq - int(limit))
+        return self.range(start)
+
+    def tail(self, k: int) -> List[T]:
+        """The newest k items, oldest first."""
+        if k <= 0:
+            return []
+        return self.range(self._next_seq - int(k))
+
+    # ---------- lock-free readers ----------
+    # append() stores the slot before advancing _next_seq, so every seq below
+    # the _next_seq a reader saw is already in place. What can go wrong is
+    # the opposite: a slot overwritten by a newer append while reading. Each
+    # item carries its seq, so such slots are detected and left out instead
+    # of returning the wrong frame. clear()/resize() swap in a new slot list,
+    # so a reader holding the old one just sees a consistent, older ring.
+
+    def read(self, seq: int) -> Optional[T]:
+        """get() without the writer's lock; None if seq is gone or not yet stored."""
+        slots = self._slots
+        item = slots[seq % len(slots)]
+        if item is None or self._seq_of(item) != seq:  # type: ignore[misc]
+            return None
+        return item
+
+    def read_range(self, start_seq: int, end_seq: Optional[int] = None) -> List[T]:
+        """range() without the writer's lock.
+
+        Items evicted while reading are dropped, so the result is an ordered
+        subset of the requested range (at worst missing its oldest items).
+        """
+        nxt = self._next_seq
+        lo = max(int(start_seq), self._first_seq)
+        hi = nxt if end_seq is None else min(int(end_seq), nxt)
+        if hi <= lo:
+            return []
+        slots = self._slots
+        cap = len(slots)
+        a = lo % cap
+        b = a + (hi - lo)
+        # a slice is copied atomically and appends go in seq order, so stale
+        # slots can only be a prefix of it: checking its first item suffices
+        if b <= cap:
+            items = slots[a:b]
+            if self._starts_at(items, lo):
+                return items  # type: ignore[return-value]
+        else:
+            head = slots[a:]
+            rest = slots[:b - cap]
+            items = head + rest
+            if self._starts_at(head, lo) and self._starts_at(rest, lo + len(head)):
+                return items  # type: ignore[return-value]
+        seq_of = self._seq_of
+        return [it for seq, it in enumerate(items, lo) if it is not None and seq_of(it) == seq]  # type: ignore[misc]
+
+    def _starts_at(self, items: List[Optional[T]], seq: int) -> bool:
+        first = items[0] if items else None
+        return first is not None and self._seq_of(first) == seq  # type: ignore[misc]
+
+    def clear(self) -> None:
+        """Drop all items; sequence numbers keep counting."""
+        self._slots = [None] * self.capacity
+        self._first_seq = self._next_seq
+
+    def resize(self, capacity: int) -> None:
+        """Change capacity, keeping the newest items that still fit."""
+        capacity = int(capacity)
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        keep = self.tail(min(len(self), capacity))
+        first = self._next_seq - len(keep)
+        # fill the new list before publishing it: a lock-free reader must
+        # never see it half-filled (the fast path checks only first items)
+        slots: List[Optional[T]] = [None] * capacity
+        for seq, item in enumerate(keep, start=first):
+            slots[seq % capacity] = item
+        self.capacity = capacity
+        self._slots = slots
+        self._first_seq = first
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .scheduler import PRIORITY_SCAN, TxJob
+
+# identification queries sent to responders (header -> device info key)
+IDENTIFY_HEADERS = {
+    246: "manufacturer",
+    245: "equipment_category",
+    244: "product",
+}
+
+
+def _ascii(data_hex: str) -> str:
+    try:
+        return bytes.fromhex(data_hex).decode("ascii", errors="replace").strip("\x00 ").strip()
+    except ValueError:
+        return ""
+
+
+def kind_for_category(category: str) -> str:
+    """Map a ccTalk equipment category id string to the UI's device kind."""
+    c = (category or "").lower()
+    if "coin" in c:
+        return "coin"
+    if "payout" in c or "hopper" in c:
+        return "hopper"
+    if "bill" in c or "recycl" in c:
+        return "bill"
+    return ""
+
+
+class AddressScanner:
+    """Server-side address sweep.
+
+    Sends simple poll (254) to each address through the bus scheduler and
+    records which ones actually reply. Responders are added to the bus state and,
+    with identify=True, queried for manufacturer / category / product.
+    The sweep is bounded by bus time (one reply window per address).
+    """
+
+    def __init__(self, controller, logger=None):
+        self.controller = controller
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._progress: Dict[str, Any] = {"running": False, "found": []}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self, start: int = 1, end: int = 255, timeout: float = 0.15, identify: bool = False) -> bool:
+        """Start a sweep; returns False if one is already running."""
+        start = max(1, min(int(start), 255))
+        end = max(start, min(int(end), 255))
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._progress = {
+                "running": True,
+                "start": start,
+                "end": end,
+                "current": None,
+                "scanned": 0,
+                "total": end - start + 1,
+                "identify": bool(identify),
+                "found": [],
+                "started_at": time.time(),
+                "finished_at": None,
+                "stopped": False,
+                "error": None,
+            }
+            self._thread = threading.Thread(
+                target=self._run, args=(start, end, float(timeout), bool(identify)),
+                name="address-scan", daemon=True,
+            )
+            self._thread.start()
+        if self.logger:
+            self.logger.info("Scan started: %d..%d timeout=%.3fs identify=%s", start, end, timeout, identify)
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def progress(self) -> Dict[str, Any]:
+        with self._lock:
+            p = dict(self._progress)
+            p["found"] = list(p.get("found", []))
+            return p
+
+    def _transact(self, dest: int, header: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """Reply dict from the scheduler, or None if the job failed (e.g. port lost)."""
+        job = self.controller.scheduler.submit(
+            TxJob(dest, header, priority=PRIORITY_SCAN, wait_reply=True, timeout=timeout)
+        )
+        job.done.wait(timeout + 10.0)
+        if job.result is None:
+            with self._lock:
+                self._progress["error"] = job.error or "send failed"
+        return job.result
+
+    def _run(self, start: int, end: int, timeout: float, identify: bool) -> None:
+        host = self.controller.host_address
+        for addr in range(start, end + 1):
+            if self._stop.is_set():
+                break
+            with self._lock:
+                self._progress["current"] = addr
+
+            if addr != host:
+                res = self._transact(addr, 254, timeout)
+                if res is None:
+                    # bus unusable: a partial sweep would misreport absent devices
+                    break
+                if not res["timeout"]:
+                    self._found(addr, res, identify, timeout)
+
+            with self._lock:
+                self._progress["scanned"] += 1
+
+        with self._lock:
+            self._progress["running"] = False
+            self._progress["current"] = None
+            self._progress["stopped"] = self._stop.is_set()
+            self._progress["finished_at"] = time.time()
+            found = len(self._progress["found"])
+        if self.logger:
+            self.logger.info("Scan finished: %d responder(s)", found)
+
+    def _found(self, addr: int, res: Dict[str, Any], identify: bool, timeout: float) -> None:
+        info: Dict[str, Any] = {"last_seen_ts": time.time()}
+        if identify:
+            for header, key in IDENTIFY_HEADERS.items():
+                if self._stop.is_set():
+                    break
+                r = self._transact(addr, header, timeout)
+                if r and r.get("reply"):
+                    info[key] = _ascii(r["reply"]["data_hex"])
+            kind = kind_for_category(info.get("equipment_category", ""))
+            if kind:
+                info["kind"] = kind
+
+        state = self.controller.state
+        state.note_device(addr)
+        state.update_device_info(addr, info)
+
+        entry = {"address": addr, "rtt_ms": res.get("rtt_ms"), **info}
+        with self._lock:
+            found: List[Dict[str, Any]] = self._progress["found"]
+            found.append(entry)
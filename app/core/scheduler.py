@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from serial.serialutil import SerialException
+
+
+# lower value runs first
+PRIORITY_OPERATOR = 0
+PRIORITY_SCAN = 5
+PRIORITY_POLL = 10
+
+BROADCAST = 0  # ccTalk broadcast address: nobody replies
+
+
+class TxJob:
+    """One queued bus transaction.
+
+    `sent` is set once the frame is on the wire; `done` once the bus is
+    released again: after the reply (or its timeout) with wait_reply, right
+    after the write otherwise. A fire-and-forget frame (and anything sent to
+    the broadcast address) holds the bus only for the write plus the usual
+    inter-frame gap; a reply the device sends anyway is still logged.
+    """
+
+    __slots__ = (
+        "dest", "header", "data", "priority", "wait_reply", "timeout", "retries",
+        "tx", "result", "error", "sent", "done",
+    )
+
+    def __init__(
+        self,
+        dest: int,
+        header: int,
+        data: bytes = b"",
+        priority: int = PRIORITY_OPERATOR,
+        wait_reply: bool = False,
+        timeout: float = 0.25,
+        retries: int = 0,
+    ):
+        self.dest = int(dest)
+        self.header = int(header)
+        self.data = bytes(data)
+        self.priority = int(priority)
+        self.wait_reply = bool(wait_reply)
+        self.timeout = float(timeout)
+        self.retries = int(retries)
+
+        self.tx: Optional[Dict[str, Any]] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.sent = threading.Event()
+        self.done = threading.Event()
+
+    def _on_sent(self, tx: Dict[str, Any]) -> None:
+        self.tx = tx
+        self.sent.set()
+
+    def _finish(self, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        self.result = result
+        self.error = error
+        if result is not None and result.get("tx") is not None:
+            self.tx = result["tx"]
+        self.sent.set()
+        self.done.set()
+
+
+class BatchJob:
+    """Ordered TX steps run back to back while holding the bus.
+
+    The scheduler treats the batch as one job: no poll, scan or other
+    command is sent between its steps. Each step is sent `delay` seconds
+    after the previous one released the bus (never sooner than the normal
+    inter-frame gap), so the spacing does not depend on HTTP or queueing.
+    With stop_on_error, a failed step (send error, or no reply to a
+    wait_reply step) skips the rest. `done` is set when the batch ends.
+
+    cancel() withdraws a batch that has not started yet (e.g. its caller gave
+    up waiting); once the first step is sent the batch always runs to the end.
+    """
+
+    __slots__ = ("steps", "delays", "priority", "stop_on_error", "results", "elapsed", "done",
+                 "cancelled", "started", "_lock")
+
+    def __init__(
+        self,
+        steps: Sequence[TxJob],
+        delays: Optional[Sequence[float]] = None,
+        priority: int = PRIORITY_OPERATOR,
+        stop_on_error: bool = True,
+    ):
+        self.steps = list(steps)
+        self.delays = [max(0.0, float(d)) for d in (delays or [0.0] * len(self.steps))]
+        if len(self.delays) != len(self.steps):
+            raise ValueError("one delay per step")
+        self.priority = int(priority)
+        self.stop_on_error = bool(stop_on_error)
+
+        self.results: List[Dict[str, Any]] = []
+        self.elapsed: Optional[float] = None
+        self.done = threading.Event()
+        self.cancelled = False
+        self.started = False
+        self._lock = threading.Lock()  # cancel() vs _start(): exactly one of them wins
+
+    def cancel(self) -> bool:
+        """Cancel if no step has been sent yet; False if the batch already started."""
+        with self._lock:
+            if not self.started:
+                self.cancelled = True
+            return self.cancelled
+
+    def _start(self) -> bool:
+        # scheduler thread, before the first step
+        with self._lock:
+            if not self.cancelled:
+                self.started = True
+            return self.started
+
+    def max_duration(self) -> float:
+        """Upper bound on the bus time the batch needs (delays plus reply windows)."""
+        return sum(self.delays) + sum(j.timeout * (j.retries + 1) for j in self.steps)
+
+    @staticmethod
+    def failed(step: TxJob) -> bool:
+        return step.result is None or (step.wait_reply and step.result.get("timeout"))
+
+
+class PollJob:
+    """Recurring background request registered through the API."""
+
+    def __init__(self, job_id: int, dest: int, header: int, data: bytes, interval: float, timeout: float):
+        self.id = job_id
+        self.dest = int(dest)
+        self.header = int(header)
+        self.data = bytes(data)
+        self.interval = float(interval)
+        self.timeout = float(timeout)
+
+        self.next_due = time.monotonic()
+        self.queued: Optional[TxJob] = None
+        self.runs = 0
+        self.timeouts = 0
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        last = self.last_result or {}
+        return {
+            "id": self.id,
+            "dest": self.dest,
+            "header": self.header,
+            "data_hex": self.data.hex(),
+            "interval_ms": round(self.interval * 1000.0, 3),
+            "runs": self.runs,
+            "timeouts": self.timeouts,
+            "last_rtt_ms": last.get("rtt_ms"),
+            "last_reply": last.get("reply"),
+        }
+
+
+class BusScheduler:
+    """Owns the TX side of one ccTalk bus.
+
+    All writes go through a priority queue served by a single thread, so
+    operator commands, scans and recurring polls never overlap on the
+    half-duplex bus. A wait_reply job holds the bus until its reply arrives
+    (or times out), any other job until its frame is written, and
+    consecutive frames are separated by at least `gap_chars` character
+    times at the current baud rate.
+    """
+
+    def __init__(self, controller, logger=None, gap_chars: float = 5.0, min_gap: float = 0.002):
+        self.controller = controller
+        self.logger = logger
+        self.gap_chars = float(gap_chars)
+        self.min_gap = float(min_gap)
+
+        self._heap: List[Tuple[int, int, Union[TxJob, BatchJob]]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._polls: Dict[int, PollJob] = {}
+        self._poll_ids = itertools.count(1)
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_end = 0.0
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="bus-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+
+    # ---------- timing ----------
+    def inter_frame_gap(self) -> float:
+        # 8N1: 10 bits per character
+        char_time = 10.0 / max(1, int(self.controller.baudrate))
+        return max(self.min_gap, self.gap_chars * char_time)
+
+    # ---------- queue ----------
+    def submit(self, job: TxJob) -> TxJob:
+        with self._cond:
+            heapq.heappush(self._heap, (job.priority, next(self._counter), job))
+            self._cond.notify()
+        return job
+
+    def send(self, dest: int, header: int, data: bytes = b"", **kw) -> TxJob:
+        return self.submit(TxJob(dest, header, data, **kw))
+
+    def submit_batch(self, batch: BatchJob) -> BatchJob:
+        with self._cond:
+            heapq.heappush(self._heap, (batch.priority, next(self._counter), batch))
+            self._cond.notify()
+        return batch
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._heap)
+
+    # ---------- recurring polls ----------
+    def add_poll(self, dest: int, header: int, data: bytes = b"", interval: float = 0.25,
+                 timeout: float = 0.25) -> PollJob:
+        with self._cond:
+            poll = PollJob(next(self._poll_ids), dest, header, data, max(0.01, interval), timeout)
+            self._polls[poll.id] = poll
+            self._cond.notify()
+        if self.logger:
+            self.logger.info("Poll %d registered: dest=%s header=%s every %.3fs", poll.id, dest, header, poll.interval)
+        return poll
+
+    def remove_poll(self, poll_id: int) -> bool:
+        with self._cond:
+            return self._polls.pop(int(poll_id), None) is not None
+
+    def polls(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [p.to_dict() for p in self._polls.values()]
+
+    def _queue_due_polls(self, now: float) -> float:
+        """Queue polls that are due; return seconds until the next one (caller holds _cond)."""
+        wait = 1.0
+        for poll in self._polls.values():
+            if poll.queued is None and poll.next_due <= now:
+                poll.queued = TxJob(poll.dest, poll.header, poll.data, priority=PRIORITY_POLL,
+                                    wait_reply=True, timeout=poll.timeout)
+                heapq.heappush(self._heap, (PRIORITY_POLL, next(self._counter), poll.queued))
+                # no catch-up bursts after a stall
+                poll.next_due = max(poll.next_due + poll.interval, now)
+            if poll.queued is None:
+                wait = min(wait, poll.next_due - now)
+        return max(0.0, wait)
+
+    def _finish_poll(self, job: TxJob) -> None:
+        with self._cond:
+            for poll in self._polls.values():
+                if poll.queued is job:
+                    poll.queued = None
+                    poll.runs += 1
+                    if job.result is None or job.result.get("timeout"):
+                        poll.timeouts += 1
+                    poll.last_result = job.result
+                    break
+
+    # ---------- worker ----------
+    def _loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                wait = self._queue_due_polls(time.monotonic())
+                if not self._heap:
+                    self._cond.wait(wait)
+                    continue
+                _, _, job = heapq.heappop(self._heap)
+
+            # inter-frame gap since the bus was last released
+            gap = self._last_end + self.inter_frame_gap() - time.monotonic()
+            if gap > 0:
+                time.sleep(gap)
+
+            if isinstance(job, BatchJob):
+                self._execute_batch(job)
+                continue
+            self._execute(job)
+            self._last_end = time.monotonic()
+            if job.priority == PRIORITY_POLL:
+                self._finish_poll(job)
+
+        # release anyone still waiting
+        with self._cond:
+            pending = [j for _, _, j in self._heap]
+            self._heap.clear()
+        for job in pending:
+            if isinstance(job, BatchJob):
+                self._finish_batch(job, 0, time.monotonic(), "scheduler stopped")
+            else:
+                job._finish(error="scheduler stopped")
+
+    def _execute_batch(self, batch: BatchJob) -> None:
+        t0 = time.monotonic()
+        if not batch._start():
+            return self._finish_batch(batch, 0, t0, "cancelled")
+        for i, (step, delay) in enumerate(zip(batch.steps, batch.delays)):
+            if self._stop.is_set():
+                return self._finish_batch(batch, i, t0, "scheduler stopped")
+            wait = self._last_end + max(delay, self.inter_frame_gap()) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            t_step = time.monotonic()
+            self._execute(step)
+            self._last_end = time.monotonic()
+
+            res = step.result or {}
+            out: Dict[str, Any] = {
+                "index": i,
+                "ok": not batch.failed(step),
+                "t_ms": round((t_step - t0) * 1000.0, 3),
+                "duration_ms": round((self._last_end - t_step) * 1000.0, 3),
+                "tx": step.tx,
+            }
+            if step.wait_reply:
+                out.update(reply=res.get("reply"), rtt_ms=res.get("rtt_ms"),
+                           attempts=res.get("attempts"), timeout=res.get("timeout"))
+            if step.error:
+                out["error"] = step.error
+            elif step.wait_reply and res.get("timeout"):
+                out["error"] = "timeout"
+            batch.results.append(out)
+            if batch.stop_on_error and not out["ok"]:
+                return self._finish_batch(batch, i + 1, t0, f"step {i} failed")
+        self._finish_batch(batch, len(batch.steps), t0)
+
+    @staticmethod
+    def _finish_batch(batch: BatchJob, ran: int, t0: float, skip_reason: Optional[str] = None) -> None:
+        for i in range(ran, len(batch.steps)):
+            batch.results.append({"index": i, "ok": False, "skipped": True, "error": skip_reason})
+        batch.elapsed = time.monotonic() - t0
+        batch.done.set()
+
+    def _execute(self, job: TxJob) -> None:
+        state = self.controller.state
+        if not state.connected:
+            job._finish(error=state.last_error or "Serial disconnected")
+            return
+
+        device = self.controller.device
+        try:
+            if job.wait_reply and job.dest != BROADCAST:
+                result = device.send_and_wait(
+                    job.dest, job.header, job.data,
+                    timeout=job.timeout,
+                    retries=job.retries,
+                    on_sent=job._on_sent,
+                )
+            else:
+                tx = device.send(job.dest, job.header, job.data)
+                result = {"tx": tx, "reply": None, "rtt_ms": None, "attempts": 1, "echo": False, "timeout": False}
+            job._finish(result)
+        except (SerialException, OSError) as e:
+            state.set_connected(False, str(e))
+            try:
+                self.controller.sio.close()
+            except Exception:
+                pass
+            job._finish(error=str(e))
+        except Exception as e:
+            if self.logger:
+                self.logger.warning("TX job failed: %s", e)
+            job._finish(error=str(e))
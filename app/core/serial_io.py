@@ -2,26 +2,37 @@
 from __future__ import annotations
 
 import threading
+import time
 from typing import Optional
 
 import serial
 from serial.serialutil import SerialException
 
+from .metrics import RX_BYTES, SERIAL_READ, SERIAL_WRITE, TX_BYTES
+
 
 class SerialIO:
     """
     Serial wrapper for ccTalk.
 
     Does NOT open automatically; call open().
-    Thread-safe read/write.
+    Thread-safe read/write. Reads take their own lock so a read blocked
+    waiting for the bus never holds up a write (pySerial allows one reader
+    and one writer thread concurrently).
     """
 
-    def __init__(self, port: str, baudrate: int = 9600, timeout: float = 0.1, **_ignored):
+    def __init__(self, port: str, baudrate: int = 9600, timeout: float = 0.1, bus: str = "default", **_ignored):
         self.port = port
         self.baudrate = int(baudrate)
         self.timeout = float(timeout)
 
+        self._m_rx = RX_BYTES.labels(bus)
+        self._m_tx = TX_BYTES.labels(bus)
+        self._m_read = SERIAL_READ.labels(bus)
+        self._m_write = SERIAL_WRITE.labels(bus)
+
         self._lock = threading.Lock()
+        self._rx_lock = threading.Lock()
         self._ser: Optional[serial.Serial] = None
 
     @property
@@ -76,21 +87,63 @@ class SerialIO:
                     self._ser = None
 
     def read(self, n: int = 1024) -> bytes:
-        with self._lock:
-            if not (self._ser and self._ser.is_open):
+        with self._rx_lock:
+            ser = self._ser
+            if not (ser and ser.is_open):
+                return b""
+            try:
+                t0 = time.perf_counter()
+                data = ser.read(n)
+                if data:
+                    self._m_read.observe(time.perf_counter() - t0)
+                    self._m_rx.inc(len(data))
+                return data
+            except SerialException:
+                self.close()
+                raise
+
+    def read_available(self, max_bytes: int = 4096) -> bytes:
+        """Block until at least one byte arrives (or the port timeout
+        elapses), then return it together with whatever the driver already
+        has buffered (in_waiting). Returns b"" on timeout.
+        """
+        with self._rx_lock:
+            ser = self._ser
+            if not (ser and ser.is_open):
                 return b""
             try:
-                return self._ser.read(n)
+                first = ser.read(1)
+                if not first:
+                    return b""
+                t0 = time.perf_counter()
+                n = ser.in_waiting
+                data = first + ser.read(min(n, max_bytes)) if n else first
+                self._m_read.observe(time.perf_counter() - t0)
+                self._m_rx.inc(len(data))
+                return data
             except SerialException:
                 self.close()
                 raise
 
+    def cancel_read(self) -> None:
+        """Wake a reader blocked in read()/read_available() (no lock taken)."""
+        ser = self._ser
+        if ser is not None and hasattr(ser, "cancel_read"):
+            try:
+                ser.cancel_read()
+            except Exception:
+                pass
+
     def write(self, data: bytes) -> int:
         with self._lock:
             if not (self._ser and self._ser.is_open):
                 return 0
             try:
-                return self._ser.write(data)
+                t0 = time.perf_counter()
+                n = self._ser.write(data)
+                self._m_write.observe(time.perf_counter() - t0)
+                self._m_tx.inc(n or 0)
+                return n
             except SerialException:
                 self.close()
                 raise
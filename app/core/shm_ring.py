@@ -0,0 +1,138 @@
+"""
+Single-producer frame ring in multiprocessing.shared_memory.
+
+Written by a bus worker process (app/core/bus_process.py) and read by the
+web process without any locks or pipes on the data path.
+
+Layout (little endian):
+  header  64 bytes  "<8sIIQQQQQ8x"  magic, slots, slot size, write seq,
+                    frames, discarded, resyncs, partial timeouts (worker counters)
+  slots   `slots` x SLOT_SIZE
+          "<QddBBH4x" seq, wall ts, perf_counter at read, direction (0=RX/1=TX),
+          addr, length; raw frame bytes follow (ccTalk frames are <= 260 bytes)
+
+Each slot is a small seqlock: the writer zeroes the slot seq, fills the
+slot, stores the seq, then publishes it in the header. A reader accepts a
+slot only if its seq matches before and after reading the fields, so a
+slot overwritten mid-read (reader lapped by the writer) is counted as lost
+instead of returning torn data.
+"""
+from __future__ import annotations
+
+import struct
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, Optional, Tuple
+
+MAGIC = b"CCTSHM\x00\x01"
+
+HEADER = struct.Struct("<8sIIQQQQQ8x")
+SLOT = struct.Struct("<QddBBH4x")
+MAX_FRAME = 260
+SLOT_SIZE = SLOT.size + MAX_FRAME + 4  # keep slots 8-byte aligned
+
+_SEQ = struct.Struct("<Q")
+_WRITE_SEQ_AT = 16
+_COUNTERS = struct.Struct("<QQQQ")
+_COUNTERS_AT = 24
+_FIELDS = struct.Struct("<ddBBH")
+
+COUNTER_NAMES = ("frames", "discarded", "resyncs", "partial_timeouts")
+
+RingRecord = Tuple[int, float, float, int, int, bytes]  # seq, ts, t_rx, direction, addr, raw
+
+
+class ShmRing:
+    """Fixed-size frame ring in shared memory (one writer, any number of readers)."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        magic, slots, slot_size, _, *_ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or slot_size != SLOT_SIZE:
+            raise ValueError(f"{shm.name}: not a frame ring")
+        self.slots = slots
+
+    @classmethod
+    def create(cls, slots: int = 16384) -> "ShmRing":
+        slots = max(16, int(slots))
+        shm = shared_memory.SharedMemory(create=True, size=HEADER.size + slots * SLOT_SIZE)
+        HEADER.pack_into(shm.buf, 0, MAGIC, slots, SLOT_SIZE, 0, 0, 0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ShmRing":
+        # multiprocessing children share the creator's resource tracker, so
+        # attaching here does not make the segment outlive (or die with) us
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def write_seq(self) -> int:
+        return _SEQ.unpack_from(self.buf, _WRITE_SEQ_AT)[0]
+
+    # ---------- writer ----------
+    def write(self, seq: int, ts: float, t_rx: float, direction: int, addr: int, raw: bytes) -> None:
+        """Store record `seq` (must be write_seq + 1) and publish it."""
+        n = len(raw)
+        if n > MAX_FRAME:
+            raise ValueError("frame too long")
+        buf = self.buf
+        off = HEADER.size + (seq % self.slots) * SLOT_SIZE
+        _SEQ.pack_into(buf, off, 0)
+        _FIELDS.pack_into(buf, off + 8, ts, t_rx, direction, addr & 0xFF, n)
+        data = off + SLOT.size
+        buf[data:data + n] = raw
+        _SEQ.pack_into(buf, off, seq)
+        _SEQ.pack_into(buf, _WRITE_SEQ_AT, seq)
+
+    def set_counters(self, frames: int, discarded: int, resyncs: int, partial_timeouts: int) -> None:
+        _COUNTERS.pack_into(self.buf, _COUNTERS_AT, frames, discarded, resyncs, partial_timeouts)
+
+    # ---------- reader ----------
+    def counters(self) -> Dict[str, int]:
+        return dict(zip(COUNTER_NAMES, _COUNTERS.unpack_from(self.buf, _COUNTERS_AT)))
+
+    def read(self, next_seq: int, limit: Optional[int] = None) -> Tuple[Iterator[RingRecord], int, int]:
+        """Records from next_seq up to the current write seq.
+
+        Returns (records, new next_seq, lost). Records the writer has
+        already lapped are skipped and counted in `lost`.
+        """
+        last = self.write_seq
+        lost = 0
+        if last - next_seq + 1 > self.slots:
+            first = last - self.slots + 1
+            lost = first - next_seq
+            next_seq = first
+        end = last + 1 if limit is None else min(last + 1, next_seq + int(limit))
+        records = []
+        buf = self.buf
+        for seq in range(next_seq, end):
+            off = HEADER.size + (seq % self.slots) * SLOT_SIZE
+            if _SEQ.unpack_from(buf, off)[0] != seq:
+                lost += 1
+                continue
+            ts, t_rx, direction, addr, n = _FIELDS.unpack_from(buf, off + 8)
+            data = off + SLOT.size
+            raw = bytes(buf[data:data + n])
+            if _SEQ.unpack_from(buf, off)[0] != seq:
+                lost += 1
+                continue
+            records.append((seq, ts, t_rx, direction, addr, raw))
+        return iter(records), end, lost
+
+    def close(self) -> None:
+        self.buf = None
+        try:
+            self.shm.close()
+        except Exception:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except Exception:
+                pass
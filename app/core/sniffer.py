@@ -3,7 +3,7 @@ import time
 import threading
 from typing import Optional
 from .serial_io import SerialIO
-from .cctalk import try_parse_frames, decode_frame, header_name
+from .cctalk import FrameParser
 from .state import STATE, FrameRecord
 
 class Sniffer(threading.Thread):
@@ -13,7 +13,7 @@ class Sniffer(threading.Thread):
         self.logger = logger
         self.max_lines = max_lines
         self._stop = threading.Event()
-        self._buf = bytearray()
+        self.parser = FrameParser(strict=STATE.validate_checksum)
 
     def stop(self):
         self._stop.set()
@@ -24,16 +24,11 @@ class Sniffer(threading.Thread):
             try:
                 chunk = self.sio.read_available()
                 if chunk:
-                    self._buf.extend(chunk)
-                    frames, self._buf = try_parse_frames(self._buf)
+                    self.parser.strict = STATE.validate_checksum
+                    frames = self.parser.feed(chunk)
                     for fr in frames:
-                        dec = decode_frame(fr)
-                        if STATE.validate_checksum and not dec.valid:
-                            decoded = {"error": "bad_checksum", **dec.to_dict(), "header_name": header_name(dec.header)}
-                        else:
-                            decoded = {**dec.to_dict(), "header_name": header_name(dec.header)}
-                        rec = FrameRecord(ts=time.time(), direction="RX", addr=dec.src, raw_hex=fr.hex(), decoded=decoded)
-                        STATE.add_frame(rec, self.max_lines)
+                        rec = FrameRecord(ts=time.time(), direction="RX", addr=fr[2], raw=fr)
+                        STATE.add_frame(rec)
                         self.logger.info("RX %s", fr.hex())
                 else:
                     time.sleep(0.01)
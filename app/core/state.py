@@ -1,18 +1,61 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from bisect import bisect_left
+from operator import attrgetter
 from threading import Lock
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import time
 
+from .cctalk import decode_frame
+from .compact import encode_frames
+from .metrics import FRAMES, LOCK_WAIT
+from .ringbuffer import RingBuffer
+
 
-@dataclass
 class FrameRecord:
-    ts: float
-    direction: str  # "RX" or "TX"
-    addr: int
-    raw_hex: str
-    decoded: Dict[str, Any] = field(default_factory=dict)
+    """One TX/RX frame as stored in history.
+
+    Only the raw bytes, timestamp and direction are kept; the decoded dict
+    (with header/device names) is built the first time someone reads it and
+    memoized, so frames nobody looks at cost no decoding at all.
+    """
+
+    __slots__ = ("ts", "direction", "addr", "raw", "seq", "_decoded", "_dict")
+
+    def __init__(self, ts: float, direction: str, addr: int, raw: bytes, seq: int = 0):
+        self.ts = ts
+        self.direction = direction  # "RX" or "TX"
+        self.addr = addr
+        self.raw = raw
+        self.seq = seq  # assigned by AppState.add_frame
+        self._decoded: Optional[Dict[str, Any]] = None
+        self._dict: Optional[Dict[str, Any]] = None
+
+    @property
+    def raw_hex(self) -> str:
+        return self.raw.hex()
+
+    @property
+    def decoded(self) -> Dict[str, Any]:
+        d = self._decoded
+        if d is None:
+            d = self._decoded = decode_frame(self.raw).to_dict()
+        return d
+
+    def to_dict(self) -> Dict[str, Any]:
+        """API representation (without the device label, which can change)."""
+        d = self._dict
+        if d is None:
+            d = self._dict = {
+                "seq": self.seq,
+                "ts": self.ts,
+                "time": time.strftime("%H:%M:%S", time.localtime(self.ts)),
+                "direction": self.direction,
+                "addr": self.addr,
+                "raw_hex": self.raw_hex,
+                "decoded": self.decoded,
+            }
+        return d
 
 
 class AppState:
@@ -21,10 +64,17 @@ class AppState:
     Notes:
       - Controller thread is the ONLY thing that should touch the serial port.
       - Flask endpoints only read/modify STATE and signal controller.
+      - Readers never take a lock. Writers publish instead of mutating what
+        a reader might hold: connection/config as a fresh dict, the device
+        list and address index copy-on-write, frames into the ring (whose
+        lock-free reads drop slots overwritten mid-read). So the RX thread
+        only ever waits for another frame writer, never for an API request.
     """
 
-    def __init__(self):
-        self._lock = Lock()
+    def __init__(self, frame_capacity: int = 5000, bus_id: str = "default"):
+        self._lock = Lock()  # frame writers (RX thread, TX paths)
+        self._cfg_lock = Lock()  # connection/config and device writers
+        self.set_bus_id(bus_id)
 
         # connection
         self.connected: bool = False
@@ -32,17 +82,76 @@ class AppState:
         self.baud: int = 9600
         self.validate_checksum: bool = True
         self.last_error: Optional[str] = None
+        # published copy of the fields above (replaced, never mutated)
+        self._conn: Dict[str, Any] = {}
+        # bumped whenever the published connection/config changes
+        self.status_rev: int = 0
+        self._publish_conn()
 
-        # frames
-        self.frames: List[FrameRecord] = []
+        # frames (fixed-capacity ring, seq numbers keep counting across clears)
+        self.frames: RingBuffer[FrameRecord] = RingBuffer(frame_capacity, seq_of=attrgetter("seq"))
+        # secondary indexes: address (addr/src/dest) or header -> ascending seqs.
+        # Entries below frames.first_seq are stale and pruned lazily.
+        self._by_addr: Dict[int, List[int]] = {}
+        self._by_header: Dict[int, List[int]] = {}
+        self._prune_at: int = frame_capacity
 
-        # devices
-        # internal canonical list: [{name,address,type}, ...]
+        # devices (copy-on-write: list, index and dicts are replaced, never mutated)
+        # canonical list sorted by address: [{name,address,type}, ...]
         self.devices: List[Dict[str, Any]] = []
         # addr -> device dict
         self._addr_index: Dict[int, Dict[str, Any]] = {}
+        # bumped whenever the device list changes (lets clients skip re-fetching it)
+        self.devices_rev: int = 0
+
+        # change listeners: fn(kind, payload), called outside the lock
+        #   "frame" -> FrameRecord, "status" -> connection dict, "devices" -> {devices, devices_rev}
+        self._listeners: List[Callable[[str, Any], None]] = []
+
+    def set_bus_id(self, bus_id: str) -> None:
+        """Label this state's metrics with the bus it belongs to."""
+        self.bus_id = str(bus_id)
+        self._m_frames = {d: FRAMES.labels(self.bus_id, d) for d in ("RX", "TX")}
+        self._m_wait_add = LOCK_WAIT.labels(self.bus_id, "add_frame")
+
+    # ---------- listeners ----------
+    # the list is replaced, never mutated, so _notify() on the RX thread can
+    # iterate it without the lock; adding a listener twice is a no-op
+    def add_listener(self, fn: Callable[[str, Any], None]) -> None:
+        if fn not in self._listeners:
+            self._listeners = [*self._listeners, fn]
+
+    def remove_listener(self, fn: Callable[[str, Any], None]) -> None:
+        self._listeners = [f for f in self._listeners if f != fn]
+
+    def _notify(self, kind: str, payload: Any) -> None:
+        for fn in self._listeners:
+            try:
+                fn(kind, payload)
+            except Exception:
+                pass
+
+    def _notify_status(self) -> None:
+        if self._listeners:
+            self._notify("status", self.connection())
+
+    def _notify_devices(self) -> None:
+        if self._listeners:
+            rev = self.devices_rev
+            self._notify("devices", {"devices": self.devices, "devices_rev": rev})
 
     # ---------- config / connection ----------
+    def _publish_conn(self) -> None:
+        # caller holds _cfg_lock (or is __init__)
+        self._conn = {
+            "connected": self.connected,
+            "port": self.port,
+            "baud": self.baud,
+            "validate_checksum": self.validate_checksum,
+            "last_error": self.last_error,
+        }
+        self.status_rev += 1
+
     def set_config(
         self,
         *,
@@ -50,29 +159,91 @@ class AppState:
         baud: Optional[int] = None,
         validate_checksum: Optional[bool] = None,
     ):
-        with self._lock:
+        with self._cfg_lock:
             if port is not None:
                 self.port = str(port)
             if baud is not None:
                 self.baud = int(baud)
             if validate_checksum is not None:
                 self.validate_checksum = bool(validate_checksum)
+            self._publish_conn()
+        self._notify_status()
 
     def set_connected(self, connected: bool, error: Optional[str] = None):
-        with self._lock:
+        with self._cfg_lock:
+            changed = (self.connected, self.last_error) != (bool(connected), error)
             self.connected = bool(connected)
             self.last_error = error
+            if changed:
+                self._publish_conn()
+        if changed:
+            self._notify_status()
 
     # ---------- frames ----------
-    def add_frame(self, rec: FrameRecord, max_lines: int = 5000):
-        with self._lock:
+    def _acquire(self, m_wait) -> None:
+        # only a contended acquire is timed; the common case costs one try
+        if self._lock.acquire(False):
+            m_wait.observe_zero()
+            return
+        t0 = time.perf_counter()
+        self._lock.acquire()
+        m_wait.observe(time.perf_counter() - t0)
+
+    def add_frame(self, rec: FrameRecord) -> int:
+        self._acquire(self._m_wait_add)
+        try:
+            # seq and index entries go in before the ring slot is published:
+            # a lock-free reader that sees the slot also finds it indexed
+            seq = rec.seq = self.frames.last_seq + 1
+            self._index_frame(rec)
             self.frames.append(rec)
-            if len(self.frames) > max_lines:
-                self.frames = self.frames[-max_lines:]
+            if seq >= self._prune_at:
+                self._prune_indexes()
+        finally:
+            self._lock.release()
+        self._m_frames[rec.direction].inc()
+        if self._listeners:
+            self._notify("frame", rec)
+        return seq
+
+    def _index_frame(self, rec: FrameRecord) -> None:
+        seq = rec.seq
+        raw = rec.raw
+        by_addr = self._by_addr
+        a = rec.addr
+        by_addr.setdefault(a, []).append(seq)
+        if len(raw) >= 3:
+            if raw[0] != a:
+                by_addr.setdefault(raw[0], []).append(seq)
+            if raw[2] != a and raw[2] != raw[0]:
+                by_addr.setdefault(raw[2], []).append(seq)
+        if len(raw) >= 4:
+            self._by_header.setdefault(raw[3], []).append(seq)
+
+    def _prune_indexes(self) -> None:
+        # once per `capacity` frames, so the cost is amortized O(1) per frame
+        first = self.frames.first_seq
+        for index in (self._by_addr, self._by_header):
+            for key in list(index):
+                seqs = index[key]
+                k = bisect_left(seqs, first)
+                if k == len(seqs):
+                    del index[key]
+                elif k:
+                    del seqs[:k]
+        self._prune_at = self.frames.last_seq + self.frames.capacity
 
     def clear_frames(self):
         with self._lock:
-            self.frames = []
+            self.frames.clear()
+            self._by_addr.clear()
+            self._by_header.clear()
+        self._notify_status()
+
+    def set_frame_capacity(self, capacity: int) -> None:
+        with self._lock:
+            self.frames.resize(capacity)
+            self._prune_indexes()
 
     # ---------- devices ----------
     def load_devices(self, payload: Any):
@@ -109,13 +280,23 @@ class AppState:
         # stable ordering
         devices.sort(key=lambda x: int(x.get("address", 0)))
 
-        with self._lock:
-            self.devices = devices
-            self._addr_index = {int(d["address"]): d for d in devices if "address" in d}
+        with self._cfg_lock:
+            self._publish_devices(devices)
+        self._notify_devices()
+
+    def _publish_devices(self, devices: List[Dict[str, Any]]) -> None:
+        # caller holds _cfg_lock; `devices` is a new, sorted list
+        self._addr_index = {int(d["address"]): d for d in devices if "address" in d}
+        self.devices = devices
+        self.devices_rev += 1
+
+    def _replace_device(self, new: Dict[str, Any]) -> None:
+        # caller holds _cfg_lock; swaps in an updated copy of a known device
+        a = new["address"]
+        self._publish_devices([new if d["address"] == a else d for d in self.devices])
 
     def device_for_addr(self, addr: int) -> Optional[Dict[str, Any]]:
-        with self._lock:
-            return self._addr_index.get(int(addr))
+        return self._addr_index.get(int(addr))
 
     def device_label(self, addr: int) -> str:
         d = self.device_for_addr(addr)
@@ -133,50 +314,203 @@ class AppState:
         Safe to call on TX/RX even if devices were not loaded from config.
         """
         a = int(addr)
-        with self._lock:
-            if a in self._addr_index:
+        if a in self._addr_index and not name and dtype is None:
+            return  # the per-TX case: known address, nothing to change, no lock
+        with self._cfg_lock:
+            d = self._addr_index.get(a)
+            if d is not None:
                 # optionally enrich existing record
+                new = dict(d)
                 if name:
-                    self._addr_index[a]["name"] = str(name)
+                    new["name"] = str(name)
                 if dtype is not None:
-                    self._addr_index[a]["type"] = str(dtype)
+                    new["type"] = str(dtype)
+                if new == d:
+                    return
+                self._replace_device(new)
+            else:
+                rec = {
+                    "name": str(name) if name else f"Addr {a}",
+                    "address": a,
+                    "type": str(dtype) if dtype else "",
+                }
+                devices = list(self.devices)
+                devices.insert(bisect_left([x["address"] for x in devices], a), rec)
+                self._publish_devices(devices)
+        self._notify_devices()
+
+    def update_device_info(self, addr: int, info: Dict[str, Any]) -> None:
+        """Merge extra fields (manufacturer, product, last_seen_ts, ...) into a known device."""
+        a = int(addr)
+        with self._cfg_lock:
+            d = self._addr_index.get(a)
+            if d is None:
                 return
+            self._replace_device({**d, **info})
+        self._notify_devices()
 
-            rec = {
-                "name": str(name) if name else f"Addr {a}",
-                "address": a,
-                "type": str(dtype) if dtype else "",
-            }
-            self.devices.append(rec)
-            self.devices.sort(key=lambda x: int(x.get("address", 0)))
-            self._addr_index[a] = rec
+    # ---------- snapshot ----------
+    def connection(self) -> Dict[str, Any]:
+        """Connection/config status only: no frames, no device list."""
+        frames = self.frames
+        return {
+            **self._conn,
+            "seq": frames.last_seq,
+            "first_seq": frames.first_seq,
+            "devices_rev": self.devices_rev,
+        }
 
-            # ---------- snapshot ----------
+    def version(self) -> Tuple[int, int, int, int]:
+        """Changes whenever anything connection()/snapshot() report changes."""
+        frames = self.frames
+        return (self.status_rev, self.devices_rev, frames.last_seq, frames.first_seq)
 
-    def snapshot(self) -> Dict[str, Any]:
-        with self._lock:
-            # last 200 for UI
-            tail = self.frames[-200:]
-            return {
-                "connected": self.connected,
-                "port": self.port,
-                "baud": self.baud,
-                "validate_checksum": self.validate_checksum,
-                "last_error": self.last_error,
-                "devices": self.devices,
-                "frames": [
-                    {
-                        "ts": r.ts,
-                        "time": time.strftime("%H:%M:%S", time.localtime(r.ts)),
-                        "direction": r.direction,
-                        "addr": r.addr,
-                        "device": (self._addr_index.get(int(r.addr)) or {}).get("name"),
-                        "raw_hex": r.raw_hex,
-                        "decoded": r.decoded,
-                    }
-                    for r in tail
-                ],
-            }
+    def frame_rows(self, recs: List[FrameRecord]) -> List[Dict[str, Any]]:
+        """API row dicts for frames: to_dict() plus the sender's device name."""
+        index = self._addr_index
+        return [{**r.to_dict(), "device": (index.get(r.addr) or {}).get("name")} for r in recs]
+
+    def frames_out(self, recs: List[FrameRecord], compact: bool = False) -> Any:
+        """Frames as the API sends them: row dicts, or the columnar form (see app.core.compact)."""
+        return encode_frames(recs, self._addr_index) if compact else self.frame_rows(recs)
+
+    def _seq_at_time(self, ts: float, lo: int, hi: int) -> int:
+        """First seq in [lo, hi) whose frame is at or after `ts` (evicted frames count as older)."""
+        frames = self.frames
+        while lo < hi:
+            mid = (lo + hi) // 2
+            r = frames.read(mid)
+            if r is None or r.ts < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query_frames(
+        self,
+        *,
+        direction: Optional[str] = None,
+        addr: Optional[int] = None,
+        header: Optional[int] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        text: Optional[str] = None,
+        since: Optional[int] = None,
+        before: Optional[int] = None,
+        limit: int = 200,
+        chunk: int = 1024,
+        compact: bool = False,
+    ) -> Dict[str, Any]:
+        """Search the in-memory history, newest first.
+
+        Returns at most `limit` matching frames (oldest first) with
+        seq < `before` and seq > `since`, plus the seq/first_seq cursor
+        info.  `next_before` is the cursor for the next (older) page, or
+        None when exhausted.  Clients drop local frames with
+        seq < first_seq (cleared or evicted).
+
+        `addr` matches the frame's addr, src or dest; `text` matches a hex
+        substring of the raw frame or the decoded header / device names.
+        Address and header filters walk the secondary indexes instead of
+        the whole ring; start/end are narrowed to a seq range by bisection.
+        Candidates are read in chunks without any lock; frames evicted
+        during the search are skipped. `compact` returns the frames in
+        columnar form (app.core.compact).
+        """
+        limit = max(1, int(limit))
+        direction = direction.upper() if direction else None
+        addr = None if addr is None else int(addr)
+        header = None if header is None else int(header)
+        needle = (text or "").strip().lower()
+        hex_needle = needle.replace(" ", "")
+        if hex_needle and any(c not in "0123456789abcdef" for c in hex_needle):
+            hex_needle = ""
+
+        frames = self.frames
+        seq = frames.last_seq
+        first_seq = frames.first_seq
+        lo = first_seq if since is None else max(first_seq, int(since) + 1)
+        hi = seq + 1 if before is None else min(seq + 1, int(before))
+        if start is not None and lo < hi:
+            lo = self._seq_at_time(float(start), lo, hi)
+        if end is not None and lo < hi:
+            hi = self._seq_at_time(float(end) + 1e-6, lo, hi)
+
+        index: Optional[List[int]] = None
+        if addr is not None:
+            index = self._by_addr.get(addr, [])
+        if header is not None:
+            h = self._by_header.get(header, [])
+            if index is None or len(h) < len(index):
+                index = h
+        if index is not None:
+            index = list(index)  # one atomic copy; the writer appends/prunes the original
+            index = index[bisect_left(index, lo):bisect_left(index, hi)]
+
+        matches: List[FrameRecord] = []
+        while hi > lo and len(matches) < limit:
+            lo = max(lo, frames.first_seq)  # evicted meanwhile
+            if index is None:
+                c_lo = max(lo, hi - chunk)
+                recs = frames.read_range(c_lo, hi)
+            else:
+                del index[:bisect_left(index, lo)]
+                seqs = index[-chunk:]
+                del index[-chunk:]
+                recs = [r for r in map(frames.read, seqs) if r is not None]
+                c_lo = seqs[0] if seqs else lo
+
+            for r in reversed(recs):
+                raw = r.raw
+                if direction and r.direction != direction:
+                    continue
+                if addr is not None and r.addr != addr and (len(raw) < 3 or (raw[0] != addr and raw[2] != addr)):
+                    continue
+                if header is not None and (len(raw) < 4 or raw[3] != header):
+                    continue
+                if start is not None and r.ts < start:
+                    continue
+                if end is not None and r.ts > end:
+                    continue
+                if needle and not (hex_needle and hex_needle in raw.hex()):
+                    d = r.decoded
+                    names = f"{d.get('header_name', '')} {d.get('src_name', '')} {d.get('dest_name', '')}".lower()
+                    if needle not in names:
+                        continue
+                matches.append(r)
+                if len(matches) == limit:
+                    hi = r.seq
+                    break
+            else:
+                hi = c_lo
+
+        matches.reverse()
+        return {
+            "seq": seq,
+            "first_seq": first_seq,
+            "frames": self.frames_out(matches, compact),
+            "next_before": hi if hi > lo else None,
+        }
+
+    def snapshot(self, since: Optional[int] = None, devices_rev: Optional[int] = None,
+                 limit: int = 200, compact: bool = False) -> Dict[str, Any]:
+        """Full UI status.
+
+        With `since`, only frames newer than that seq are included; with
+        `devices_rev`, the device list is omitted if it has not changed.
+        `compact` returns the frames in columnar form (app.core.compact).
+        Takes no lock: everything comes from published, immutable data.
+        """
+        out = self.connection()
+        if devices_rev is None or devices_rev != out["devices_rev"]:
+            # read after the rev (writers publish the list first), so the
+            # list is never older than the rev the client will remember
+            out["devices"] = self.devices
+        start = out["seq"] + 1 - max(0, int(limit))
+        if since is not None:
+            start = max(start, int(since) + 1)
+        out["frames"] = self.frames_out(self.frames.read_range(start, out["seq"] + 1), compact)
+        return out
 
 
 STATE = AppState()
@@ -1,29 +1,197 @@
+import atexit
 import logging
+import os
+import queue
+import threading
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, RotatingFileHandler
+from typing import List, Optional
+
+
+class _DeferredFlushMixin:
+    """Handler whose per-record flush is skipped while the listener batches."""
+
+    _batching = False
+
+    def flush(self):
+        if not self._batching:
+            super().flush()
+
+    def flush_batch(self):
+        self._batching = False
+        try:
+            super().flush()
+        finally:
+            self._batching = True
+
+
+class BatchedRotatingFileHandler(_DeferredFlushMixin, RotatingFileHandler):
+    pass
+
+
+class BatchedStreamHandler(_DeferredFlushMixin, logging.StreamHandler):
+    pass
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Non-blocking QueueHandler: when the bounded queue is full the record is
+    dropped and counted instead of stalling the caller (e.g. the RX thread)."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting happens on the listener thread, not here
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener:
+    """Drains the log queue on a background thread.
+
+    Records are handed to each handler (respecting the handler's own level)
+    in batches of up to `batch_size`; handlers are flushed once per batch
+    rather than once per record.
+    """
+
+    _SENTINEL = None
+
+    def __init__(self, q: queue.Queue, handlers: List[logging.Handler], batch_size: int = 256):
+        self.queue = q
+        self.handlers = handlers
+        self.batch_size = int(batch_size)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        for h in self.handlers:
+            if isinstance(h, _DeferredFlushMixin):
+                h._batching = True
+        self._thread = threading.Thread(target=self._run, name="log-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread and self._thread.is_alive():
+            self.queue.put(self._SENTINEL)
+            self._thread.join(timeout=5.0)
+        self._thread = None
+        for h in self.handlers:
+            if isinstance(h, _DeferredFlushMixin):
+                h._batching = False
+            h.flush()
+
+    def _run(self) -> None:
+        q = self.queue
+        while True:
+            rec = q.get()
+            batch = [rec]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            for rec in batch:
+                if rec is self._SENTINEL:
+                    stop = True
+                    continue
+                for h in self.handlers:
+                    if rec.levelno >= h.level:
+                        h.handle(rec)
+
+            for h in self.handlers:
+                try:
+                    if isinstance(h, _DeferredFlushMixin):
+                        h.flush_batch()
+                    else:
+                        h.flush()
+                except Exception:
+                    pass
+
+            if stop:
+                return
+
+
+_listener: Optional[BatchingQueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+
+
+def _level(name: str, default: int) -> int:
+    value = (os.getenv(name) or "").strip()
+    if not value:
+        return default
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value.upper())
+    return level if isinstance(level, int) else default
+
+
+def logging_stats() -> dict:
+    """Queue depth and records dropped because the log queue was full."""
+    if not _queue_handler:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
+def setup_logging(
+    log_dir: str = "logs",
+    filename: str = "session.log",
+    queue_size: Optional[int] = None,
+    file_level: Optional[int] = None,
+    console_level: Optional[int] = None,
+) -> logging.Logger:
+    """Configure the "cctalk" logger.
+
+    Callers only enqueue records (DroppingQueueHandler); formatting, file
+    writes, rotation and console output run on a listener thread so slow
+    disks or a slow console cannot stall serial reads.
+
+    Env overrides: LOG_QUEUE_SIZE, LOG_FILE_LEVEL, LOG_CONSOLE_LEVEL.
+    """
+    global _listener, _queue_handler
 
-def setup_logging(log_dir: str = "logs", filename: str = "session.log") -> logging.Logger:
     Path(log_dir).mkdir(parents=True, exist_ok=True)
     logger = logging.getLogger("cctalk")
-    logger.setLevel(logging.INFO)
 
     # Avoid duplicate handlers if reloaded by Flask
     if logger.handlers:
         return logger
 
+    if queue_size is None:
+        queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    if file_level is None:
+        file_level = _level("LOG_FILE_LEVEL", logging.INFO)
+    if console_level is None:
+        console_level = _level("LOG_CONSOLE_LEVEL", logging.INFO)
+
     fmt = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
 
     log_path = (Path(log_dir) / filename).resolve()
-    print("Logging to:", log_path)  # <-- pridėk šitą (laikinai)
 
-    fh = RotatingFileHandler(log_path, maxBytes=2_000_000, backupCount=5, encoding="utf-8")
+    fh = BatchedRotatingFileHandler(log_path, maxBytes=2_000_000, backupCount=5, encoding="utf-8")
     fh.setFormatter(fmt)
-    fh.setLevel(logging.INFO)
+    fh.setLevel(file_level)
 
-    sh = logging.StreamHandler()
+    sh = BatchedStreamHandler()
     sh.setFormatter(fmt)
-    sh.setLevel(logging.INFO)
+    sh.setLevel(console_level)
+
+    # the logger passes exactly what some handler wants; records nobody
+    # wants are rejected before a LogRecord is even built
+    logger.setLevel(min(file_level, console_level))
+
+    q: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+    _queue_handler = DroppingQueueHandler(q)
+    _listener = BatchingQueueListener(q, [fh, sh])
+    _listener.start()
+    atexit.register(_listener.stop)
 
-    logger.addHandler(fh)
-    logger.addHandler(sh)
-    return logger
\ No newline at end of file
+    logger.addHandler(_queue_handler)
+    logger.info("Logging to: %s", log_path)
+    return logger
@@ -1,16 +1,18 @@
+import argparse
 import os
 from app.api.routes import create_app
+from app.server import SERVERS, serve
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ccTalk logger web UI / API")
+    ap.add_argument("--server", choices=SERVERS, default=os.getenv("SERVER", "dev"),
+                    help="dev (Werkzeug) or production (waitress, see app/server.py); default $SERVER or dev")
+    args = ap.parse_args()
+
+    # created once: starts the bus controllers (serial ports open exactly once)
     app = create_app()
 
     host = os.getenv("HOST", "127.0.0.1")
     port = int(os.getenv("PORT", "5000"))
 
-    app.run(
-        host=host,
-        port=port,
-        debug=False,
-        threaded=True,
-        use_reloader=False,  # IMPORTANT: prevents double-start (serial port opens twice)
-    )
\ No newline at end of file
+    serve(app, host, port, args.server)
@@ -0,0 +1,99 @@
+"""
+HTTP serving for run_logger.py (SERVER=dev|production, or --server).
+
+dev (default): Werkzeug's development server, one new thread per
+connection. Fine for a browser or two on localhost.
+
+production: the same app on waitress, a multi-threaded WSGI server:
+  - WEB_THREADS handler threads (default 16), fixed. Requests beyond that
+    wait in a queue instead of spawning threads, so a burst of API clients
+    cannot multiply threads competing with the bus threads for the GIL.
+    Every open /api/stream (one per dashboard tab) holds a thread for its
+    lifetime: keep WEB_THREADS above the number of tabs you expect;
+  - HTTP/1.1 keep-alive; a connection idle for WEB_IDLE_TIMEOUT seconds
+    (default 60) is closed (open streams send a ping every 15 s);
+  - at most WEB_CONNECTIONS open connections (default 100); further ones
+    wait in the listen backlog;
+  - request bodies over WEB_MAX_BODY bytes (default 1 MB) are refused.
+  Handlers that block already have their own limits (/api/send 5 s,
+  /api/transact timeout x retries), so no thread is held indefinitely.
+
+Both run the app object they are given in this process: create_app() (and
+with it the bus controllers and serial ports) runs exactly once, and
+waitress never forks workers that could open a port a second time.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional
+
+from flask import Flask
+
+SERVERS = ("dev", "production")
+
+
+def production_options() -> Dict[str, Any]:
+    """waitress settings from the WEB_* environment variables."""
+    return {
+        "threads": int(os.getenv("WEB_THREADS", "16")),
+        "channel_timeout": int(os.getenv("WEB_IDLE_TIMEOUT", "60")),
+        "connection_limit": int(os.getenv("WEB_CONNECTIONS", "100")),
+        "max_request_body_size": int(os.getenv("WEB_MAX_BODY", str(1024 * 1024))),
+        "cleanup_interval": 10,
+        "ident": "ccTalk-logger",
+    }
+
+
+class ServerHandle:
+    """A bound, not yet running server: serve_forever() blocks, shutdown() stops it."""
+
+    def __init__(self, mode: str, server: Any, port: int):
+        self.mode = mode
+        self.port = port
+        self._server = server
+
+    def serve_forever(self) -> None:
+        if self.mode == "production":
+            self._server.run()
+        else:
+            self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        if self.mode == "production":
+            from waitress import wasyncore
+
+            self._server.task_dispatcher.shutdown()
+            wasyncore.close_all(self._server._map)  # ends the loop in run()
+        else:
+            self._server.shutdown()
+
+
+def make_server(app: Flask, host: str, port: int, mode: str = "dev",
+                options: Optional[Dict[str, Any]] = None) -> ServerHandle:
+    """Bind `app` to host:port (port 0 = any free port) with the given server."""
+    if mode == "production":
+        try:
+            from waitress import create_server
+        except ImportError:
+            raise RuntimeError("SERVER=production needs waitress (pip install -r requirements.txt)")
+        server = create_server(app, host=host, port=port, **(options or production_options()))
+        return ServerHandle(mode, server, int(server.effective_port))
+    if mode == "dev":
+        from werkzeug.serving import make_server as make_dev_server
+
+        server = make_dev_server(host, port, app, threaded=True)
+        return ServerHandle(mode, server, server.server_port)
+    raise ValueError(f"server must be one of {', '.join(SERVERS)}")
+
+
+def serve(app: Flask, host: str, port: int, mode: Optional[str] = None) -> None:
+    """Serve until interrupted; `mode` defaults to $SERVER, else dev."""
+    mode = (mode or os.getenv("SERVER", "dev")).strip().lower()
+    handle = make_server(app, host, port, mode)
+    app.logger.info("Serving on http://%s:%d (%s server)", host, handle.port, mode)
+    try:
+        handle.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        handle.shutdown()
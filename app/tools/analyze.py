@@ -0,0 +1,282 @@
+"""
+Offline analyzer for rotated session logs.
+
+    python -m app.tools.analyze [paths...] [--bus ID] [--addr N] [--header N] [--dir RX|TX]
+                                [--since "YYYY-mm-dd HH:MM"] [--until ...]
+                                [--export frames.csv|frames.jsonl] [--json] [--jobs N]
+
+Paths may be files or directories (default: logs/, all session.log*).
+Each file is parsed in its own worker process, line by line, and the
+per-file partial counts are merged. Frames are decoded with
+app.core.cctalk, names come from the thesaurus. With several buses the
+log lines carry a "[bus] " prefix; use --bus to look at one of them
+(device addresses repeat across buses).
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.core.cctalk import decode_frame, device_name, header_name
+
+# "2026-10-17 00:15:36,865 INFO RX 020001feff" or "... INFO [rig2] RX 020001feff"
+LINE_RE = re.compile(
+    r"^(?P<ts>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) (?P<level>[A-Z]+) "
+    r"(?:\[(?P<bus>[^\]]+)\] )?"
+    r"(?:(?P<dir>RX|TX) (?P<hex>[0-9a-fA-F]+)\s*$)?"
+)
+
+
+def _new_counts() -> Dict[str, Any]:
+    return {
+        "files": 0,
+        "lines": 0,
+        "frames": 0,
+        "bad_checksum": 0,
+        "malformed": 0,
+        "warnings": 0,
+        "first": None,
+        "last": None,
+        "buses": {},
+        "devices": {},
+        "headers": {},
+    }
+
+
+def _span(d: Dict[str, Any], ts: str) -> None:
+    if d["first"] is None or ts < d["first"]:
+        d["first"] = ts
+    if d["last"] is None or ts > d["last"]:
+        d["last"] = ts
+
+
+def _matches(f: Dict[str, Any], ts: str, bus: str, direction: str, frame: bytes) -> bool:
+    if f.get("bus") is not None and bus != f["bus"]:
+        return False
+    if f.get("since") and ts < f["since"]:
+        return False
+    if f.get("until") and ts > f["until"]:
+        return False
+    if f.get("dir") and direction != f["dir"]:
+        return False
+    if f.get("addr") is not None and f["addr"] not in (frame[0], frame[2]):
+        return False
+    if f.get("header") is not None and frame[3] != f["header"]:
+        return False
+    return True
+
+
+def analyze_file(path: str, filters: Dict[str, Any], export_path: Optional[str] = None) -> Dict[str, Any]:
+    """Parse one log file; returns partial counts. Runs in a worker process."""
+    c = _new_counts()
+    c["files"] = 1
+    exported = 0
+    out = open(export_path, "w", encoding="utf-8") if export_path else None
+
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as fh:
+            for line in fh:
+                c["lines"] += 1
+                m = LINE_RE.match(line)
+                if not m:
+                    continue
+                ts = m.group("ts")
+                if m.group("level") in ("WARNING", "ERROR", "CRITICAL"):
+                    c["warnings"] += 1
+                hx = m.group("hex")
+                if not hx:
+                    continue
+
+                try:
+                    frame = bytes.fromhex(hx)
+                except ValueError:
+                    frame = b""
+                if len(frame) < 5 or len(frame) != 5 + frame[1]:
+                    c["malformed"] += 1
+                    continue
+
+                direction = m.group("dir")
+                bus = m.group("bus") or ""
+                if not _matches(filters, ts, bus, direction, frame):
+                    continue
+
+                dec = decode_frame(frame)
+                c["frames"] += 1
+                c["buses"][bus] = c["buses"].get(bus, 0) + 1
+                _span(c, ts)
+                if not dec.valid:
+                    c["bad_checksum"] += 1
+
+                # the device is the far end: RX comes from src, TX goes to dest
+                addr = dec.src if direction == "RX" else dec.dest
+                dev = c["devices"].setdefault(addr, {"rx": 0, "tx": 0, "bad": 0, "first": None, "last": None})
+                dev["rx" if direction == "RX" else "tx"] += 1
+                if not dec.valid:
+                    dev["bad"] += 1
+                _span(dev, ts)
+
+                hdr = c["headers"].setdefault(dec.header, {"count": 0, "bad": 0})
+                hdr["count"] += 1
+                if not dec.valid:
+                    hdr["bad"] += 1
+
+                if out is not None:
+                    out.write(json.dumps({
+                        "time": ts,
+                        "bus": bus,
+                        "direction": direction,
+                        "raw_hex": hx.lower(),
+                        **dec.to_dict(),
+                    }) + "\n")
+                    exported += 1
+    finally:
+        if out is not None:
+            out.close()
+
+    c["exported"] = exported
+    return c
+
+
+def merge(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    total = _new_counts()
+    total["exported"] = 0
+    for p in parts:
+        for k in ("files", "lines", "frames", "bad_checksum", "malformed", "warnings", "exported"):
+            total[k] += p[k]
+        for ts in (p["first"], p["last"]):
+            if ts:
+                _span(total, ts)
+        for bus, n in p["buses"].items():
+            total["buses"][bus] = total["buses"].get(bus, 0) + n
+        for addr, d in p["devices"].items():
+            t = total["devices"].setdefault(addr, {"rx": 0, "tx": 0, "bad": 0, "first": None, "last": None})
+            for k in ("rx", "tx", "bad"):
+                t[k] += d[k]
+            for ts in (d["first"], d["last"]):
+                if ts:
+                    _span(t, ts)
+        for h, d in p["headers"].items():
+            t = total["headers"].setdefault(h, {"count": 0, "bad": 0})
+            t["count"] += d["count"]
+            t["bad"] += d["bad"]
+    return total
+
+
+def find_logs(paths: List[str]) -> List[str]:
+    """Expand paths; rotated files are ordered oldest first (session.log.5 .. session.log)."""
+    files: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(glob.glob(os.path.join(p, "session.log*")))
+        else:
+            files.extend(glob.glob(p) or [p])
+
+    def rotation(path: str) -> tuple:
+        base, _, suffix = os.path.basename(path).rpartition(".log")
+        n = int(suffix[1:]) if suffix[1:].isdigit() else 0
+        return (os.path.dirname(path), base, -n)
+
+    return sorted(set(files), key=rotation)
+
+
+def _write_export(dest: str, parts: List[str]) -> None:
+    if dest.lower().endswith(".csv"):
+        cols = ["time", "bus", "direction", "src", "src_name", "dest", "dest_name", "header", "header_name",
+                "data_hex", "valid_checksum", "raw_hex"]
+        with open(dest, "w", newline="", encoding="utf-8") as out:
+            w = csv.DictWriter(out, fieldnames=cols, extrasaction="ignore")
+            w.writeheader()
+            for part in parts:
+                with open(part, "r", encoding="utf-8") as fh:
+                    for line in fh:
+                        w.writerow(json.loads(line))
+    else:
+        with open(dest, "wb") as out:
+            for part in parts:
+                with open(part, "rb") as fh:
+                    shutil.copyfileobj(fh, out)
+
+
+def _rate(bad: int, n: int) -> str:
+    return f"{(100.0 * bad / n):.2f}%" if n else "-"
+
+
+def print_report(r: Dict[str, Any], out=sys.stdout) -> None:
+    print(f"files: {r['files']}  lines: {r['lines']}  frames: {r['frames']}  "
+          f"bad checksum: {r['bad_checksum']} ({_rate(r['bad_checksum'], r['frames'])})  "
+          f"malformed: {r['malformed']}  warnings: {r['warnings']}", file=out)
+    print(f"time range: {r['first'] or '-'} .. {r['last'] or '-'}", file=out)
+    if r.get("exported"):
+        print(f"exported: {r['exported']} frames", file=out)
+    if len(r["buses"]) > 1 or "" not in r["buses"]:
+        print("buses: " + ", ".join(f"{b or '-'}={n}" for b, n in sorted(r["buses"].items())), file=out)
+
+    print("\nper device:", file=out)
+    print(f"  {'addr':>4}  {'name':<20} {'rx':>9} {'tx':>9} {'err':>8}  first .. last", file=out)
+    for addr in sorted(r["devices"]):
+        d = r["devices"][addr]
+        n = d["rx"] + d["tx"]
+        print(f"  {addr:>4}  {device_name(addr):<20} {d['rx']:>9} {d['tx']:>9} {_rate(d['bad'], n):>8}  "
+              f"{d['first']} .. {d['last']}", file=out)
+
+    print("\nper header:", file=out)
+    print(f"  {'hdr':>4}  {'name':<40} {'count':>9} {'err':>8}", file=out)
+    for h, d in sorted(r["headers"].items(), key=lambda kv: -kv[1]["count"]):
+        print(f"  {h:>4}  {header_name(h)[:40]:<40} {d['count']:>9} {_rate(d['bad'], d['count']):>8}", file=out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.tools.analyze", description=__doc__.strip().splitlines()[0])
+    ap.add_argument("paths", nargs="*", default=["logs"], help="log files or directories (default: logs)")
+    ap.add_argument("--bus", help="only this bus (log lines prefixed with [bus])")
+    ap.add_argument("--addr", type=int, help="only frames to/from this address")
+    ap.add_argument("--header", type=int, help="only frames with this header")
+    ap.add_argument("--dir", choices=("RX", "TX"), help="only this direction")
+    ap.add_argument("--since", help='start time prefix, e.g. "2026-10-17 08:00"')
+    ap.add_argument("--until", help="end time prefix (inclusive)")
+    ap.add_argument("--export", metavar="FILE", help="write matching frames to .csv or .jsonl")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = ap.parse_args(argv)
+
+    files = find_logs(args.paths)
+    if not files:
+        print("no log files found", file=sys.stderr)
+        return 1
+
+    until = args.until
+    if until:
+        until = until + "\uffff"  # make a prefix inclusive
+    filters = {"bus": args.bus, "addr": args.addr, "header": args.header, "dir": args.dir, "since": args.since, "until": until}
+
+    tmpdir = tempfile.mkdtemp(prefix="cctalk-analyze-") if args.export else None
+    try:
+        part_paths = [os.path.join(tmpdir, f"{i:04d}.jsonl") for i in range(len(files))] if tmpdir else [None] * len(files)
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            parts = list(pool.map(analyze_file, files, [filters] * len(files), part_paths))
+        report = merge(parts)
+        if args.export:
+            _write_export(args.export, part_paths)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, default=str)
+        print()
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
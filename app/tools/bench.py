@@ -0,0 +1,456 @@
+"""
+Benchmarks for the capture and API hot paths.
+
+    python -m app.tools.bench [--quick] [--only parse,decode,state,snapshot,e2e,http]
+                              [--out results.json] [--compare baseline.json] [--threshold 10]
+
+Suites:
+  parse     try_parse_frames / FrameParser.feed throughput at several read chunk sizes
+  decode    decode_frame and FrameRecord.to_dict throughput
+  state     AppState.add_frame with 1..8 writer threads while a reader polls snapshot()
+  snapshot  AppState.snapshot() and jsonify cost at several history sizes
+  e2e       emulated bus (app.tools.emulator) -> Controller -> /api/status latency,
+            and /api/transact round trips (Linux / macOS only)
+  http      dev vs production server (app/server.py) under concurrent keep-alive
+            API clients: requests/s and latency (Linux / macOS only)
+
+Results are one flat JSON object of metric -> value. Metric names end in
+their unit: "_per_s" (higher is better), "_ms" / "_us" (lower is better).
+--compare prints the change against an earlier --out file and exits with
+status 1 if any metric got worse by more than --threshold percent (max_ms
+values are shown but too noisy to fail a run).
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import http.client
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.cctalk import FrameParser, build_frame, decode_frame, try_parse_frames
+from app.core.state import AppState, FrameRecord
+
+Results = Dict[str, float]
+
+SUITES = ("parse", "decode", "state", "snapshot", "e2e", "http")
+
+
+# ---------- helpers ----------
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    """Fastest of `repeat` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _pct(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def _latency(out: Results, name: str, samples: List[float]) -> None:
+    if not samples:
+        return
+    ms = [s * 1000.0 for s in samples]
+    out[f"{name}/p50_ms"] = round(_pct(ms, 50), 4)
+    out[f"{name}/p95_ms"] = round(_pct(ms, 95), 4)
+    out[f"{name}/max_ms"] = round(max(ms), 4)
+
+
+def sample_frames(n: int, seed: int = 1) -> List[bytes]:
+    """Realistic mix: polls, short replies and 11-byte event buffers."""
+    rng = random.Random(seed)
+    frames = []
+    for _ in range(n):
+        size = rng.choice((0, 0, 1, 2, 4, 11, 16))
+        frames.append(build_frame(rng.choice((1, 2, 3, 40)), rng.choice((1, 2, 3, 40)),
+                                  rng.randrange(256), bytes(rng.randrange(256) for _ in range(size))))
+    return frames
+
+
+def _chunks(stream: bytes, size: int) -> List[bytes]:
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+
+# ---------- suites ----------
+def bench_parse(quick: bool) -> Results:
+    out: Results = {}
+    frames = sample_frames(2000 if quick else 20000)
+    stream = b"".join(frames)
+    repeat = 2 if quick else 5
+
+    for size in (1, 16, 256, 4096):
+        chunks = _chunks(stream, size)
+
+        def legacy():
+            buf = bytearray()
+            for c in chunks:
+                buf.extend(c)
+                _, buf = try_parse_frames(buf)
+
+        def incremental():
+            p = FrameParser(strict=True)
+            for c in chunks:
+                p.feed(c)
+
+        for name, fn in (("try_parse_frames", legacy), ("FrameParser.feed", incremental)):
+            t = _best(fn, repeat)
+            out[f"parse/{name}/chunk={size}/frames_per_s"] = round(len(frames) / t, 1)
+            out[f"parse/{name}/chunk={size}/mb_per_s"] = round(len(stream) / t / 1e6, 3)
+    return out
+
+
+def bench_decode(quick: bool) -> Results:
+    out: Results = {}
+    frames = sample_frames(2000 if quick else 20000)
+    repeat = 2 if quick else 5
+
+    t = _best(lambda: [decode_frame(f) for f in frames], repeat)
+    out["decode/decode_frame/frames_per_s"] = round(len(frames) / t, 1)
+
+    def to_dict():
+        for f in frames:
+            FrameRecord(0.0, "RX", f[2], f).to_dict()
+
+    t = _best(to_dict, repeat)
+    out["decode/FrameRecord.to_dict/frames_per_s"] = round(len(frames) / t, 1)
+    return out
+
+
+def bench_state(quick: bool) -> Results:
+    out: Results = {}
+    frames = sample_frames(1000)
+    per_thread = 5000 if quick else 50000
+
+    for writers in (1, 2, 4, 8):
+        state = AppState(5000)
+        stop = threading.Event()
+        reads = [0]
+
+        def reader():
+            while not stop.is_set():
+                state.snapshot(since=max(0, state.frames.last_seq - 20))
+                reads[0] += 1
+                time.sleep(0.001)  # a busy UI: ~1000 polls/s
+
+        def writer(k: int):
+            add = state.add_frame
+            for i in range(per_thread):
+                f = frames[(i + k) % len(frames)]
+                add(FrameRecord(0.0, "RX", f[2], f))
+
+        r = threading.Thread(target=reader, daemon=True)
+        r.start()
+        threads = [threading.Thread(target=writer, args=(k,)) for k in range(writers)]
+        t0 = time.perf_counter()
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        dt = time.perf_counter() - t0
+        stop.set()
+        r.join()
+        out[f"state/add_frame/writers={writers}/frames_per_s"] = round(writers * per_thread / dt, 1)
+        out[f"state/add_frame/writers={writers}/snapshots_per_s"] = round(reads[0] / dt, 1)
+    return out
+
+
+def bench_snapshot(quick: bool) -> Results:
+    from flask import Flask, jsonify
+
+    out: Results = {}
+    frames = sample_frames(1000)
+    app = Flask("bench")
+    repeat = 20 if quick else 100
+
+    for history in (500, 5000, 50000):
+        state = AppState(history)
+        for i in range(history):
+            f = frames[i % len(frames)]
+            state.add_frame(FrameRecord(time.time(), "RX", f[2], f))
+        last = state.frames.last_seq
+
+        cases = (("full", None), ("since", last - 10))
+        with app.app_context():
+            for name, since in cases:
+                def snap():
+                    return state.snapshot(since=since)
+
+                def snap_json():
+                    return jsonify(state.snapshot(since=since)).get_data()
+
+                # decoding is cached per record: measure the warm (steady state) cost
+                snap()
+                t = _best(snap, repeat)
+                out[f"snapshot/history={history}/{name}/snapshot_us"] = round(t * 1e6, 2)
+                t = _best(snap_json, repeat)
+                out[f"snapshot/history={history}/{name}/snapshot_jsonify_us"] = round(t * 1e6, 2)
+    return out
+
+
+@contextlib.contextmanager
+def _emulated_app() -> Iterator[Tuple[Any, Any]]:
+    """(app, emulator): create_app() on one emulated bus, connected; torn down after."""
+    from app.tools.emulator import BusEmulator, load_devices
+
+    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    devices = load_devices(os.path.join(base_dir, "devices.json"))
+    emu = BusEmulator(devices, latency=0.001, seed=1)
+    port = emu.start()
+
+    # a throwaway working dir keeps the session log out of the real logs/
+    cwd = os.getcwd()
+    work = tempfile.mkdtemp(prefix="cctalk-bench-")
+    os.chdir(work)
+    os.environ["BUSES"] = json.dumps([{"id": "bench", "port": port, "baud": 115200}])
+    os.environ.setdefault("LOG_CONSOLE_LEVEL", "WARNING")
+    app = None
+    try:
+        from app.api.routes import create_app
+
+        app = create_app()
+        client = app.test_client()
+        deadline = time.monotonic() + 5.0
+        while not client.get("/api/connection").get_json()["connected"]:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"controller did not open {port}")
+            time.sleep(0.05)
+        yield app, emu
+    finally:
+        if app is not None:
+            app.extensions["cctalk_buses"].stop()
+        os.chdir(cwd)
+        emu.stop()
+
+
+def bench_e2e(quick: bool) -> Results:
+    """Emulated bus -> Controller RX thread -> AppState -> Flask API."""
+    if os.name == "nt":
+        return {}
+
+    out: Results = {}
+    with _emulated_app() as (app, emu):
+        client = app.test_client()
+        n = 50 if quick else 300
+        frame = build_frame(1, 2, 0, b"\x2a")
+        rx_api: List[float] = []
+        status: List[float] = []
+        seq = client.get("/api/status").get_json()["seq"]
+        for _ in range(n):
+            t0 = time.perf_counter()
+            emu.inject(frame)
+            while True:
+                t1 = time.perf_counter()
+                snap = client.get(f"/api/status?since={seq}&devices_rev=-1").get_json()
+                status.append(time.perf_counter() - t1)
+                if snap["frames"]:
+                    rx_api.append(time.perf_counter() - t0)
+                    seq = snap["seq"]
+                    break
+                if t1 - t0 > 1.0:
+                    break
+            time.sleep(0.002)
+        _latency(out, "e2e/rx_to_api", rx_api)
+        _latency(out, "e2e/api_status", status)
+
+        rtt: List[float] = []
+        wire: List[float] = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            res = client.post("/api/transact", json={"dest": 2, "header": 254, "timeout_ms": 500}).get_json()
+            if res.get("ok") and res.get("rtt_ms") is not None:
+                rtt.append(time.perf_counter() - t0)
+                wire.append(res["rtt_ms"] / 1000.0)
+        _latency(out, "e2e/api_transact", rtt)
+        _latency(out, "e2e/transact_wire", wire)
+    return out
+
+
+# (path, weight): a dashboard's polls, a compact remote one, searches and a stats page
+HTTP_MIX: Sequence[Tuple[str, int]] = (
+    ("/api/status", 4),
+    ("/api/status?format=compact", 2),
+    ("/api/connection", 2),
+    ("/api/frames?addr=2&limit=100", 1),
+    ("/api/rx_stats", 1),
+)
+
+
+def _http_load(port: int, clients: int, duration: float, result: Any) -> None:
+    """Load generator (own process): `clients` keep-alive connections cycling HTTP_MIX."""
+    paths = [p for p, w in HTTP_MIX for _ in range(w)]
+    lat: List[float] = []
+    errors = [0]
+    stop_at = time.perf_counter() + duration
+
+    def client(k: int):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        i = k
+        while time.perf_counter() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors[0] += 1
+                lat.append(time.perf_counter() - t0)
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(clients)]
+    t0 = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    result.put((len(lat), errors[0], time.perf_counter() - t0, lat))
+
+
+def bench_http(quick: bool) -> Results:
+    """Same app and emulated bus behind each server, load from a separate process."""
+    if os.name == "nt":
+        return {}
+    from app.server import SERVERS, make_server
+
+    out: Results = {}
+    duration = 2.0 if quick else 8.0
+    ctx = mp.get_context("spawn")
+    with _emulated_app() as (app, emu):
+        state = app.extensions["cctalk_buses"].default.state
+        for i, f in enumerate(sample_frames(500)):
+            state.add_frame(FrameRecord(time.time(), "TX" if i % 2 else "RX", f[2], f))
+        for mode in SERVERS:
+            handle = make_server(app, "127.0.0.1", 0, mode)
+            th = threading.Thread(target=handle.serve_forever, daemon=True)
+            th.start()
+            try:
+                for clients in ((4, 32) if quick else (1, 8, 32, 64)):
+                    q = ctx.Queue()
+                    p = ctx.Process(target=_http_load, args=(handle.port, clients, duration, q))
+                    p.start()
+                    n, errors, dt, lat = q.get(timeout=duration + 60)
+                    p.join()
+                    name = f"http/{mode}/clients={clients}"
+                    out[f"{name}/req_per_s"] = round(n / dt, 1)
+                    out[f"{name}/error_count"] = errors
+                    _latency(out, name, lat)
+            finally:
+                handle.shutdown()
+                th.join(5.0)
+    return out
+
+
+RUNNERS = {
+    "parse": bench_parse,
+    "decode": bench_decode,
+    "state": bench_state,
+    "snapshot": bench_snapshot,
+    "e2e": bench_e2e,
+    "http": bench_http,
+}
+
+
+# ---------- reporting ----------
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s")
+
+
+def compare(current: Results, baseline: Results, threshold: float, out=sys.stdout) -> List[str]:
+    """Print the per-metric change; returns the metrics that regressed beyond threshold (%)."""
+    regressions = []
+    print(f"{'metric':<62} {'baseline':>12} {'current':>12} {'change':>9}", file=out)
+    for metric in sorted(set(current) & set(baseline)):
+        old, new = baseline[metric], current[metric]
+        if not old:
+            continue
+        change = (new - old) / old * 100.0
+        worse = -change if higher_is_better(metric) else change
+        flag = ""
+        if worse > threshold and not metric.endswith("max_ms"):
+            flag = "  REGRESSION"
+            regressions.append(metric)
+        print(f"{metric:<62} {old:>12g} {new:>12g} {change:>+8.1f}%{flag}", file=out)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.tools.bench", description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--quick", action="store_true", help="smaller inputs, fewer repeats")
+    ap.add_argument("--only", help=f"comma-separated suites ({','.join(SUITES)})")
+    ap.add_argument("--out", metavar="FILE", help="write results JSON here")
+    ap.add_argument("--compare", metavar="FILE", help="compare against an earlier --out file")
+    ap.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent (default 10)")
+    args = ap.parse_args(argv)
+
+    suites = [s.strip() for s in args.only.split(",")] if args.only else list(SUITES)
+    unknown = [s for s in suites if s not in RUNNERS]
+    if unknown:
+        ap.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    results: Results = {}
+    for suite in suites:
+        t0 = time.perf_counter()
+        results.update(RUNNERS[suite](args.quick))
+        print(f"{suite}: done in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("quick") != args.quick:
+            print("warning: comparing --quick and full runs", file=sys.stderr)
+        regressions = compare(results, baseline.get("results", {}), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:g}%", file=sys.stderr)
+            return 1
+        return 0
+
+    if not args.out:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
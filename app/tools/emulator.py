@@ -0,0 +1,456 @@
+"""
+Simulated ccTalk bus on a pseudo-terminal (Linux / macOS).
+
+    python -m app.tools.emulator [--devices devices.json] [--link /tmp/cctalk0]
+                                 [--latency 5] [--jitter 0] [--no-echo]
+                                 [--drop-rate 0] [--error-rate 0] [--noise-rate 0]
+                                 [--unsolicited-rate 0] [--coin-rate 0] [--coin-error-rate 0]
+                                 [--seed N]
+
+Creates a pty pair and answers on the master side as the devices listed in
+devices.json (coin acceptor, hoppers, iPRO recycler, anything else as a
+generic peripheral). Point the logger at the printed slave path (or at
+--link) with COM_PORT=... Every header in thesaurus.HEADERS gets an ACK
+with plausible data; other headers get a NAK.
+
+Faults and load, all reproducible with --seed:
+  --latency/--jitter   reply delay in ms (uniform jitter on top)
+  --drop-rate          probability that a device does not answer at all
+  --error-rate         probability that a reply has a bad checksum
+  --noise-rate         random junk bytes per second between frames
+  --unsolicited-rate   frames per second from devices that nobody asked for
+  --coin-rate          coins per second inserted into the coin acceptor
+                       (reported through header 229 with a rolling event counter)
+  --coin-error-rate    share of those events that are coin errors instead of credits
+
+The bus echoes every host frame (single-wire ccTalk) unless --no-echo.
+BusEmulator can also be used directly from Python (see app.tools.bench).
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+import random
+import select
+import signal
+import sys
+import threading
+import time
+import tty
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.cctalk import FrameParser, build_frame
+from app.core.thesaurus import HEADERS
+
+ACK = 0
+NAK = 5
+
+
+class SimDevice:
+    """Generic ccTalk peripheral: identification headers plus ACK for known headers."""
+
+    category = "Unknown"
+
+    def __init__(self, address: int, name: str = ""):
+        self.address = int(address)
+        self.name = name or f"device {address}"
+        self.serial = (0x010203 * self.address) & 0xFFFFFF
+
+    def reply(self, header: int, data: bytes) -> Optional[Tuple[int, bytes]]:
+        """(reply header, reply data) for a request, or None to stay silent."""
+        if header == 245:
+            return ACK, self.category.encode("ascii")
+        if header == 246:
+            return ACK, b"EMU"
+        if header == 244:
+            return ACK, self.name.encode("ascii", "replace")[:16]
+        if header == 242:
+            return ACK, self.serial.to_bytes(3, "little")
+        if header == 241:
+            return ACK, b"EMU-1.0"
+        if header == 192:
+            return ACK, b"SIM"
+        if header == 4:
+            return ACK, bytes([1, 4, 2])
+        if header == 248:
+            return ACK, b"\x00"
+        if header == 1:
+            self.reset()
+            return ACK, b""
+        if header in HEADERS:
+            return ACK, b""
+        return NAK, b""
+
+    def reset(self) -> None:
+        pass
+
+    def tick(self, now: float, rng: random.Random) -> None:
+        """Advance internal state (called from the emulator thread)."""
+
+
+class SimCoinAcceptor(SimDevice):
+    """Coin acceptor with a 5-entry credit/error buffer read by header 229.
+
+    The event counter starts at 0 after power-up/reset, counts 1..255 and
+    wraps to 1. Credits are (coin position, sorter path); errors are
+    (0, error code).
+    """
+
+    category = "Coin Acceptor"
+    ERROR_CODES = (1, 2, 8, 14, 254)
+
+    def __init__(self, address: int, name: str = "", coin_rate: float = 0.0, error_rate: float = 0.0):
+        super().__init__(address, name)
+        self.coin_rate = float(coin_rate)
+        self.error_rate = float(error_rate)
+        self.counter = 0
+        self.buffer: Deque[Tuple[int, int]] = deque(maxlen=5)
+        self.master_inhibit = 0
+        self._next_coin = 0.0
+
+    def reset(self) -> None:
+        self.counter = 0
+        self.buffer.clear()
+
+    def add_event(self, a: int, b: int) -> None:
+        self.counter = self.counter % 255 + 1
+        self.buffer.appendleft((a, b))
+
+    def tick(self, now: float, rng: random.Random) -> None:
+        if self.coin_rate <= 0:
+            return
+        if not self._next_coin:
+            self._next_coin = now + rng.expovariate(self.coin_rate)
+        while now >= self._next_coin:
+            if rng.random() < self.error_rate:
+                self.add_event(0, rng.choice(self.ERROR_CODES))
+            else:
+                self.add_event(rng.randint(1, 16), rng.randint(1, 4))
+            self._next_coin += rng.expovariate(self.coin_rate)
+
+    def reply(self, header: int, data: bytes) -> Optional[Tuple[int, bytes]]:
+        if header == 229:
+            events = list(self.buffer) + [(0, 0)] * (5 - len(self.buffer))
+            return ACK, bytes([self.counter] + [x for ev in events for x in ev])
+        if header == 227:
+            return ACK, bytes([self.master_inhibit])
+        if header == 228:
+            self.master_inhibit = data[0] & 1 if data else 0
+            return ACK, b""
+        if header == 230:
+            return ACK, b"\xff\xff"
+        return super().reply(header, data)
+
+
+class SimHopper(SimDevice):
+    """Payout hopper; header 167 starts a payout that drains at 5 coins/s."""
+
+    category = "Payout"
+
+    def __init__(self, address: int, name: str = ""):
+        super().__init__(address, name)
+        self.counter = 0
+        self.remaining = 0
+        self.paid = 0
+        self.unpaid = 0
+        self._last = 0.0
+
+    def reset(self) -> None:
+        self.counter = 0
+        self.remaining = self.paid = self.unpaid = 0
+
+    def tick(self, now: float, rng: random.Random) -> None:
+        if self.remaining and now - self._last >= 0.2:
+            self.remaining -= 1
+            self.paid += 1
+            self._last = now
+
+    def reply(self, header: int, data: bytes) -> Optional[Tuple[int, bytes]]:
+        if header == 166:
+            return ACK, bytes([self.counter, self.remaining & 0xFF, self.paid & 0xFF, self.unpaid & 0xFF])
+        if header == 167:
+            self.counter = self.counter % 255 + 1
+            self.remaining = data[-1] if data else 1
+            self.paid = self.unpaid = 0
+            return ACK, bytes([self.counter])
+        if header == 163:
+            return ACK, b"\x00"
+        if header == 217:
+            return ACK, b"\x00"
+        return super().reply(header, data)
+
+
+class SimRecycler(SimDevice):
+    """JCM iPRO-RC style bill recycler (bill events through headers 159 / 59)."""
+
+    category = "Bill Validator"
+
+    def __init__(self, address: int, name: str = ""):
+        super().__init__(address, name)
+        self.counter = 0
+        self.buffer: Deque[Tuple[int, int]] = deque(maxlen=5)
+
+    def reset(self) -> None:
+        self.counter = 0
+        self.buffer.clear()
+
+    def reply(self, header: int, data: bytes) -> Optional[Tuple[int, bytes]]:
+        if header in (159, 59):
+            events = list(self.buffer) + [(0, 0)] * (5 - len(self.buffer))
+            return ACK, bytes([self.counter] + [x for ev in events for x in ev])
+        if header == 29:
+            return ACK, b"\x00\x00"
+        if header == 33:
+            return ACK, b"IPRO-EMU"
+        if header == 28:
+            self.counter = self.counter % 255 + 1
+            self.buffer.appendleft((0, 10))
+            return ACK, b""
+        return super().reply(header, data)
+
+
+def make_device(entry: Dict[str, Any], coin_rate: float = 0.0, error_rate: float = 0.0) -> SimDevice:
+    address = int(entry["address"])
+    name = str(entry.get("name") or "")
+    kind = str(entry.get("type") or name).lower()
+    if "coin" in kind:
+        return SimCoinAcceptor(address, name, coin_rate=coin_rate, error_rate=error_rate)
+    if "hopper" in kind:
+        return SimHopper(address, name)
+    if "recycler" in kind or "ipro" in kind:
+        return SimRecycler(address, name)
+    return SimDevice(address, name)
+
+
+def load_devices(path: str, coin_rate: float = 0.0, error_rate: float = 0.0) -> List[SimDevice]:
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    entries = payload.get("devices", payload) if isinstance(payload, dict) else payload
+    return [make_device(e, coin_rate, error_rate) for e in entries]
+
+
+class BusEmulator:
+    """Runs simulated devices on the master side of a pty pair.
+
+    start() returns the slave path to open as a serial port. One thread
+    parses host frames, echoes them, and writes replies, noise and
+    unsolicited frames when they fall due, so replies never interleave.
+    """
+
+    def __init__(
+        self,
+        devices: List[SimDevice],
+        host: int = 1,
+        latency: float = 0.005,
+        jitter: float = 0.0,
+        echo: bool = True,
+        drop_rate: float = 0.0,
+        error_rate: float = 0.0,
+        noise_rate: float = 0.0,
+        unsolicited_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.devices: Dict[int, SimDevice] = {d.address: d for d in devices}
+        self.host = int(host)
+        self.latency = float(latency)
+        self.jitter = float(jitter)
+        self.echo = bool(echo)
+        self.drop_rate = float(drop_rate)
+        self.error_rate = float(error_rate)
+        self.noise_rate = float(noise_rate)
+        self.unsolicited_rate = float(unsolicited_rate)
+        self.rng = random.Random(seed)
+
+        self.stats = {"requests": 0, "replies": 0, "dropped": 0, "corrupted": 0,
+                      "noise_bytes": 0, "unsolicited": 0, "ignored": 0}
+
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self.port: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._write_lock = threading.Lock()
+        self._due: List[Tuple[float, int, bytes]] = []
+        self._n = 0
+
+    # ---------- lifecycle ----------
+    def start(self) -> str:
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="cctalk-emulator", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    def inject(self, data: bytes) -> None:
+        """Put raw bytes on the bus right now (from any thread)."""
+        with self._write_lock:
+            os.write(self._master, data)
+
+    # ---------- scheduling ----------
+    def _schedule(self, at: float, data: bytes) -> None:
+        self._n += 1
+        heapq.heappush(self._due, (at, self._n, data))
+
+    def _delay(self) -> float:
+        return self.latency + (self.rng.uniform(0.0, self.jitter) if self.jitter else 0.0)
+
+    def _corrupt(self, frame: bytes) -> bytes:
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.stats["corrupted"] += 1
+            return frame[:-1] + bytes([(frame[-1] + 1) & 0xFF])
+        return frame
+
+    def handle(self, frame: bytes, now: float) -> None:
+        dest, src, header = frame[0], frame[2], frame[3]
+        if src != self.host:
+            self.stats["ignored"] += 1  # not from the host (another master, or junk that parsed)
+            return
+        dev = self.devices.get(dest)
+        if dev is None:
+            return
+        self.stats["requests"] += 1
+        answer = dev.reply(header, frame[4:-1])
+        if answer is None:
+            return
+        if self.drop_rate and self.rng.random() < self.drop_rate:
+            self.stats["dropped"] += 1
+            return
+        self.stats["replies"] += 1
+        reply = build_frame(src, dev.address, answer[0], answer[1])
+        self._schedule(now + self._delay(), self._corrupt(reply))
+
+    def _background(self, now: float, next_noise: float, next_unsol: float) -> Tuple[float, float]:
+        rng = self.rng
+        if self.noise_rate > 0:
+            if not next_noise:
+                next_noise = now + rng.expovariate(self.noise_rate)
+            while now >= next_noise:
+                self._schedule(next_noise, bytes([rng.randrange(256)]))
+                self.stats["noise_bytes"] += 1
+                next_noise += rng.expovariate(self.noise_rate)
+        if self.unsolicited_rate > 0 and self.devices:
+            if not next_unsol:
+                next_unsol = now + rng.expovariate(self.unsolicited_rate)
+            while now >= next_unsol:
+                dev = rng.choice(list(self.devices.values()))
+                self._schedule(next_unsol, self._corrupt(build_frame(self.host, dev.address, ACK, b"")))
+                self.stats["unsolicited"] += 1
+                next_unsol += rng.expovariate(self.unsolicited_rate)
+        return next_noise, next_unsol
+
+    # ---------- thread ----------
+    def _loop(self) -> None:
+        parser = FrameParser(strict=True)
+        master = self._master
+        next_noise = next_unsol = 0.0
+        background = self.noise_rate > 0 or self.unsolicited_rate > 0
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            wait = 0.05
+            if self._due:
+                wait = max(0.0, min(wait, self._due[0][0] - now))
+            try:
+                readable, _, _ = select.select([master], [], [], wait)
+            except (OSError, ValueError):
+                break
+
+            now = time.monotonic()
+            for dev in self.devices.values():
+                dev.tick(now, self.rng)
+            if readable:
+                try:
+                    chunk = os.read(master, 4096)
+                except OSError:
+                    break
+                if self.echo:
+                    # the wire echoes bytes, valid frame or not
+                    with self._write_lock:
+                        os.write(master, chunk)
+                for frame in parser.feed(chunk):
+                    self.handle(frame, now)
+
+            if background:
+                next_noise, next_unsol = self._background(now, next_noise, next_unsol)
+
+            while self._due and self._due[0][0] <= now:
+                _, _, data = heapq.heappop(self._due)
+                try:
+                    with self._write_lock:
+                        os.write(master, data)
+                except OSError:
+                    return
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.tools.emulator", description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--devices", default="devices.json", help="devices file (default: devices.json)")
+    ap.add_argument("--link", help="also create this symlink to the pty (stable COM_PORT)")
+    ap.add_argument("--host", type=int, default=1, help="host address (default 1)")
+    ap.add_argument("--latency", type=float, default=5.0, help="reply delay in ms (default 5)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="extra random reply delay in ms")
+    ap.add_argument("--no-echo", action="store_true", help="do not echo host frames")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="probability of no reply")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="probability of a bad reply checksum")
+    ap.add_argument("--noise-rate", type=float, default=0.0, help="junk bytes per second")
+    ap.add_argument("--unsolicited-rate", type=float, default=0.0, help="unrequested frames per second")
+    ap.add_argument("--coin-rate", type=float, default=0.0, help="coins per second into the coin acceptor")
+    ap.add_argument("--coin-error-rate", type=float, default=0.0, help="share of coin events that are errors")
+    ap.add_argument("--seed", type=int, help="random seed for reproducible runs")
+    args = ap.parse_args(argv)
+
+    devices = load_devices(args.devices, coin_rate=args.coin_rate, error_rate=args.coin_error_rate)
+    emu = BusEmulator(
+        devices,
+        host=args.host,
+        latency=args.latency / 1000.0,
+        jitter=args.jitter / 1000.0,
+        echo=not args.no_echo,
+        drop_rate=args.drop_rate,
+        error_rate=args.error_rate,
+        noise_rate=args.noise_rate,
+        unsolicited_rate=args.unsolicited_rate,
+        seed=args.seed,
+    )
+    port = emu.start()
+    if args.link:
+        if os.path.islink(args.link):
+            os.unlink(args.link)
+        os.symlink(port, args.link)
+    print(f"ccTalk emulator on {args.link or port} ({port}): "
+          + ", ".join(f"{d.address}={type(d).__name__[3:]}" for d in devices), flush=True)
+
+    signal.signal(signal.SIGTERM, lambda *_: emu._stop.set())
+    try:
+        while not emu._stop.wait(10.0):
+            print(json.dumps(emu.stats), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emu.stop()
+        if args.link and os.path.islink(args.link):
+            os.unlink(args.link)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import logging
+
+import pytest
+
+from app.core.buses import build_buses
+from app.core.hub import HUB
+from app.core.metrics import METRICS
+from app.core.state import STATE
+
+DEFAULTS = {"port": "/dev/null", "baud": 9600, "timeout": 0.1, "rx_mode": "event", "host_address": 1}
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    monkeypatch.delenv("BUSES", raising=False)
+    registries = []
+
+    def build(**kw):
+        registries.append(build_buses(str(tmp_path), DEFAULTS, logging.getLogger("test"), **kw))
+        return registries[-1]
+
+    yield build
+    for r in registries:
+        r.stop()
+
+
+def test_building_twice_does_not_duplicate_state_listeners(build):
+    build(capture_dir="cap")
+    second = build(capture_dir="cap")
+    listeners = STATE._listeners
+    assert listeners.count(HUB.publish) == 1
+    assert listeners == [HUB.publish, second.default.capture.on_state_event]
+
+
+def test_building_twice_does_not_duplicate_metric_series(build):
+    build()
+    build()
+    series = [l.split()[0] for l in METRICS.render().splitlines()
+              if l.startswith(("cctalk_connected{", "cctalk_frames_stored{"))]
+    assert sorted(series) == ['cctalk_connected{bus="default"}', 'cctalk_frames_stored{bus="default"}']
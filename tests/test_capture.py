@@ -0,0 +1,41 @@
+import threading
+from types import SimpleNamespace
+
+from app.core.capture import CaptureReader, CaptureWriter
+from app.core.cctalk import build_frame
+
+
+def frame(i, direction="RX"):
+    raw = build_frame(1, 2 + i % 3, 0, bytes([i & 0xFF]))
+    return SimpleNamespace(ts=1000.0 + i / 1000, direction=direction, addr=2 + i % 3, raw=raw)
+
+
+def test_state_events_are_written_by_the_writer_thread(tmp_path):
+    w = CaptureWriter(str(tmp_path))
+    writes = []
+    write = w._write
+    w._write = lambda *a: (writes.append(threading.current_thread()), write(*a))
+    for i in range(600):
+        w.on_state_event("frame", frame(i, "TX" if i % 2 else "RX"))
+    w.on_state_event("device", None)
+    w.close()  # drains the queue first
+    assert w.stats() == {"records": 600, "queued": 0, "dropped": 0}
+    assert writes and all(t is not threading.current_thread() for t in writes)
+
+    with CaptureReader(w.path) as r:
+        records = list(r)
+        assert len(records) == 600
+        assert [(x.direction, x.addr, x.raw) for x in records[:2]] == [
+            ("RX", 2, frame(0).raw), ("TX", 3, frame(1).raw)]
+        assert [x.raw for x in r.query(addr=4)] == [frame(i).raw for i in range(2, 600, 3)]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    w = CaptureWriter(str(tmp_path), queue_size=10)
+    with w._lock:  # the writer thread is stuck (a slow disk)
+        for i in range(50):
+            w.on_state_event("frame", frame(i))
+    w.close()
+    assert w.dropped > 0 and w.records + w.dropped == 50
+    with CaptureReader(w.path) as r:
+        assert len(r) == w.records
@@ -0,0 +1,79 @@
+from app.core.cctalk import FrameParser, build_frame
+
+POLL = build_frame(2, 1, 254, b"")
+REPLY = build_frame(1, 2, 0, b"")
+CREDIT = build_frame(1, 2, 0, bytes([7, 1, 3, 2, 1, 0, 0, 0, 0, 0, 0]))
+STREAM = [POLL, REPLY, build_frame(2, 1, 229, b""), CREDIT] * 5
+
+
+def feed_all(parser, data, size):
+    out = []
+    for k in range(0, len(data), size):
+        out += parser.feed(data[k:k + size])
+    return out
+
+
+def test_any_chunking_gives_the_same_frames():
+    data = b"".join(STREAM)
+    for size in (1, 2, 3, 7, 16, len(data)):
+        p = FrameParser()
+        assert feed_all(p, data, size) == STREAM
+        assert (p.frames, p.discarded, p.resyncs, p.pending) == (len(STREAM), 0, 0, 0)
+
+
+def test_noise_byte_costs_only_itself():
+    data = POLL + b"\x55" + REPLY + CREDIT
+    for size in (1, 4, len(data)):
+        p = FrameParser()
+        assert feed_all(p, data, size) == [POLL, REPLY, CREDIT]
+        assert (p.discarded, p.resyncs) == (1, 1)
+
+
+def test_corrupt_frame_resyncs_on_the_next_one():
+    bad = bytearray(REPLY)
+    bad[3] ^= 0x10  # checksum no longer matches
+    p = FrameParser()
+    assert feed_all(p, POLL + bytes(bad) + CREDIT + POLL, 1) == [POLL, CREDIT, POLL]
+    assert p.discarded == len(bad) and p.resyncs == 1
+
+
+def test_impossible_length_is_rejected_without_waiting():
+    # after a noise byte, 0xFD reads as the length of a 258-byte frame, which
+    # ccTalk does not allow: the frames behind it must not wait for 259 bytes
+    p = FrameParser()
+    assert p.feed(b"\x07\xfd" + POLL + POLL) == [POLL, POLL]
+    assert p.discarded == 2 and p.resyncs == 1 and p.pending == 0
+
+
+def test_max_data_bounds_the_wait():
+    p = FrameParser(max_data=16)
+    assert p.feed(b"\x07\x40" + POLL + POLL) == [POLL, POLL]  # len 64 > 16: dropped at once
+    p = FrameParser()
+    assert p.feed(b"\x07\x40" + POLL + POLL) == []  # len 64 is legal: wait for 69 bytes
+    assert p.pending == 2 + 2 * len(POLL)
+
+
+def test_raw_mode_keeps_bad_frames():
+    bad = bytearray(REPLY)
+    bad[3] ^= 0x10
+    p = FrameParser(strict=False)
+    assert p.feed(POLL + bytes(bad)) == [POLL, bytes(bad)]
+    assert p.discarded == 0
+
+
+def test_reset_drops_partial_frame():
+    p = FrameParser()
+    assert p.feed(CREDIT[:6]) == []
+    p.reset()
+    assert p.pending == 0 and p.discarded == 6
+    assert p.feed(POLL) == [POLL]
+
+
+def test_long_frame_checksum():
+    big = build_frame(1, 2, 0, b"\xff" * 252)  # byte sum over 65520: checked with sum()
+    p = FrameParser()
+    assert feed_all(p, POLL + big + POLL, 64) == [POLL, big, POLL]
+    corrupt = big[:-1] + bytes([big[-1] ^ 1])
+    p = FrameParser()
+    out = feed_all(p, corrupt + POLL * 60, 64)
+    assert corrupt not in out and out[-1] == POLL
@@ -0,0 +1,80 @@
+from app.core.coin_events import CoinEventTracker, counter_advance
+
+
+def reply(counter, *pairs):
+    """Header 229 data bytes: counter + 5 (A, B) pairs, newest first, null-padded."""
+    pairs = list(pairs) + [(0, 0)] * (5 - len(pairs))
+    return bytes([counter] + [x for p in pairs for x in p])
+
+
+def kinds(events):
+    return [(e["kind"], e["counter"]) for e in events]
+
+
+def tracker(baseline):
+    t = CoinEventTracker()
+    assert t.feed(2, baseline) == []  # first read only sets the baseline
+    return t
+
+
+def test_counter_advance():
+    assert counter_advance(10, 12) == 2
+    assert counter_advance(250, 3) == 8  # 251..255, 1..3
+    assert counter_advance(255, 1) == 1
+    assert counter_advance(0, 4) == 4  # after a reset
+
+
+def test_repeat_is_ignored():
+    t = tracker(reply(7, (3, 1)))
+    assert t.feed(2, reply(7, (3, 1))) == []
+    assert t.totals()[0]["repeats"] == 1
+
+
+def test_wrap():
+    t = tracker(reply(254, (3, 1)))
+    events = t.feed(2, reply(2, (5, 1), (0, 2), (4, 1), (3, 1)))
+    # 255, 1, 2 are new; oldest first with their own counter values
+    assert kinds(events) == [("credit", 255), ("error", 1), ("credit", 2)]
+    assert events[0]["coin"] == 4 and events[1]["code"] == 2
+    tot = t.totals()[0]
+    assert (tot["credits"], tot["errors"], tot["lost"], tot["resets"]) == (2, 1, 0, 0)
+
+
+def test_reset():
+    t = tracker(reply(40, (3, 1)))
+    assert kinds(t.feed(2, reply(0))) == [("reset", 0)]
+    # events after a reset count from 1; the null padding is not an error
+    assert kinds(t.feed(2, reply(2, (7, 1), (8, 2)))) == [("credit", 1), ("credit", 2)]
+    tot = t.totals()[0]
+    assert (tot["credits"], tot["errors"], tot["lost"], tot["resets"]) == (2, 0, 0, 1)
+
+
+def test_reset_then_coins_before_next_read():
+    t = tracker(reply(200, (3, 1)))
+    # looks like a wrap with 57 new events, but only 2 results are in the buffer
+    events = t.feed(2, reply(2, (5, 1), (4, 1)))
+    assert kinds(events) == [("reset", 0), ("credit", 1), ("credit", 2)]
+    tot = t.totals()[0]
+    assert (tot["credits"], tot["errors"], tot["lost"], tot["resets"]) == (2, 0, 0, 1)
+    assert tot["errors_by_code"] == {}
+
+
+def test_overflow():
+    t = tracker(reply(250, (3, 1)))
+    events = t.feed(2, reply(9, *[(1, 1)] * 5))  # 14 new, 5 shown
+    assert events[0]["kind"] == "lost" and events[0]["count"] == 9
+    assert (events[0]["counter"], events[0]["counter_to"]) == (251, 4)  # 251..255, 1..4
+    assert kinds(events[1:]) == [("credit", c) for c in range(5, 10)]
+    tot = t.totals()[0]
+    assert (tot["credits"], tot["lost"]) == (5, 9)
+
+
+def test_on_reply_checks_header_and_checksum():
+    t = CoinEventTracker()
+    data = reply(1, (3, 1))
+    frame = bytes([1, len(data), 2, 0]) + data
+    frame += bytes([-sum(frame) & 0xFF])
+    t.on_reply(2, 229, frame)
+    t.on_reply(2, 229, frame[:-1] + bytes([frame[-1] ^ 1]))  # bad checksum
+    t.on_reply(2, 254, frame)
+    assert t.totals()[0]["reads"] == 1
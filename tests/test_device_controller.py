@@ -0,0 +1,96 @@
+import threading
+import time
+
+from app.core.cctalk import build_frame
+from app.core.device_controller import DeviceController
+from app.core.state import AppState
+
+HOST = 1
+
+
+class FakeBus:
+    """Stands in for SerialIO: on each write, plays `script(frame)` back into the RX path."""
+
+    def __init__(self, script):
+        self.script = script
+        self.written = []
+        self.dc = None
+
+    def write(self, frame):
+        self.written.append(frame)
+        rx = self.script(frame)
+
+        def deliver():
+            for f in rx:
+                self.dc.on_rx_frame(f, time.perf_counter())
+
+        threading.Timer(0.005, deliver).start()
+
+
+def controller(script):
+    bus = FakeBus(script)
+    bus.dc = DeviceController(bus, host_address=HOST, state=AppState(100), bus_id="test")
+    return bus.dc
+
+
+def reply_from(src, data=b""):
+    return build_frame(HOST, src, 0, data)
+
+
+def test_reply_matched_to_the_pending_dest():
+    # echo of our own request, a frame for another host, a reply from another
+    # device, then the real reply: only the last one answers the request
+    def script(tx):
+        return [tx, build_frame(7, 3, 0, b"\x99"), reply_from(2, b"\x02"), reply_from(3, b"\x03")]
+
+    dc = controller(script)
+    res = dc.send_and_wait(3, 246, timeout=1.0)
+    assert not res["timeout"] and res["echo"] and res["attempts"] == 1
+    assert res["reply"]["src"] == 3 and res["reply"]["data_hex"] == "03"
+    assert res["rtt_ms"] is not None and res["rtt_ms"] >= 0
+    assert dc._pending == {}
+
+
+def test_first_reply_wins():
+    dc = controller(lambda tx: [reply_from(3, b"\x01"), reply_from(3, b"\x02")])
+    assert dc.send_and_wait(3, 246, timeout=1.0)["reply"]["data_hex"] == "01"
+
+
+def test_timeout_and_retries():
+    dc = controller(lambda tx: [tx, reply_from(2)])  # never hears from 3
+    t0 = time.perf_counter()
+    res = dc.send_and_wait(3, 254, timeout=0.05, retries=2)
+    assert res["timeout"] and res["reply"] is None and res["rtt_ms"] is None
+    assert res["attempts"] == 3 and len(dc.sio.written) == 3
+    assert time.perf_counter() - t0 >= 0.15
+    assert dc._pending == {}
+
+
+def test_late_reply_is_not_taken_by_the_next_request():
+    # the reply to the first (timed-out) request arrives while the second
+    # request to another device is pending: it must not be matched to it
+    def script(tx):
+        if tx[0] == 3:
+            return []
+        return [reply_from(3, b"\x33"), reply_from(4, b"\x44")]
+
+    dc = controller(script)
+    assert dc.send_and_wait(3, 254, timeout=0.02)["timeout"]
+    assert dc.send_and_wait(4, 254, timeout=1.0)["reply"]["data_hex"] == "44"
+
+
+def test_reply_listeners_get_matched_replies():
+    seen = []
+    dc = controller(lambda tx: [reply_from(tx[0], b"\x05")])
+    dc.add_reply_listener(lambda dest, header, reply: seen.append((dest, header, reply)))
+    dc.add_reply_listener(lambda *a: 1 / 0)  # a failing listener does not break the send
+    assert not dc.send_and_wait(2, 229, timeout=1.0)["timeout"]
+    assert seen == [(2, 229, reply_from(2, b"\x05"))]
+
+
+def test_tx_frames_are_stored():
+    dc = controller(lambda tx: [])
+    dc.send(2, 254)
+    frames = dc.state.snapshot()["frames"]
+    assert [f["raw_hex"] for f in frames] == [build_frame(2, HOST, 254, b"").hex()]
+    assert dc.state.device_for_addr(2) is not None
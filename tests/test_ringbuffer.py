@@ -0,0 +1,137 @@
+import sys
+import threading
+
+import pytest
+
+from app.core.ringbuffer import RingBuffer
+
+
+def ring(capacity, n=0):
+    """A ring of (seq, value) items, the way AppState stores frames with their seq."""
+    rb = RingBuffer(capacity, seq_of=lambda item: item[0])
+    for _ in range(n):
+        push(rb)
+    return rb
+
+
+def push(rb):
+    seq = rb.last_seq + 1
+    assert rb.append((seq, f"v{seq}")) == seq
+
+
+def seqs(items):
+    return [item[0] for item in items]
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_wraparound_keeps_the_newest():
+    rb = ring(5, 12)
+    assert (len(rb), rb.first_seq, rb.last_seq) == (5, 8, 12)
+    assert seqs(rb.range(0)) == [8, 9, 10, 11, 12]
+    assert rb.get(7) is None and rb.get(8) == (8, "v8") and rb.get(13) is None
+    assert seqs(rb.range(9, 11)) == [9, 10]  # a slice across the wrap point
+    assert seqs(rb.range(10, 10)) == []
+
+
+def test_since_and_limit():
+    rb = ring(5, 12)
+    assert seqs(rb.since(10)) == [11, 12]
+    assert seqs(rb.since(0)) == [8, 9, 10, 11, 12]  # clipped to what is held
+    assert seqs(rb.since(0, limit=2)) == [11, 12]  # the newest `limit`
+    assert seqs(rb.since(10, limit=4)) == [11, 12]
+    assert rb.since(12) == [] and rb.since(99) == []
+    assert seqs(rb.tail(3)) == [10, 11, 12] and rb.tail(0) == []
+
+
+def test_lock_free_readers_match_locked_ones():
+    rb = ring(5, 12)
+    for lo in range(0, 15):
+        for hi in range(lo, 15):
+            assert rb.read_range(lo, hi) == rb.range(lo, hi)
+    assert rb.read(7) is None and rb.read(12) == (12, "v12") and rb.read(13) is None
+
+
+def test_clear_and_resize():
+    rb = ring(5, 7)
+    rb.resize(3)
+    assert seqs(rb.range(0)) == [5, 6, 7] and seqs(rb.read_range(0)) == [5, 6, 7]
+    rb.resize(6)
+    push(rb)
+    assert seqs(rb.range(0)) == [5, 6, 7, 8]
+    rb.clear()
+    assert len(rb) == 0 and rb.range(0) == [] and rb.read(8) is None
+    push(rb)
+    assert seqs(rb.read_range(0)) == [9]  # seqs keep counting
+
+
+def test_read_range_while_a_writer_laps_the_ring():
+    # a small ring and a writer going flat out: readers must only ever see
+    # items whose seq matches their position, in order, never a newer item
+    # sitting in an evicted slot
+    rb = ring(16, 16)
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            push(rb)
+
+    t = threading.Thread(target=writer)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible
+    t.start()
+    try:
+        bad = []
+        for _ in range(20000):
+            last = rb.last_seq
+            lo = max(1, last - 20)
+            items = rb.read_range(lo, last + 1)
+            s = seqs(items)
+            if s != sorted(set(s)) or any(x < lo or x > last for x in s):
+                bad.append(s)
+            if s and s != list(range(s[0], s[-1] + 1)):
+                bad.append(s)  # evicted items may only be missing at the start
+            one = rb.read(last)
+            if one is not None and one[0] != last:
+                bad.append(one)
+    finally:
+        stop.set()
+        t.join()
+        sys.setswitchinterval(interval)
+    assert rb.last_seq > 16
+    assert bad == []
+
+
+def test_read_range_while_the_ring_is_resized():
+    # resize() swaps in a new slot list: a reader must never pick up one
+    # that is still being filled (None or missing items in the middle)
+    rb = ring(64, 64)
+    stop = threading.Event()
+
+    def writer():
+        n = 0
+        while not stop.is_set():
+            n += 1
+            push(rb)
+            rb.resize(48 + n % 32)
+
+    t = threading.Thread(target=writer)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    t.start()
+    try:
+        bad = []
+        for _ in range(20000):
+            items = rb.read_range(rb.last_seq - 40)
+            if None in items:
+                bad.append(items)
+            elif items and seqs(items) != list(range(items[0][0], items[-1][0] + 1)):
+                bad.append(seqs(items))
+    finally:
+        stop.set()
+        t.join()
+        sys.setswitchinterval(interval)
+    assert bad == []
@@ -0,0 +1,58 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.device_controller import DeviceController
+from app.core.scheduler import BROADCAST, BusScheduler, TxJob
+from app.core.state import AppState
+
+
+class SilentBus:
+    """A serial port nobody answers on."""
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, frame):
+        self.written.append((time.monotonic(), frame))
+
+
+@pytest.fixture
+def sched():
+    state = AppState(100)
+    state.set_connected(True)
+    sio = SilentBus()
+    controller = SimpleNamespace(state=state, sio=sio, baudrate=9600,
+                                 device=DeviceController(sio, state=state, bus_id="test"))
+    s = BusScheduler(controller)
+    s.start()
+    yield s
+    s.stop()
+
+
+def test_fire_and_forget_releases_the_bus_after_the_write(sched):
+    jobs = [sched.submit(TxJob(2, 254, timeout=0.25)) for _ in range(5)]
+    t0 = time.monotonic()
+    for job in jobs:
+        assert job.done.wait(1.0)
+    assert time.monotonic() - t0 < 0.2  # 5 x 250 ms if each held the reply window
+    assert all(j.result["reply"] is None and not j.result["timeout"] for j in jobs)
+    stamps = [t for t, _ in sched.controller.sio.written]
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    assert min(gaps) >= sched.inter_frame_gap() * 0.9
+
+
+def test_broadcast_never_waits_for_a_reply(sched):
+    job = sched.submit(TxJob(BROADCAST, 1, wait_reply=True, timeout=0.5, retries=2))
+    assert job.done.wait(0.2)
+    assert job.result["attempts"] == 1 and not job.result["timeout"]
+
+
+def test_wait_reply_holds_the_bus_until_the_timeout(sched):
+    first = sched.submit(TxJob(3, 254, wait_reply=True, timeout=0.1))
+    second = sched.submit(TxJob(2, 254))
+    assert second.done.wait(1.0)
+    assert first.result["timeout"]
+    (t1, _), (t2, _) = sched.controller.sio.written
+    assert t2 - t1 >= 0.1
@@ -0,0 +1,121 @@
+import struct
+import sys
+import threading
+
+import pytest
+
+from app.core.shm_ring import HEADER, SLOT_SIZE, ShmRing
+
+
+@pytest.fixture
+def ring():
+    r = ShmRing.create(16)
+    yield r
+    r.close()
+
+
+def payload(seq):
+    # frame bytes derived from the seq, so a torn record cannot look valid
+    return bytes((seq + k) & 0xFF for k in range(5 + seq % 40))
+
+
+def write(r, seq):
+    r.write(seq, float(seq), seq / 2.0, seq & 1, seq & 0xFF, payload(seq))
+
+
+def test_write_read_and_limit(ring):
+    for seq in range(1, 6):
+        write(ring, seq)
+    ring.set_counters(5, 1, 2, 3)
+    records, nxt, lost = ring.read(1, limit=3)
+    assert [r[0] for r in records] == [1, 2, 3] and (nxt, lost) == (4, 0)
+    records, nxt, lost = ring.read(nxt)
+    assert list(records) == [(s, float(s), s / 2.0, s & 1, s, payload(s)) for s in (4, 5)]
+    assert (nxt, lost) == (6, 0)
+    assert ring.read(6)[1:] == (6, 0)
+    assert ring.counters() == {"frames": 5, "discarded": 1, "resyncs": 2, "partial_timeouts": 3}
+
+
+def test_lapped_reader_counts_lost(ring):
+    for seq in range(1, 41):
+        write(ring, seq)
+    records, nxt, lost = ring.read(1)
+    assert [r[0] for r in records] == list(range(25, 41))  # the last 16 slots
+    assert (nxt, lost) == (41, 24)
+
+
+def test_slot_being_written_is_skipped(ring):
+    for seq in range(1, 4):
+        write(ring, seq)
+    # the writer zeroes a slot's seq before refilling it: a reader must not use it
+    struct.pack_into("<Q", ring.buf, HEADER.size + (2 % ring.slots) * SLOT_SIZE, 0)
+    records, nxt, lost = ring.read(1)
+    assert [r[0] for r in records] == [1, 3] and (nxt, lost) == (4, 1)
+
+
+class Overwritten(bytearray):
+    """A copy of the ring in which the writer starts refilling a slot the moment
+    the reader copies its frame bytes (between its two seq checks)."""
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            slot = (key.start - HEADER.size) // SLOT_SIZE * SLOT_SIZE + HEADER.size
+            struct.pack_into("<Q", self, slot, 0)  # writer: slot seq = 0 first...
+            for k in range(key.start, key.stop):
+                self[k] = 0xEE  # ...then new bytes
+        return bytearray.__getitem__(self, key)
+
+
+def test_slot_overwritten_mid_read_is_lost_not_torn(ring):
+    for seq in range(1, 4):
+        write(ring, seq)
+    ring.buf = Overwritten(ring.buf)  # the reader works on a copy we can trip
+    try:
+        records, nxt, lost = ring.read(1)
+    finally:
+        ring.buf = ring.shm.buf
+    assert list(records) == [] and (nxt, lost) == (4, 3)
+
+
+def test_attached_reader_sees_writes(ring):
+    other = ShmRing.attach(ring.name)
+    try:
+        write(ring, 1)
+        assert [r[5] for r in other.read(1)[0]] == [payload(1)]
+    finally:
+        other.close()
+    assert ring.write_seq == 1
+
+
+def test_no_torn_records_while_the_writer_laps(ring):
+    # a writer thread overwriting the 16 slots as fast as it can while a
+    # reader lags behind: every record returned must be intact, and every
+    # seq is either returned or counted as lost
+    stop = threading.Event()
+
+    def writer():
+        seq = 0
+        while not stop.is_set():
+            seq += 1
+            write(ring, seq)
+
+    t = threading.Thread(target=writer)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    t.start()
+    torn, seen, lost_total, nxt = [], 0, 0, 1
+    try:
+        for _ in range(5000):
+            records, new_nxt, lost = ring.read(nxt)
+            for seq, ts, t_rx, direction, addr, raw in records:
+                seen += 1
+                if (ts, t_rx, direction, addr, raw) != (float(seq), seq / 2.0, seq & 1, seq & 0xFF, payload(seq)):
+                    torn.append(seq)
+            lost_total += lost
+            assert seen + lost_total == new_nxt - 1
+            nxt = new_nxt
+    finally:
+        stop.set()
+        t.join()
+        sys.setswitchinterval(interval)
+    assert seen > 0 and torn == []
@@ -0,0 +1,106 @@
+import sys
+import threading
+import time
+
+from app.core.state import AppState, FrameRecord
+
+
+def frame(addr, header=254):
+    return FrameRecord(time.time(), "TX", addr, bytes([addr, 0, 1, header, (-(addr + 1 + header)) & 0xFF]))
+
+
+def test_snapshot_since_limit_and_devices_rev():
+    s = AppState(10)
+    s.load_devices({"devices": [{"name": "Coin acceptor", "address": 2}]})
+    for k in range(15):
+        s.add_frame(frame(2 + k % 2))
+    snap = s.snapshot()
+    assert (snap["seq"], snap["first_seq"]) == (15, 6)
+    assert [f["seq"] for f in snap["frames"]] == list(range(6, 16))
+    assert snap["frames"][-1]["device"] == "Coin acceptor" and snap["frames"][-2]["device"] is None
+    assert [f["seq"] for f in s.snapshot(since=12)["frames"]] == [13, 14, 15]
+    assert [f["seq"] for f in s.snapshot(limit=2)["frames"]] == [14, 15]
+    assert s.snapshot(since=15)["frames"] == []
+
+    rev = snap["devices_rev"]
+    assert "devices" not in s.snapshot(devices_rev=rev)
+    s.note_device(9)
+    again = s.snapshot(devices_rev=rev)
+    assert again["devices_rev"] == rev + 1 and [d["address"] for d in again["devices"]] == [2, 9]
+
+
+def test_published_data_is_never_mutated():
+    s = AppState(10)
+    s.load_devices({"devices": [{"name": "Hopper", "address": 3}]})
+    snap = s.snapshot()
+    devices, dev, conn = snap["devices"], snap["devices"][0], s.connection()
+    version = s.version()
+
+    s.note_device(3, name="Hopper 1")
+    s.update_device_info(3, {"serial": 42})
+    s.note_device(4)
+    s.set_connected(True)
+    s.add_frame(frame(3))
+
+    # what a reader already holds stays as it was; new reads see the changes
+    assert devices == [{"name": "Hopper", "address": 3, "type": ""}] and dev["name"] == "Hopper"
+    assert conn["connected"] is False and conn["seq"] == 0
+    assert [d["address"] for d in s.devices] == [3, 4]
+    assert s.device_for_addr(3) == {"name": "Hopper 1", "address": 3, "type": "", "serial": 42}
+    assert s.version() != version
+
+
+def test_readers_during_writes():
+    # lock-free readers against a writer that appends, adds devices, resizes
+    # and clears: snapshots stay ordered and within their own cursor, address
+    # queries only return matching frames, held device lists never change
+    s = AppState(200)
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            s.add_frame(frame(i % 7))
+            s.note_device(i % 7 + 10 * (i % 50 == 0))
+            if i % 997 == 0:
+                s.set_frame_capacity(100 + i % 300)
+            if i % 5003 == 0:
+                s.clear_frames()
+
+    def check():
+        snap = s.snapshot(since=max(0, s.frames.last_seq - 50))
+        seqs = [f["seq"] for f in snap["frames"]]
+        if seqs != sorted(set(seqs)) or (seqs and seqs[-1] > snap["seq"]):
+            errors.append(("snapshot", seqs[:5]))
+        held = snap.get("devices")
+        before = list(held) if held is not None else None
+        for f in s.query_frames(addr=3, limit=50)["frames"]:
+            if f["addr"] != 3:
+                errors.append(("query", f["seq"]))
+        if held is not None and held != before:
+            errors.append(("devices mutated",))
+
+    def reader():
+        while not stop.is_set():
+            try:
+                check()
+            except Exception as e:  # a crash in the thread must fail the test
+                errors.append(("raised", repr(e)))
+                return
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(2)]
+    for t in threads:
+        t.start()
+    try:
+        time.sleep(1.0)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+        sys.setswitchinterval(interval)
+    assert s.frames.last_seq > 1000
+    assert errors == []
@@ -1,9 +1,18 @@
 /* ccTalk Logger Enterprise UI (multi-page, AdminLTE)
    Backend endpoints (Flask):
-   GET  /api/status
+   GET  /api/status?since=<seq>&devices_rev=<n>   (only new frames / changed devices)
+        ...&format=compact on status/frames/stream: columnar frames, see expandFrames()
+   GET  /api/connection                          (connection/config only)
+   GET  /api/frames?dir=&addr=&header=&start=&end=&text=&since=<seq>&before=<seq>&limit=<n>
+                                                 (server-side search, next_before = older page)
+   GET  /api/stream?since=<seq>                  (SSE: snapshot, frames, status, devices)
+   GET  /api/buses                               (configured buses; every other route also
+                                                 exists as /api/bus/<id>/..., see api())
+   GET  /api/ports?refresh=1                     (cached port table, presence of the current port)
    GET  /api/config
    POST /api/config
    POST /api/send_hex  { hex: "...", add_checksum: true/false }
+   POST /api/send_batch { steps: [{dest, header, data_hex, delay_ms, wait_reply}, ...] }
    POST /api/clear_log
    POST /api/connect
    POST /api/disconnect
@@ -16,8 +25,32 @@
     cfg: null,
     status: null,
     _connBadgeBound: false,
+    // incremental status cursor
+    seq: null,
+    devicesRev: null,
+    frames: [],
+    devices: [],
+    conn: {},
+    stream: null,
+    renderQueued: false,
+    // server-side frame search (Frames page filters)
+    query: "",
+    queryFrames: [],
+    queryNext: null,
+    queryTop: null,
+    queryBusy: false,
+    queryTimer: null,
   };
 
+  const MAX_FRAMES = 500;
+
+  // Selected bus: ?bus=<id> or the last pick (localStorage); "" = default bus (/api/...).
+  const BUS = new URLSearchParams(location.search).get("bus") ?? localStorage.getItem("cctalk.bus") ?? "";
+  function api(path) {
+    return (BUS ? "/api/bus/" + encodeURIComponent(BUS) : "/api") + path;
+  }
+  window.cctalkApi = api;  // page scripts (controller.js) use the same bus
+
   function qs(id) { return document.getElementById(id); }
 
   function setActiveNav() {
@@ -46,7 +79,8 @@
     const ac = new AbortController();
     const t = setTimeout(() => ac.abort(), timeoutMs);
     try {
-      const r = await fetch(url, { cache: "no-store", signal: ac.signal });
+      // revalidate with the ETag the server sent; unchanged replies are empty 304s
+      const r = await fetch(url, { cache: "no-cache", signal: ac.signal });
       if (!r.ok) throw new Error(`${url} ${r.status}`);
       return await r.json();
     } finally {
@@ -75,8 +109,91 @@
 
   function safe(s) { return (s ?? "").toString(); }
 
+  // ?format=compact frames (columnar, see app/core/compact.py) -> the row
+  // objects the plain JSON format sends. Arrays pass through unchanged.
+  function expandFrames(c) {
+    if (!c || Array.isArray(c)) return c;
+    const names = c.names || {};
+    const an = names.addr || {}, hn = names.header || {}, dn = names.device || {};
+    const out = new Array(c.n);
+    let seq = 0, ms = 0;
+    for (let i = 0; i < c.n; i++) {
+      seq += c.seq[i];
+      ms += c.ts[i];
+      const bin = atob(c.raw[i]);
+      let hex = "", sum = 0;
+      for (let k = 0; k < bin.length; k++) {
+        const b = bin.charCodeAt(k);
+        hex += (b < 16 ? "0" : "") + b.toString(16);
+        sum += b;
+      }
+      const at = (k) => (k < bin.length ? bin.charCodeAt(k) : undefined);
+      const len = at(1) ?? 0;
+      const addr = c.addr[i];
+      out[i] = {
+        seq,
+        ts: ms / 1000,
+        time: new Date(ms).toTimeString().slice(0, 8),
+        direction: c.dir[i] === "T" ? "TX" : "RX",
+        addr,
+        device: dn[addr] ?? null,
+        raw_hex: hex,
+        decoded: {
+          dest: at(0), dest_name: an[at(0)], len,
+          src: at(2), src_name: an[at(2)],
+          header: at(3), header_name: hn[at(3)],
+          data_hex: hex.slice(8, 8 + 2 * len),
+          checksum: at(4 + len),
+          valid_checksum: (sum & 0xFF) === 0,
+        },
+      };
+    }
+    return out;
+  }
+  window.cctalkExpandFrames = expandFrames;  // controller.js polls compact status too
+
+  // /api/status and /api/connection are flat; older payloads nested it under "serial"
+  function serialOf(status) { return status?.serial || status || {}; }
+
+  function statusUrl() {
+    const q = [];
+    if (state.seq !== null) q.push("since=" + state.seq);
+    if (state.devicesRev !== null) q.push("devices_rev=" + state.devicesRev);
+    q.push("format=compact");
+    return api("/status") + "?" + q.join("&");
+  }
+
+  // Merge an incremental /api/status reply (or a stream event) into the local cache.
+  // Only fields present in `st` are applied; frames already held are skipped by seq.
+  function mergeStatus(st) {
+    const { frames: packed, devices, ...conn } = st;
+    const newFrames = expandFrames(packed);
+    let frames = state.frames;
+
+    if (conn.first_seq !== undefined) {
+      const firstSeq = Number(conn.first_seq || 0);
+      if (frames.length && frames[0].seq < firstSeq) frames = frames.filter(f => f.seq >= firstSeq);
+    }
+    if (newFrames?.length) {
+      const fresh = state.seq === null ? newFrames : newFrames.filter(f => f.seq > state.seq);
+      if (fresh.length) {
+        frames = frames.concat(fresh);
+        state.seq = fresh[fresh.length - 1].seq;
+      }
+    }
+    if (frames.length > MAX_FRAMES) frames = frames.slice(-MAX_FRAMES);
+    state.frames = frames;
+
+    if (devices) state.devices = devices;
+    if (conn.devices_rev !== undefined) state.devicesRev = conn.devices_rev;
+    if (conn.seq !== undefined) state.seq = Math.max(state.seq ?? 0, conn.seq);
+
+    state.conn = { ...state.conn, ...conn };
+    return { ...state.conn, frames: state.frames, devices: state.devices };
+  }
+
   function renderTopBar(status, cfg) {
-    const conn = !!status?.serial?.connected;
+    const conn = !!serialOf(status).connected;
     const connBadge = qs("connBadge");
     badge(connBadge, conn ? "CONNECTED" : "DISCONNECTED", conn ? "badge-success" : "badge-secondary");
 
@@ -86,16 +203,16 @@
       connBadge.style.cursor = "pointer";
       connBadge.addEventListener("click", async () => {
         try {
-          const st = state.status || await apiGet("/api/status");
-          const isConn = !!st?.serial?.connected;
+          const st = serialOf(state.status || await apiGet(api("/connection")));
+          const isConn = !!st.connected;
 
-          const port = (state.cfg?.port || st?.serial?.port || "COM4");
-          const baud = Number(state.cfg?.baud || st?.serial?.baud || 9600);
+          const port = (state.cfg?.port || st.port || "COM4");
+          const baud = Number(state.cfg?.baud || st.baud || 9600);
 
           badge(connBadge, isConn ? "DISCONNECTING…" : "CONNECTING…", "badge-warning");
 
-          if (isConn) await apiPost("/api/disconnect", {});
-          else await apiPost("/api/connect", { port, baud });
+          if (isConn) await apiPost(api("/disconnect"), {});
+          else await apiPost(api("/connect"), { port, baud });
 
           state.lastFramesHash = "";
           await tick();
@@ -111,13 +228,13 @@
 
     const portLabel = qs("portLabel");
     const baudLabel = qs("baudLabel");
-    if (portLabel) portLabel.textContent = safe(cfg?.port || status?.serial?.port || "-");
-    if (baudLabel) baudLabel.textContent = safe(cfg?.baud || status?.serial?.baud || "-");
+    if (portLabel) portLabel.textContent = safe(cfg?.port || serialOf(status).port || "-");
+    if (baudLabel) baudLabel.textContent = safe(cfg?.baud || serialOf(status).baud || "-");
 
     // Optional: show last_error somewhere if you have an element
     const errEl = qs("lastError");
     if (errEl) {
-      const le = status?.serial?.last_error || "";
+      const le = serialOf(status).last_error || "";
       errEl.textContent = le ? ("Error: " + le) : "";
       errEl.className = le ? "small text-danger" : "small text-muted";
     }
@@ -134,39 +251,37 @@
     return safe(tsOrStr);
   }
 
+  function frameDecodedText(f) {
+    const d = f.decoded;
+    if (!d || typeof d !== "object") return safe(d);
+    return safe(d.header_name) + (d.data_hex ? " [" + d.data_hex + "]" : "") + (d.valid_checksum === false ? " (bad checksum)" : "");
+  }
+
   function renderFrames(status) {
     const tbody = qs("framesTbody");
     if (!tbody) return;
 
-    const frames = status?.frames || [];
-    const hash = frames.length ? (frames[frames.length - 1].ts + "|" + frames.length) : "empty";
+    // with filters set, rows come from the server-side search instead of the live tail
+    const rows = state.query ? state.queryFrames : (status?.frames || []);
+    const hash = (state.query ? "q:" + state.query + "|" : "") +
+      (rows.length ? (rows[0].seq + "|" + rows[rows.length - 1].seq + "|" + rows.length) : "empty");
     if (hash === state.lastFramesHash) return;
     state.lastFramesHash = hash;
 
-    const dirFilter = qs("dirFilter")?.value || "";
-    const addrFilterRaw = qs("addrFilter")?.value || "";
-    const textFilter = (qs("textFilter")?.value || "").toLowerCase();
-    const addrFilter = addrFilterRaw.trim() ? parseInt(addrFilterRaw.trim(), 10) : null;
-
-    let rows = frames;
-    if (dirFilter) rows = rows.filter(f => (f.direction || "").toUpperCase() === dirFilter);
-    if (Number.isFinite(addrFilter)) rows = rows.filter(f => (f.from === addrFilter) || (f.to === addrFilter));
-    if (textFilter) rows = rows.filter(f => (safe(f.hex).toLowerCase().includes(textFilter) || safe(f.decoded).toLowerCase().includes(textFilter)));
-
     tbody.innerHTML = rows.map(f => {
       const dir = safe(f.direction).toUpperCase();
       const dirBadge = dir === "RX"
         ? '<span class="badge badge-info">RX</span>'
         : '<span class="badge badge-success">TX</span>';
-      const decoded = safe(f.decoded);
+      const decoded = frameDecodedText(f);
       const decodedHtml = decoded ? decoded : '<span class="text-muted">—</span>';
       return `
         <tr>
           <td>${fmtTime(f.time || f.ts)}</td>
           <td>${dirBadge}</td>
-          <td><span class="badge badge-light">${safe(f.from)}</span></td>
-          <td><span class="badge badge-light">${safe(f.to)}</span></td>
-          <td class="mono">${safe(f.hex || f.raw_hex)}</td>
+          <td><span class="badge badge-light">${safe(f.decoded?.src)}</span></td>
+          <td><span class="badge badge-light">${safe(f.decoded?.dest)}</span></td>
+          <td class="mono">${safe(f.raw_hex)}</td>
           <td>${decodedHtml}</td>
         </tr>`;
     }).join("");
@@ -177,6 +292,105 @@
     }
   }
 
+  // ---------- server-side frame search ----------
+  function frameQuery() {
+    const p = new URLSearchParams();
+    const dir = qs("dirFilter")?.value || "";
+    const addr = (qs("addrFilter")?.value || "").trim();
+    const header = (qs("headerFilter")?.value || "").trim();
+    const text = (qs("textFilter")?.value || "").trim();
+    const start = qs("startFilter")?.value || "";
+    const end = qs("endFilter")?.value || "";
+    if (dir) p.set("dir", dir);
+    if (/^\d+$/.test(addr)) p.set("addr", addr);
+    if (/^\d+$/.test(header)) p.set("header", header);
+    if (text) p.set("text", text);
+    if (start) p.set("start", String(new Date(start).getTime() / 1000));
+    if (end) p.set("end", String(new Date(end).getTime() / 1000));
+    return p.toString();
+  }
+
+  function renderQueryInfo() {
+    const info = qs("queryInfo");
+    if (info) {
+      info.textContent = state.query
+        ? `${state.queryFrames.length} matching frame(s) loaded` + (state.queryNext !== null ? " (more available)" : "")
+        : "Live view (last frames). Set a filter to search the full history.";
+    }
+    const older = qs("btnOlder");
+    if (older) older.disabled = !state.query || state.queryNext === null;
+  }
+
+  async function runQuery() {
+    const q = frameQuery();
+    state.query = q;
+    state.queryFrames = [];
+    state.queryNext = null;
+    state.queryTop = null;
+    state.lastFramesHash = "";
+    if (q) {
+      state.queryBusy = true;
+      try {
+        const res = await apiGet(api("/frames?") + q + "&limit=200&format=compact", 3000);
+        if (state.query !== q) return;  // filters changed meanwhile
+        state.queryFrames = expandFrames(res.frames) || [];
+        state.queryNext = res.next_before;
+        state.queryTop = res.seq;
+      } catch (e) {
+        console.warn("frame query failed", e);
+      } finally {
+        state.queryBusy = false;
+      }
+    }
+    renderQueryInfo();
+    renderFrames(state.status);
+  }
+
+  async function loadOlder() {
+    const q = state.query;
+    if (!q || state.queryNext === null || state.queryBusy) return;
+    state.queryBusy = true;
+    try {
+      const res = await apiGet(api("/frames?") + q + "&limit=200&format=compact&before=" + state.queryNext, 3000);
+      if (state.query !== q) return;
+      state.queryFrames = (expandFrames(res.frames) || []).concat(state.queryFrames);
+      state.queryNext = res.next_before;
+      state.scrollLock = true;  // keep the view where the user is reading
+      qs("btnScrollLock")?.classList.add("text-warning");
+    } catch (e) {
+      console.warn("frame query failed", e);
+    } finally {
+      state.queryBusy = false;
+    }
+    renderQueryInfo();
+    renderFrames(state.status);
+  }
+
+  // New frames arrived while a search is shown: fetch only matches newer than the last one seen.
+  async function refreshQuery() {
+    const q = state.query;
+    if (!q || state.queryBusy || state.queryTop === null || !(state.seq > state.queryTop)) return;
+    state.queryBusy = true;
+    try {
+      const res = await apiGet(api("/frames?") + q + "&limit=200&format=compact&since=" + state.queryTop, 3000);
+      if (state.query !== q) return;
+      if (res.next_before !== null) {
+        // more new matches than one page: restart the search from the newest
+        state.queryBusy = false;
+        return runQuery();
+      }
+      const firstSeq = Number(res.first_seq || 0);
+      state.queryFrames = state.queryFrames.filter(f => f.seq >= firstSeq).concat(expandFrames(res.frames) || []);
+      state.queryTop = res.seq;
+    } catch (e) {
+      console.warn("frame query failed", e);
+    } finally {
+      state.queryBusy = false;
+    }
+    renderQueryInfo();
+    renderFrames(state.status);
+  }
+
   function renderDeviceMini(status) {
     const host = qs("deviceMiniList");
     if (!host) return;
@@ -264,13 +478,16 @@
   }
 
   async function loadConfig() {
-    try { state.cfg = await apiGet("/api/config"); } catch (e) { /* ignore */ }
+    try { state.cfg = await apiGet(api("/config")); } catch (e) { /* ignore */ }
   }
 
   function wireCommonUI() {
     const auto = qs("autoRefreshSwitch");
     if (auto) {
-      auto.addEventListener("change", () => { state.autorefresh = !!auto.checked; });
+      auto.addEventListener("change", () => {
+        state.autorefresh = !!auto.checked;
+        if (state.autorefresh) scheduleRender();
+      });
       state.autorefresh = !!auto.checked;
     }
 
@@ -278,7 +495,7 @@
     if (clearBtn) {
       clearBtn.addEventListener("click", async (ev) => {
         ev.preventDefault();
-        try { await apiPost("/api/clear_log", {}); } catch (e) {}
+        try { await apiPost(api("/clear_log"), {}); } catch (e) {}
       });
     }
 
@@ -299,7 +516,7 @@
         const validate_checksum = !!qs("cfgValidateChecksum")?.checked;
         const out = qs("cfgResult");
         try {
-          await apiPost("/api/config", { port, baud, validate_checksum });
+          await apiPost(api("/config"), { port, baud, validate_checksum });
           if (out) { out.className = "ml-2 text-success small"; out.textContent = "Saved"; }
           await loadConfig();
           await tick();
@@ -309,14 +526,59 @@
       });
     }
 
-    // filters trigger repaint
-    ["dirFilter","addrFilter","textFilter"].forEach(id => {
+    // filters run a (debounced) server-side search
+    ["dirFilter","addrFilter","headerFilter","textFilter","startFilter","endFilter"].forEach(id => {
       const el = qs(id);
       if (el) el.addEventListener("input", ()=> {
-        state.lastFramesHash = "";
-        if (state.status) renderFrames(state.status);
+        clearTimeout(state.queryTimer);
+        state.queryTimer = setTimeout(() => { runQuery().catch(() => {}); }, 250);
       });
     });
+
+    const olderBtn = qs("btnOlder");
+    if (olderBtn) olderBtn.addEventListener("click", () => { loadOlder().catch(() => {}); });
+  }
+
+  // Bus selector in the navbar; only shown when more than one bus is configured.
+  async function initBusSelector() {
+    let res;
+    try { res = await apiGet("/api/buses", 3000); } catch (e) { return; }
+    const buses = res.buses || [];
+    if (BUS && !buses.some(b => b.id === BUS)) {
+      // stale pick (bus removed from config): fall back to the default bus
+      localStorage.removeItem("cctalk.bus");
+      location.replace(location.pathname);
+      return;
+    }
+    if (buses.length < 2) return;
+    const nav = document.querySelector(".main-header .navbar-nav.ml-auto");
+    if (!nav) return;
+
+    const li = document.createElement("li");
+    li.className = "nav-item mr-3";
+    const sel = document.createElement("select");
+    sel.id = "busSelect";
+    sel.className = "form-control form-control-sm";
+    sel.title = "ccTalk bus";
+    sel.innerHTML = buses.map(b =>
+      `<option value="${safe(b.id)}">${safe(b.name)} (${safe(b.port)})</option>`).join("");
+    sel.value = BUS || res.default;
+    sel.addEventListener("change", () => {
+      localStorage.setItem("cctalk.bus", sel.value === res.default ? "" : sel.value);
+      location.replace(location.pathname);  // drop ?bus= so the stored pick applies
+    });
+    li.appendChild(sel);
+    nav.insertBefore(li, nav.firstChild);
+  }
+
+  async function loadPorts() {
+    const list = qs("portList");
+    if (!list) return;
+    try {
+      const res = await apiGet(api("/ports"), 3000);
+      list.innerHTML = (res.ports || []).map(p =>
+        `<option value="${safe(p.device)}">${safe(p.description)}</option>`).join("");
+    } catch (e) { /* ignore */ }
   }
 
   function renderSettings(cfg) {
@@ -328,16 +590,39 @@
     if (v) v.checked = !!cfg.validate_checksum;
   }
 
+  function render() {
+    const status = state.status;
+    if (!status || !state.autorefresh) return;
+    renderTopBar(status, state.cfg);
+    renderCounters(status);
+    renderFrames(status);
+    if (state.query) refreshQuery().catch(() => {});
+    renderDeviceMini(status);
+    renderDevicesGrid(status);
+    // page scripts (controller.js) render from the same cache instead of polling
+    document.dispatchEvent(new CustomEvent("cctalk:update", { detail: status }));
+  }
+
+  // Coalesce bursts of stream events into one repaint per animation frame.
+  function scheduleRender() {
+    if (state.renderQueued) return;
+    state.renderQueued = true;
+    requestAnimationFrame(() => {
+      state.renderQueued = false;
+      render();
+    });
+  }
+
+  function applyEvent(st) {
+    state.status = mergeStatus(st);
+    scheduleRender();
+  }
+
   async function tick() {
     if (!state.autorefresh) return;
     try {
-      const status = await apiGet("/api/status");
-      state.status = status;
-      renderTopBar(status, state.cfg);
-      renderCounters(status);
-      renderFrames(status);
-      renderDeviceMini(status);
-      renderDevicesGrid(status);
+      state.status = mergeStatus(await apiGet(statusUrl()));
+      render();
     } catch (e) {
       // Never freeze UI on slow/hung backend; show disconnected but keep timer running.
       badge(qs("connBadge"), "DISCONNECTED", "badge-secondary");
@@ -345,13 +630,38 @@
     }
   }
 
+  // Push updates: one EventSource per tab; reconnects with the seq cursor so
+  // frames sent while disconnected are backfilled.
+  function openStream() {
+    const es = new EventSource(api("/stream") + "?format=compact" + (state.seq !== null ? "&since=" + state.seq : ""));
+    state.stream = es;
+
+    es.addEventListener("snapshot", (ev) => applyEvent(JSON.parse(ev.data)));
+    es.addEventListener("frames", (ev) => applyEvent({ frames: JSON.parse(ev.data) }));
+    es.addEventListener("status", (ev) => applyEvent(JSON.parse(ev.data)));
+    es.addEventListener("devices", (ev) => applyEvent(JSON.parse(ev.data)));
+
+    es.onerror = () => {
+      es.close();
+      state.stream = null;
+      badge(qs("connBadge"), "DISCONNECTED", "badge-secondary");
+      setTimeout(openStream, 1000);
+    };
+  }
+
   async function init() {
     setActiveNav();
     wireCommonUI();
+    initBusSelector();
     await loadConfig();
     renderSettings(state.cfg);
-    await tick();
-    setInterval(() => { tick().catch(() => {}); }, 1000);
+    loadPorts();
+    if (window.EventSource) {
+      openStream();
+    } else {
+      await tick();
+      setInterval(() => { tick().catch(() => {}); }, 1000);
+    }
   }
 
   document.addEventListener("DOMContentLoaded", init);
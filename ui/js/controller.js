@@ -4,7 +4,8 @@
 // Features:
 // - /api/status devices supports LIST or MAP
 // - Prevents sending to addr 0 when no device selected
-// - Auto-refresh, scan, frames
+// - Live updates (pushed via app.js /api/stream, "cctalk:update" event), frames
+// - Backend address scan (/api/scan/*)
 // - Hopper / Recycler / Custom controls
 // - Auto header buttons from /api/headers:
 //   * Common headers shown in Coin/Hopper/Recycler as GRAY
@@ -12,12 +13,22 @@
 //   * Custom tab shows ALL with filter; DANGER shown as RED
 // - Per-tab header filters (Coin/Hopper/Recycler/Custom)
 
-let AUTO = null;
-let BILL = null;
-let STOP = false;
+let AUTO = false;
+let BILL = null; // server-side poll id (/api/polls)
+let SCAN_TIMER = null;
 
 let AUTO_HEADERS_CACHE = [];
 
+// incremental /api/status cursor + local caches
+const MAX_FRAMES = 200;
+let STATUS_SEQ = null;
+let DEVICES_REV = null;
+let FRAMES = [];
+let DEVICES = [];
+
+// API base of the bus selected in app.js (/api or /api/bus/<id>)
+const API = window.cctalkApi || ((path) => "/api" + path);
+
 // -------------------------
 // DOM helpers
 // -------------------------
@@ -33,11 +44,29 @@ const setBadge = (el, cls, txt) => {
 // API calls
 // -------------------------
 async function apiStatus() {
-  const r = await fetch("/api/status", { cache: "no-store" });
+  const q = [];
+  if (STATUS_SEQ !== null) q.push(`since=${STATUS_SEQ}`);
+  if (DEVICES_REV !== null) q.push(`devices_rev=${DEVICES_REV}`);
+  if (window.cctalkExpandFrames) q.push("format=compact");
+  // no-cache = revalidate via ETag: an unchanged status comes back as an empty 304
+  const r = await fetch(API("/status") + (q.length ? "?" + q.join("&") : ""), { cache: "no-cache" });
   if (!r.ok) throw new Error("status");
   return await r.json();
 }
 
+// Fold an incremental status reply into FRAMES/DEVICES.
+function mergeStatus(st) {
+  const firstSeq = Number(st.first_seq || 0);
+  if (FRAMES.length && FRAMES[0].seq < firstSeq) FRAMES = FRAMES.filter((f) => f.seq >= firstSeq);
+  const frames = window.cctalkExpandFrames ? window.cctalkExpandFrames(st.frames) : st.frames;
+  if (frames && frames.length) FRAMES = FRAMES.concat(frames);
+  if (FRAMES.length > MAX_FRAMES) FRAMES = FRAMES.slice(-MAX_FRAMES);
+
+  if (st.devices) DEVICES = st.devices;
+  DEVICES_REV = st.devices_rev ?? null;
+  STATUS_SEQ = st.seq ?? STATUS_SEQ;
+}
+
 async function apiSend(dest, header, dataHex) {
   const body = {
     dest: Number(dest),
@@ -45,7 +74,7 @@ async function apiSend(dest, header, dataHex) {
     data_hex: (dataHex || "").trim(),
   };
 
-  const r = await fetch("/api/send", {
+  const r = await fetch(API("/send"), {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(body),
@@ -56,8 +85,19 @@ async function apiSend(dest, header, dataHex) {
   return j;
 }
 
+async function apiJson(method, url, body) {
+  const r = await fetch(url, {
+    method,
+    headers: { "Content-Type": "application/json" },
+    body: body === undefined ? undefined : JSON.stringify(body),
+  });
+  const j = await r.json().catch(() => ({}));
+  if (!r.ok || j.ok === false) throw new Error(j.error || url);
+  return j;
+}
+
 async function apiHeaders() {
-  const r = await fetch("/api/headers", { cache: "no-store" });
+  const r = await fetch(API("/headers"), { cache: "no-cache" });
   if (!r.ok) throw new Error("headers");
   return await r.json();
 }
@@ -576,19 +616,28 @@ function bindRecycler() {
     await apiSend(addr, 154, "00").catch(() => {});
   });
 
-  qs("btnStartBillPoll")?.addEventListener("click", () => {
+  // Bill event polling runs in the backend bus scheduler, not a browser timer
+  qs("btnStartBillPoll")?.addEventListener("click", async () => {
     const addr = requireAddr();
     if (addr === null) return;
 
     const ms = Math.max(200, Number(qs("billPollMs")?.value || 250));
     if (BILL) return;
 
-    BILL = setInterval(() => apiSend(addr, 159, "").catch(() => {}), ms);
+    try {
+      const j = await apiJson("POST", API("/polls"), { dest: addr, header: 159, data_hex: "", interval_ms: ms });
+      BILL = j.poll.id;
+    } catch (e) {
+      const r = qs("cmdResult");
+      if (r) r.textContent = "ERROR: " + e.message;
+    }
   });
 
-  qs("btnStopBillPoll")?.addEventListener("click", () => {
-    clearInterval(BILL);
+  qs("btnStopBillPoll")?.addEventListener("click", async () => {
+    if (!BILL) return;
+    const id = BILL;
     BILL = null;
+    await apiJson("DELETE", API(`/polls/${id}`)).catch(() => {});
   });
 }
 
@@ -618,67 +667,99 @@ function bindCustom() {
 // -------------------------
 // Scan
 // -------------------------
-async function scan() {
-  STOP = false;
+// Runs in the backend (/api/scan/*): one reply window per address on the bus,
+// responders are added to the device list automatically.
+async function pollScan() {
+  const st = qs("scanStatus");
+  try {
+    const j = await apiJson("GET", API("/scan"));
+    const p = j.scan || {};
+    const found = (p.found || []).map((f) => f.address).join(", ");
+    if (st) {
+      st.textContent = p.running
+        ? `Scan ${p.current ?? "…"}/${p.end} (${found || "—"})`
+        : p.error
+          ? `ERROR: ${p.error} (found: ${found || "—"})`
+          : `${p.stopped ? "Stopped" : "Done"}: ${found || "no replies"}`;
+    }
+    if (p.running) {
+      SCAN_TIMER = setTimeout(pollScan, 300);
+    } else {
+      SCAN_TIMER = null;
+      refresh().catch(() => {});
+    }
+  } catch (e) {
+    SCAN_TIMER = null;
+    if (st) st.textContent = "ERROR: " + e.message;
+  }
+}
 
+async function scan() {
   const s = Number(qs("scanStart")?.value || 1);
   const e = Number(qs("scanEnd")?.value || 50);
-  const d = Number(qs("scanDelay")?.value || 80);
+  const t = Number(qs("scanTimeout")?.value || 150);
+  const identify = !!qs("scanIdentify")?.checked;
 
   const st = qs("scanStatus");
   if (st) st.textContent = "Scanning…";
 
-  for (let a = s; a <= e; a++) {
-    if (STOP) break;
-
-    try {
-      await apiSend(a, 254, "");
-    } catch (_) {
-      // ignore
-    }
-
-    if (st) st.textContent = `Scan ${a}/${e}`;
-    if (d) await new Promise((r) => setTimeout(r, d));
+  try {
+    await apiJson("POST", API("/scan/start"), { start: s, end: e, timeout_ms: t, identify });
+  } catch (err) {
+    if (st) st.textContent = "ERROR: " + err.message;
+    return;
   }
-
-  if (st) st.textContent = STOP ? "Stopped" : "Done";
+  if (!SCAN_TIMER) pollScan();
 }
 
 function bindScan() {
   qs("btnScan")?.addEventListener("click", scan);
-  qs("btnStopScan")?.addEventListener("click", () => {
-    STOP = true;
+  qs("btnStopScan")?.addEventListener("click", async () => {
+    await apiJson("POST", API("/scan/stop"), {}).catch(() => {});
   });
 }
 
 // -------------------------
 // Refresh loop
 // -------------------------
-async function refresh() {
-  const st = await apiStatus();
-
+function render(st) {
   updateConn(st);
-  renderDevices(st.devices || []);
-  renderFrames(st.frames || []);
+  renderDevices(DEVICES);
+  renderFrames(FRAMES);
 
   // update health for currently selected device
   const sel = (qs("selAddr")?.textContent || "").trim();
   const a = sel === "" || sel === "—" ? null : Number(sel);
 
-  if (Number.isFinite(a) && Array.isArray(st.devices)) {
-    const d = st.devices.find((x) => Number(x.address) === a);
+  if (Number.isFinite(a)) {
+    const d = DEVICES.find((x) => Number(x.address) === a);
     if (d) updateHealth(d);
   }
 }
 
+async function refresh() {
+  const st = await apiStatus();
+  mergeStatus(st);
+  render(st);
+}
+
+// app.js owns the single stream per tab and re-dispatches its merged cache
+function onUpdate(ev) {
+  if (!AUTO) return;
+  const st = ev.detail || {};
+  FRAMES = (st.frames || []).slice(-MAX_FRAMES);
+  DEVICES = st.devices || DEVICES;
+  DEVICES_REV = st.devices_rev ?? DEVICES_REV;
+  if (FRAMES.length) STATUS_SEQ = FRAMES[FRAMES.length - 1].seq;
+  render(st);
+}
+
 function startAuto() {
-  if (AUTO) return;
-  AUTO = setInterval(() => refresh().catch(() => {}), 1000);
+  AUTO = true;
 }
 
 function stopAuto() {
-  clearInterval(AUTO);
-  AUTO = null;
+  AUTO = false;
 }
 
 // -------------------------
@@ -723,6 +804,7 @@ function init() {
   // load + render all header lists
   loadAutoHeaders().catch(() => {});
 
+  document.addEventListener("cctalk:update", onUpdate);
   refresh().catch(() => {});
   startAuto();
 }